@@ -1,119 +1,321 @@
-from fastapi import APIRouter, Depends, HTTPException, Header
-from sqlalchemy import select
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from datetime import datetime
+import json
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Literal, Optional
+from datetime import date, datetime, timezone
+from decimal import Decimal
 
+from app import metrics
+from app.crud import aggregates as crud_aggregates
+from app.crud import audit as crud_audit
+from app.crud import idempotency as crud_idempotency
 from app.crud import instrument as crud_instrument
 from app.crud import qc as crud_qc
-from app.logic.rules_engine import evaluate_westgard, calculate_z_score
+from app.crud import status_board as crud_status_board
+from app.crud import summaries as crud_summaries
+from app.crud import user as crud_user
+from app.logic.run_rules import evaluate_run
+from app.logic import ingest
+from app.logic.ingest import history_at, run_rules_engine
+from app.logic.audit_writer import writer as audit_writer
+from app.logic.astm_listener import listener as astm_listener
 from app.models import qc as models
 from app.schemas import qc as schemas_qc
 from app.db.session import get_db
+from app.db.replicas import get_read_db, replica_set
+from app.db.cache import cache_stats
+from app.api.pagination import decode_cursor, set_next_cursor
 
 router = APIRouter()
 
 @router.post("/instruments/", response_model=schemas_qc.Instrument)
-def create_instrument(instrument: schemas_qc.InstrumentCreate, db: Session = Depends(get_db)):
-    return crud_instrument.create_instrument(db=db, instrument=instrument)
+async def create_instrument(instrument: schemas_qc.InstrumentCreate, db: AsyncSession = Depends(get_db)):
+    return await crud_instrument.create_instrument(db=db, instrument=instrument)
 
 @router.get("/instruments/", response_model=List[schemas_qc.Instrument])
-def read_instruments(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    instruments = crud_instrument.get_instruments(db, skip=skip, limit=limit)
+async def read_instruments(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    after_id = decode_cursor(cursor) if cursor else None
+    instruments = await crud_instrument.get_instruments(db, skip=skip, limit=limit, after_id=after_id)
+    set_next_cursor(response, instruments, limit)
     return instruments
 
 #Test Definition Endpoints
 @router.post("/tests/", response_model=schemas_qc.TestDefinition)
-def create_test(test: schemas_qc.TestDefinitionCreate, db: Session = Depends(get_db)):
-    return crud_qc.create_test_definition(db=db, test=test)
+async def create_test(test: schemas_qc.TestDefinitionCreate, db: AsyncSession = Depends(get_db)):
+    return await crud_qc.create_test_definition(db=db, test=test)
     
 @router.get("/test-definitions/", response_model=List[schemas_qc.TestDefinition])
-def read_test_definitions(
+async def read_test_definitions(
+    response: Response,
     instrument_id: Optional[int] = None,
     skip: int = 0, 
     limit: int = 100, 
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db)
 ):
-    tests = crud_qc.get_test_definitions(db, instrument_id=instrument_id, skip=skip, limit=limit)
+    after_id = decode_cursor(cursor) if cursor else None
+    tests = await crud_qc.get_test_definitions(
+        db, instrument_id=instrument_id, skip=skip, limit=limit, after_id=after_id
+    )
+    set_next_cursor(response, tests, limit)
     return tests
 
 #QC Result Endpoints
+def _replay(response: Response, result, original: models.QCResult, endpoint: str):
+    if not crud_idempotency.matches(result, original):
+        raise HTTPException(status_code=409, detail="This submission key was already used for a different result")
+    metrics.IDEMPOTENT_REPLAYS.inc(endpoint)
+    response.headers["Idempotent-Replayed"] = "true"
+    return original
+
 @router.post("/results/", response_model=schemas_qc.QCResult)
-def submit_qc_result(result: schemas_qc.QCResultCreate, db: Session = Depends(get_db)):
+async def submit_qc_result(
+    result: schemas_qc.QCResultCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    db: AsyncSession = Depends(get_db)
+):
+    #A retry of a stored submission gets the original result back, it isn't evaluated or written again
+    key = crud_idempotency.submission_key(result, idempotency_key)
+    if key is not None:
+        original = await crud_idempotency.find_result(db, key)
+        if original is not None:
+            return _replay(response, result, original, "results")
+
     #Fetch the test definition to get Mean and SD
-    test_def = db.query(models.TestDefinition).filter(
-        models.TestDefinition.id == result.test_id
-    ).first()
+    test_def = await crud_qc.get_test_definition(db, result.test_id)
 
     if not test_def:
         raise HTTPException(status_code=404, detail="Test definition not found")
     
-    past_results = db.query(models.QCResult)\
-        .filter(models.QCResult.test_id == result.test_id)\
-        .filter(models.QCResult.status != "ARCHIVED")\
-        .order_by(models.QCResult.timestamp.desc()).limit(10).all()
-
-    history_z = [
-        calculate_z_score(
-            r.value, 
-            test_def.mean, 
-            test_def.std_dev
-        ) 
-        for r in past_results
-    ]
-    
-    if not test_def:
-        raise HTTPException(status_code=404, detail="Test definition not found")
+    #Served from the per-test z-score window, only the first submission after startup/invalidation hits the DB
+    history_z, history_floats = await history_at(db, test_def)
 
     #Run the Rules Engine
-    evaluation = evaluate_westgard(
-        value=result.value, 
-        mean=test_def.mean, 
-        std_dev=test_def.std_dev,
-        history = history_z
-    )
+    evaluation = run_rules_engine(result.value, test_def, history_z, history_floats)
 
     #Save to database with the new status and message
-    return crud_qc.create_qc_result(
-        db=db, 
-        result=result, 
+    try:
+        return await crud_qc.create_qc_result(
+            db=db, 
+            result=result, 
+            status=evaluation.status,
+            system_comment=evaluation.message,
+            z_score=evaluation.z_score,
+            submission_key=key
+        )
+    except IntegrityError:
+        if key is None:
+            raise
+        #A concurrent retry of the same submission committed first
+        await db.rollback()
+        original = await crud_idempotency.find_result(db, key)
+        if original is None:
+            raise HTTPException(status_code=409, detail="This submission key was already used")
+        return _replay(response, result, original, "results")
+
+@router.post("/results/batch", response_model=schemas_qc.QCResultBatchResponse)
+async def submit_qc_results_batch(batch: schemas_qc.QCResultBatchCreate, db: AsyncSession = Depends(get_db)):
+    try:
+        response = await ingest.ingest_batch(db, batch.results)
+    except IntegrityError:
+        #A concurrent retry stored some of these first; resending the batch replays them
+        raise HTTPException(status_code=409, detail="Some of these results are being submitted concurrently, retry the batch")
+    if response.replayed:
+        metrics.IDEMPOTENT_REPLAYS.inc("results_batch", amount=response.replayed)
+    return response
+
+#Control sets: the levels of one analyte on one instrument, evaluated together by POST /runs/
+@router.post("/control-sets/", response_model=schemas_qc.ControlSet)
+async def create_control_set(control_set: schemas_qc.ControlSetCreate, db: AsyncSession = Depends(get_db)):
+    if not await crud_instrument.get_instrument(db, control_set.instrument_id):
+        raise HTTPException(status_code=404, detail="Instrument not found")
+    if len(set(control_set.test_ids)) != len(control_set.test_ids):
+        raise HTTPException(status_code=422, detail="A test definition can only be one level of the set")
+    if await crud_qc.find_control_set(db, control_set.instrument_id, control_set.analyte_name):
+        raise HTTPException(status_code=409, detail="This instrument already has a control set for that analyte")
+
+    for test_id in control_set.test_ids:
+        test_def = await crud_qc.get_test_definition(db, test_id)
+        if not test_def:
+            raise HTTPException(status_code=404, detail=f"Test definition {test_id} not found")
+        if test_def.instrument_id != control_set.instrument_id or test_def.analyte_name != control_set.analyte_name:
+            raise HTTPException(
+                status_code=422, detail=f"Test definition {test_id} is not {control_set.analyte_name} on this instrument"
+            )
+        if test_def.control_set_id is not None:
+            raise HTTPException(status_code=409, detail=f"Test definition {test_id} already belongs to a control set")
+
+    return await crud_qc.create_control_set(db, control_set)
+
+@router.get("/control-sets/", response_model=List[schemas_qc.ControlSet])
+async def read_control_sets(
+    response: Response,
+    instrument_id: Optional[int] = None,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    after_id = decode_cursor(cursor) if cursor else None
+    control_sets = await crud_qc.get_control_sets(
+        db, instrument_id=instrument_id, skip=skip, limit=limit, after_id=after_id
+    )
+    set_next_cursor(response, control_sets, limit)
+    return control_sets
+
+@router.get("/control-sets/{control_set_id}", response_model=schemas_qc.ControlSet)
+async def read_control_set(control_set_id: int, db: AsyncSession = Depends(get_db)):
+    control_set = await crud_qc.get_control_set(db, control_set_id)
+    if not control_set:
+        raise HTTPException(status_code=404, detail="Control set not found")
+    return control_set
+
+@router.post("/runs/", response_model=schemas_qc.QCRun)
+async def submit_qc_run(run: schemas_qc.QCRunCreate, db: AsyncSession = Depends(get_db)):
+    #Every level of one run in a single request: each level is judged on its own history, then the
+    #across-level rules (2-2s and R-4s within the run, 4-1s and 10-x across levels) over the whole set
+    control_set = await crud_qc.get_control_set(db, run.control_set_id)
+    if not control_set:
+        raise HTTPException(status_code=404, detail="Control set not found")
+
+    levels = {
+        test_def.id: schemas_qc.TestDefinition.model_validate(test_def) for test_def in control_set.test_definitions
+    }
+    submitted = [level.test_id for level in run.results]
+    unknown = [test_id for test_id in submitted if test_id not in levels]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Test definitions {unknown} are not levels of this control set")
+    if len(set(submitted)) != len(submitted):
+        raise HTTPException(status_code=422, detail="Each level can only be submitted once per run")
+
+    timestamp = run.timestamp or datetime.now(timezone.utc)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+
+    #Lowest level first, the order the results are stored in
+    ordered = sorted(run.results, key=lambda level: levels[level.test_id].control_level or 0)
+
+    #As of the run's time, which an analyzer may report behind results already stored
+    set_history = await crud_qc.get_recent_set_z_scores(db, list(levels.values()), before=timestamp)
+    level_results = []
+    for level in ordered:
+        test_def = levels[level.test_id]
+        history_z, history_floats = await history_at(db, test_def, timestamp)
+        level_results.append(run_rules_engine(level.value, test_def, history_z, history_floats))
+    evaluation = evaluate_run(level_results, set_history)
+
+    items = [
+        schemas_qc.QCResultBatchItem(
+            value=level.value, test_id=level.test_id, user_id=run.user_id,
+            user_comment=level.user_comment, timestamp=timestamp
+        )
+        for level in ordered
+    ]
+    return await crud_qc.create_qc_run(
+        db,
+        run=run,
+        timestamp=timestamp,
         status=evaluation.status,
-        system_comment=evaluation.message
+        system_comment=evaluation.message,
+        entries=[
+            (item, result.status, result.message, result.z_score)
+            for item, result in zip(items, evaluation.results)
+        ]
     )
 
+@router.get("/runs/{run_id}", response_model=schemas_qc.QCRun)
+async def read_qc_run(run_id: int, db: AsyncSession = Depends(get_db)):
+    db_run = await crud_qc.get_qc_run(db, run_id)
+    if not db_run:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return db_run
+
+#Listings are newest first. Pass the X-Next-Cursor header back as ?cursor= for the next page;
+#skip/limit still work for older clients but get slower the deeper they go.
 @router.get("/results/", response_model=List[schemas_qc.QCResult])
-def read_results(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    results = db.query(models.QCResult).filter(
-        models.QCResult.is_archived == False
-    ).offset(skip).limit(limit).all()
+async def read_results(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    test_id: Optional[int] = None,
+    instrument_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    after = decode_cursor(cursor, with_timestamp=True) if cursor else None
+    results = await crud_qc.get_results(
+        db, skip=skip, limit=limit, after=after,
+        test_id=test_id, instrument_id=instrument_id, start=start, end=end
+    )
+    set_next_cursor(response, results, limit, with_timestamp=True)
     return results
 
 @router.get("/audit-logs/", response_model=List[schemas_qc.AuditLog])
-def get_audit_logs(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    logs = db.query(models.AuditLog).order_by(models.AuditLog.timestamp.desc()).offset(skip).limit(limit).all()
+async def get_audit_logs(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    test_id: Optional[int] = None,
+    instrument_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    after = decode_cursor(cursor, with_timestamp=True) if cursor else None
+    logs = await crud_qc.get_audit_logs(
+        db, skip=skip, limit=limit, after=after,
+        test_id=test_id, instrument_id=instrument_id, start=start, end=end
+    )
+    set_next_cursor(response, logs, limit, with_timestamp=True)
     return logs
 
+@router.get("/audit-logs/{table_name}/{record_id}/state", response_model=schemas_qc.RecordState)
+async def get_record_state(
+    table_name: str,
+    record_id: int,
+    at: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    #Replays the record's audit deltas up to `at` (default: now)
+    replayed = await crud_audit.get_record_state(db, table_name, record_id, at=at)
+    if replayed is None:
+        raise HTTPException(status_code=404, detail="No audit history for this record at that time")
+    state, versions = replayed
+    return schemas_qc.RecordState(table_name=table_name, record_id=record_id, at=at, versions=versions, state=state)
+
 @router.patch("/results/{result_id}", response_model=schemas_qc.QCResult)
-def update_qc_result(
+async def update_qc_result(
     result_id: int, 
     update_data: schemas_qc.QCResultUpdate, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    db_result = db.query(models.QCResult).filter(models.QCResult.id == result_id).first()
+    db_result = await crud_qc.get_qc_result(db, result_id)
     if not db_result:
         raise HTTPException(status_code=404, detail="Result not found")
         
-    return crud_qc.update_qc_result(
+    return await crud_qc.update_qc_result(
         db=db, 
         db_result=db_result, 
         obj_in=update_data, 
     )
 
 @router.delete("/results/{result_id}")
-def archive_result(result_id: int, reviewer_id: int, db: Session = Depends(get_db)):
+async def archive_result(result_id: int, reviewer_id: int, db: AsyncSession = Depends(get_db)):
     raise HTTPException(status_code=403, detail="True deletes are disabled. Use Archive instead.")
     #Holding onto this code for now in case i want to add like an admin privilege to truly delete results
-    result = crud_qc.archive_qc_result(db, result_id=result_id, reviewer_id=reviewer_id)
+    result = await crud_qc.archive_qc_result(db, result_id=result_id, reviewer_id=reviewer_id)
     if not result:
         raise HTTPException(status_code=404, detail="Result not found")
     return {
@@ -124,38 +326,98 @@ def archive_result(result_id: int, reviewer_id: int, db: Session = Depends(get_d
         "data": result
     }
 
+def _json_default(value):
+    #Chart payloads carry numbers as numbers
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def _json_bytes(payload) -> bytes:
+    try:
+        import orjson
+    except ImportError:
+        return json.dumps(payload, default=_json_default, separators=(",", ":")).encode()
+    return orjson.dumps(payload, default=_json_default)
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    #Weak comparison: nginx's gzip turns strong ETags into W/ ones on the way out
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag.removeprefix("W/") for tag in if_none_match.split(","))
+
 @router.get("/test-definitions/{test_id}/stats", response_model=schemas_qc.TestStats)
-def get_test_stats(
+async def get_test_stats(
     test_id: int, 
+    response: Response,
     include_archived: bool = False,
-    db: Session = Depends(get_db)
+    limit: int = Query(30, ge=1, le=crud_qc.STATS_MAX_LIMIT),
+    format: Literal["full", "columnar"] = "full",
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    
-    stats = crud_qc.get_test_statistics(db, test_id=test_id, include_archived=include_archived)
+    #An unchanged test answers 304 after reading only its version
+    version = await crud_aggregates.get_version(db, test_id)
+    headers = {"Cache-Control": "no-cache"}
+    if version is not None:
+        headers["ETag"] = f'W/"{test_id}-{version}-{limit}-{int(include_archived)}-{format}"'
+        if _etag_matches(if_none_match, headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+
+    stats = await crud_qc.get_test_statistics(
+        db, test_id=test_id, limit=limit, include_archived=include_archived, fresh_definition=version is not None
+    )
     
     if not stats:
         raise HTTPException(
             status_code=404, 
             detail=f"Test definition with ID {test_id} not found or has no results."
         )
+    if format == "columnar":
+        return Response(_json_bytes(crud_qc.columnar_stats(stats)), media_type="application/json", headers=headers)
+    response.headers.update(headers)
     return stats
 
-def get_current_user(
-    db: Session = Depends(get_db), 
+@router.get("/qc-status", response_model=schemas_qc.QCStatusBoard)
+async def get_qc_status(
+    instrument_id: Optional[int] = None,
+    window: int = Query(30, ge=1, le=crud_qc.STATS_MAX_LIMIT),
+    db: AsyncSession = Depends(get_read_db)
+):
+    #Every test's latest result, open review items and window mean/SD in one query
+    return await crud_status_board.get_status_board(db, instrument_id=instrument_id, window=window)
+
+@router.get("/test-definitions/{test_id}/summary", response_model=schemas_qc.TestSummary)
+async def get_test_summary(
+    test_id: int,
+    granularity: Literal["day", "month"] = "day",
+    start: Optional[date] = Query(None, alias="from"),
+    end: Optional[date] = Query(None, alias="to"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    #Read from the daily rollup table, never from qc_results; from/to are inclusive UTC dates
+    if not await crud_qc.get_test_definition(db, test_id):
+        raise HTTPException(status_code=404, detail="Test definition not found")
+    return await crud_summaries.get_summary(db, test_id, granularity=granularity, start=start, end=end)
+
+async def get_current_user(
+    db: AsyncSession = Depends(get_db), 
     x_user_id: int = Header(None) # Looks for 'X-User-ID' in the request headers
-) -> models.User:
+) -> schemas_qc.User:
     if x_user_id is None:
         raise HTTPException(status_code=401, detail="User ID header missing")
 
-    query = select(models.User).where(models.User.id == x_user_id)
-    user = db.execute(query).scalar_one_or_none()
+    user = await crud_user.get_user(db, x_user_id)
 
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
         
     return user
 
-def get_current_supervisor(current_user: models.User = Depends(get_current_user)):
+async def get_current_supervisor(current_user: schemas_qc.User = Depends(get_current_user)):
     if current_user.role != models.UserRole.SUPERVISOR:
         raise HTTPException(
             status_code=403, 
@@ -164,15 +426,87 @@ def get_current_supervisor(current_user: models.User = Depends(get_current_user)
     return current_user
 
 @router.patch("/test-definitions/{test_id}", response_model=schemas_qc.TestDefinition)
-def patch_test_definition(
+async def patch_test_definition(
     test_id: int, 
     payload: dict,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
 
-    db_test = db.get(models.TestDefinition, test_id)
+    db_test = await crud_qc.get_test_definition(db, test_id)
     if not db_test:
         raise HTTPException(status_code=404, detail="Test definition not found")
         
-    updated_test = crud_qc.update_test_definition(db, test_id=test_id, updates=payload)
-    return updated_test
\ No newline at end of file
+    updated_test = await crud_qc.update_test_definition(db, test_id=test_id, updates=payload)
+    return updated_test
+
+@router.post("/test-definitions/{test_id}/reevaluate")
+async def reevaluate_test_results(
+    test_id: int,
+    write: bool = False,
+    reviewer_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    #numpy is only needed for retrospective runs, keep it off the submission import path
+    from app.logic.batch_rules import ENGINE_STATUSES, evaluate_westgard_batch
+
+    test_def = await crud_qc.get_test_definition(db, test_id)
+    if not test_def:
+        raise HTTPException(status_code=404, detail="Test definition not found")
+
+    series = await crud_qc.get_result_series(db, test_id)
+    evaluation = evaluate_westgard_batch([row.value for row in series], test_def.mean, test_def.std_dev)
+
+    changes = []
+    for row, status, message in zip(series, evaluation.statuses, evaluation.messages):
+        #Reviewed results keep the supervisor's decision, they still count as history above
+        if row.status not in ENGINE_STATUSES or row.status == status:
+            continue
+        #So do results stored by POST /runs/: their status includes the across-level rules,
+        #which this single-level pass can't reproduce
+        if row.run_id is not None:
+            continue
+        changes.append({
+            "id": row.id,
+            "timestamp": row.timestamp.isoformat() if row.timestamp else None,
+            "old_status": row.status,
+            "new_status": status,
+            "old_message": row.system_comment,
+            "message": message,
+        })
+
+    if write:
+        await crud_qc.apply_reevaluation(db, test_id=test_id, changes=changes, user_id=reviewer_id)
+
+    def stream_changes():
+        for change in changes:
+            yield json.dumps(change) + "\n"
+
+    return StreamingResponse(
+        stream_changes(),
+        media_type="application/x-ndjson",
+        headers={"X-Changed-Count": str(len(changes)), "X-Written": str(write).lower()}
+    )
+
+@router.get("/cache-stats")
+async def get_cache_stats():
+    #Hit/miss counters for the lookup caches in this worker process
+    return cache_stats()
+
+@router.get("/audit-writer-stats")
+async def get_audit_writer_stats(db: AsyncSession = Depends(get_db)):
+    #How far audit_logs trails the writes when AUDIT_WRITER=outbox (backlog is shared by all workers)
+    return {
+        "mode": crud_audit.AUDIT_WRITER,
+        "backlog": await crud_audit.outbox_backlog(db),
+        "writer": audit_writer.stats(),
+    }
+
+@router.get("/replica-stats")
+async def get_replica_stats():
+    #Health, lag and read counts of the read replicas, as seen by the worker that answers
+    return replica_set.stats()
+
+@router.get("/astm-listener-stats")
+async def get_astm_listener_stats():
+    #This worker's connections and results when the API runs the ASTM listener (ASTM_LISTEN_PORT)
+    return astm_listener.stats()
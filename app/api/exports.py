@@ -0,0 +1,168 @@
+import csv
+import io
+import json
+from datetime import datetime
+from enum import Enum
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import JSON, Boolean, DateTime, Integer, Numeric
+
+from app.crud import export as crud_export
+from app.db.replicas import replica_set
+
+router = APIRouter()
+
+class ExportFormat(str, Enum):
+    csv = "csv"
+    ndjson = "ndjson"
+    parquet = "parquet"
+
+MEDIA_TYPES = {
+    ExportFormat.csv: "text/csv",
+    ExportFormat.ndjson: "application/x-ndjson",
+    ExportFormat.parquet: "application/vnd.apache.parquet",
+}
+
+def _json_text(columns, partitions):
+    #JSON columns (audit changes) come through as objects; flat formats get their JSON text
+    positions = [index for index, column in enumerate(columns) if isinstance(column.type, JSON)]
+
+    async def gen():
+        async for rows in partitions:
+            if positions:
+                rows = [list(row) for row in rows]
+                for row in rows:
+                    for index in positions:
+                        if row[index] is not None:
+                            row[index] = json.dumps(row[index], default=str)
+            yield rows
+    return gen()
+
+def _csv_chunks(columns, partitions):
+    async def gen():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(crud_export.column_names(columns))
+        async for rows in _json_text(columns, partitions):
+            writer.writerows(rows)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+    return gen()
+
+def _ndjson_chunks(columns, partitions):
+    names = crud_export.column_names(columns)
+
+    async def gen():
+        async for rows in partitions:
+            yield "".join(json.dumps(dict(zip(names, row)), default=str) + "\n" for row in rows)
+    return gen()
+
+def _arrow_schema(pa, columns):
+    fields = []
+    for column in columns:
+        if isinstance(column.type, Boolean):
+            arrow_type = pa.bool_()
+        elif isinstance(column.type, Integer):
+            arrow_type = pa.int64()
+        elif isinstance(column.type, Numeric):
+            arrow_type = pa.decimal128(column.type.precision or 20, column.type.scale or 3)
+        elif isinstance(column.type, DateTime):
+            arrow_type = pa.timestamp("us", tz="UTC")
+        else:
+            #Strings, and JSON columns as their JSON text
+            arrow_type = pa.string()
+        fields.append(pa.field(column.key, arrow_type))
+    return pa.schema(fields)
+
+class _ChunkSink:
+    #File-like target for ParquetWriter that hands back whatever has been written since the last drain
+    closed = False
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+def _parquet_chunks(columns, partitions):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise HTTPException(status_code=501, detail="Parquet export needs pyarrow installed on the server")
+
+    schema = _arrow_schema(pa, columns)
+
+    async def gen():
+        sink = _ChunkSink()
+        #One row group per cursor batch, so memory stays at one batch however long the range is
+        writer = pq.ParquetWriter(sink, schema, compression="zstd")
+        async for rows in _json_text(columns, partitions):
+            writer.write_table(pa.Table.from_pylist([dict(zip(schema.names, row)) for row in rows], schema=schema))
+            yield sink.drain()
+        writer.close()
+        yield sink.drain()
+    return gen()
+
+ENCODERS = {
+    ExportFormat.csv: _csv_chunks,
+    ExportFormat.ndjson: _ndjson_chunks,
+    ExportFormat.parquet: _parquet_chunks,
+}
+
+def _export_response(name: str, format: ExportFormat, columns, stream_rows, **filters):
+    async def partitions():
+        #The request's session is gone by the time the body streams, so the export opens its own (on a replica when there is one)
+        async with replica_set.session() as db:
+            async for rows in stream_rows(db, **filters):
+                yield rows
+
+    suffix = "_".join(
+        value.strftime("%Y%m%d") for value in (filters.get("start"), filters.get("end")) if value is not None
+    )
+    filename = f"{name}{'_' + suffix if suffix else ''}.{format.value}"
+    return StreamingResponse(
+        ENCODERS[format](columns, partitions()),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@router.get("/export/results")
+async def export_results(
+    format: ExportFormat = ExportFormat.csv,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    test_id: Optional[int] = None,
+    instrument_id: Optional[int] = None,
+    include_archived: bool = False
+):
+    return _export_response(
+        "qc_results", format, crud_export.RESULT_COLUMNS, crud_export.stream_results,
+        start=start, end=end, test_id=test_id, instrument_id=instrument_id, include_archived=include_archived
+    )
+
+@router.get("/export/audit-logs")
+async def export_audit_logs(
+    format: ExportFormat = ExportFormat.csv,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    table_name: Optional[str] = None
+):
+    return _export_response(
+        "audit_logs", format, crud_export.AUDIT_COLUMNS, crud_export.stream_audit_logs,
+        start=start, end=end, table_name=table_name
+    )
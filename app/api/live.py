@@ -0,0 +1,97 @@
+import asyncio
+import json
+from typing import List
+
+from fastapi import APIRouter, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+
+from app.logic import live_feed
+
+router = APIRouter()
+
+#Keeps proxies from closing an idle stream and lets the server notice clients that went away
+HEARTBEAT_SECONDS = 15.0
+
+def _overflow_event(subscription, reported: int) -> dict:
+    return {"type": "feed.overflow", "dropped": subscription.dropped - reported}
+
+def _sse(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+@router.get("/live/results")
+async def live_results_sse(
+    request: Request,
+    instrument_id: List[int] = Query(default=[]),
+    test_id: List[int] = Query(default=[])
+):
+    """Server-Sent Events feed of result.created / result.updated / result.reevaluated.
+    Repeat instrument_id / test_id to watch several; with neither, every result is sent."""
+    subscription = live_feed.hub.subscribe(instrument_ids=instrument_id, test_ids=test_id)
+
+    async def stream():
+        reported = 0
+        try:
+            yield ": subscribed\n\n"
+            while True:
+                event = await subscription.get(timeout=HEARTBEAT_SECONDS)
+                if subscription.dropped > reported:
+                    yield _sse(_overflow_event(subscription, reported))
+                    reported = subscription.dropped
+                if event is not None:
+                    yield _sse(event)
+                elif await request.is_disconnected():
+                    break
+                else:
+                    yield ": keepalive\n\n"
+        finally:
+            subscription.close()
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.websocket("/live/ws")
+async def live_results_ws(
+    websocket: WebSocket,
+    instrument_id: List[int] = Query(default=[]),
+    test_id: List[int] = Query(default=[])
+):
+    """Same events as /live/results. Send {"instrument_ids": [...], "test_ids": [...]} at any time
+    to replace the subscription."""
+    await websocket.accept()
+    subscription = live_feed.hub.subscribe(instrument_ids=instrument_id, test_ids=test_id)
+
+    async def receive_updates():
+        while True:
+            message = await websocket.receive_json()
+            live_feed.hub.update(
+                subscription,
+                instrument_ids=message.get("instrument_ids", []),
+                test_ids=message.get("test_ids", [])
+            )
+
+    #The receiver ends (with WebSocketDisconnect) when the client goes away, which also ends the send loop
+    receiver = asyncio.create_task(receive_updates())
+    reported = 0
+    try:
+        while True:
+            getter = asyncio.ensure_future(subscription.queue.get())
+            done, _ = await asyncio.wait({getter, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            if receiver in done:
+                getter.cancel()
+                break
+            if subscription.dropped > reported:
+                await websocket.send_json(_overflow_event(subscription, reported))
+                reported = subscription.dropped
+            await websocket.send_json(getter.result())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        subscription.close()
+
+@router.get("/live/stats")
+async def live_feed_stats():
+    return live_feed.hub.stats()
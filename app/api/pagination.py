@@ -0,0 +1,40 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional
+
+from fastapi import HTTPException, Response
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(last_id: int, last_timestamp: Optional[datetime] = None) -> str:
+    """Opaque cursor pointing just past the last row of a page"""
+    payload = {"id": last_id}
+    if last_timestamp is not None:
+        payload["ts"] = last_timestamp.isoformat()
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, with_timestamp: bool = False):
+    """Returns id, or (timestamp, id) for time-ordered listings. Bad cursors are a client error."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded))
+        last_id = int(payload["id"])
+        if not with_timestamp:
+            return last_id
+        return datetime.fromisoformat(payload["ts"]), last_id
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+
+def set_next_cursor(response: Response, rows: list, limit: int, with_timestamp: bool = False):
+    #The body stays a plain list so existing clients are unaffected, the cursor rides in a header
+    if len(rows) < limit or not rows:
+        return
+    last = rows[-1]
+    response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+        last.id, last.timestamp if with_timestamp else None
+    )
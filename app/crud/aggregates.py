@@ -0,0 +1,140 @@
+from decimal import Decimal
+from datetime import datetime
+from typing import Optional, Sequence, Tuple
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import qc as models
+from app.logic import running_stats
+
+#Every helper here runs inside the caller's transaction and after its flush, so the qc_results
+#queries already see the row being created / re-statused. The caller commits.
+
+def _counts(status: Optional[str]) -> bool:
+    #Same population the stats endpoint has always used
+    return status != "ARCHIVED"
+
+async def _load_recent(db: AsyncSession, test_id: int):
+    stmt = (
+        select(models.QCResult.id, models.QCResult.value)
+        .where(models.QCResult.test_id == test_id)
+        .where(models.QCResult.status != "ARCHIVED")
+        .order_by(models.QCResult.timestamp.desc(), models.QCResult.id.desc())
+        .limit(running_stats.MAX_WINDOW)
+    )
+    return [[row.id, str(row.value)] for row in (await db.execute(stmt)).all()]
+
+async def _appends_to_window(db: AsyncSession, test_id: int, entries: Sequence[Tuple[int, Decimal, datetime]]) -> bool:
+    #push_recent can only put entries at the newest end; a backdated one belongs further in
+    timestamps = [timestamp for _, _, timestamp in entries]
+    if any(later < earlier for earlier, later in zip(timestamps, timestamps[1:])):
+        return False
+    stmt = (
+        select(models.QCResult.timestamp)
+        .where(models.QCResult.test_id == test_id)
+        .where(models.QCResult.status != "ARCHIVED")
+        .where(models.QCResult.id.not_in([result_id for result_id, _, _ in entries]))
+        .order_by(models.QCResult.timestamp.desc())
+        .limit(1)
+    )
+    newest = await db.scalar(stmt)
+    #Ties are fine: the window breaks them by id, and the new rows have the highest ones
+    return newest is None or timestamps[0] >= newest
+
+async def _build(db: AsyncSession, test_id: int) -> models.TestAggregate:
+    #Full recompute from qc_results; used to backfill tests that predate the aggregate table
+    stmt = (
+        select(
+            func.count(models.QCResult.id),
+            func.sum(models.QCResult.value),
+            func.sum(models.QCResult.value * models.QCResult.value)
+        )
+        .where(models.QCResult.test_id == test_id)
+        .where(models.QCResult.status != "ARCHIVED")
+    )
+    count, total, total_sq = (await db.execute(stmt)).one()
+    total = Decimal(total or 0)
+    m2 = float(Decimal(total_sq or 0) - total * total / count) if count else 0.0
+    return models.TestAggregate(
+        test_id=test_id,
+        count=count,
+        total=total,
+        m2=max(m2, 0.0),
+        recent=await _load_recent(db, test_id)
+    )
+
+async def _lock_aggregate(db: AsyncSession, test_id: int):
+    #Row lock serialises concurrent submissions for the same test (no-op on SQLite)
+    stmt = select(models.TestAggregate).where(models.TestAggregate.test_id == test_id).with_for_update()
+    return await db.scalar(stmt)
+
+async def create_empty(db: AsyncSession, test_id: int):
+    db.add(models.TestAggregate(test_id=test_id, count=0, total=Decimal("0"), m2=0.0, recent=[]))
+
+async def get_aggregate(db: AsyncSession, test_id: int) -> models.TestAggregate:
+    agg = await db.get(models.TestAggregate, test_id)
+    #A replica session can't store the backfill; the next read or write on the primary does
+    read_only = db.info.get("read_only", False)
+    if agg is None:
+        agg = await _build(db, test_id)
+        if not read_only:
+            db.add(agg)
+            await db.commit()
+    elif agg.recent is None:
+        agg.recent = await _load_recent(db, test_id)
+        if not read_only:
+            await db.commit()
+    return agg
+
+async def record_added(db: AsyncSession, test_id: int, entries: Sequence[Tuple[int, Decimal, str, datetime]]):
+    """entries are (result_id, value, status, timestamp) in insertion order"""
+    entries = [(result_id, value, timestamp) for result_id, value, status, timestamp in entries if _counts(status)]
+    if not entries:
+        return
+
+    agg = await _lock_aggregate(db, test_id)
+    if agg is None:
+        db.add(await _build(db, test_id))
+        return
+
+    count, total, m2 = agg.count, agg.total, agg.m2
+    for _, value, _ in entries:
+        count, total, m2 = running_stats.add_value(count, total, m2, value)
+    agg.count, agg.total, agg.m2 = count, total, m2
+    #In SQL rather than from the loaded value, which touch() may have moved on in this transaction
+    agg.version = models.TestAggregate.version + 1
+
+    if agg.recent is not None:
+        if await _appends_to_window(db, test_id, entries):
+            agg.recent = running_stats.push_recent(agg.recent, [(result_id, value) for result_id, value, _ in entries])
+        else:
+            agg.recent = await _load_recent(db, test_id)
+
+async def record_status_change(db: AsyncSession, test_id: int, result_id: int, value: Decimal, old_status: str, new_status: str):
+    was_counted, now_counted = _counts(old_status), _counts(new_status)
+    if was_counted == now_counted:
+        return
+
+    agg = await _lock_aggregate(db, test_id)
+    if agg is None:
+        db.add(await _build(db, test_id))
+        return
+
+    if now_counted:
+        agg.count, agg.total, agg.m2 = running_stats.add_value(agg.count, agg.total, agg.m2, value)
+    else:
+        agg.count, agg.total, agg.m2 = running_stats.remove_value(agg.count, agg.total, agg.m2, value)
+    #The result may sit anywhere in the rolling window, and removing one means pulling an older one in
+    agg.recent = await _load_recent(db, test_id)
+
+async def touch(db: AsyncSession, test_ids: Sequence[int]):
+    """Marks the tests' stats as changed (reviews, comments, re-evaluation, new targets) for ETag checks"""
+    await db.execute(
+        update(models.TestAggregate)
+        .where(models.TestAggregate.test_id.in_(sorted(set(test_ids))))
+        .values(version=models.TestAggregate.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+async def get_version(db: AsyncSession, test_id: int) -> Optional[int]:
+    #None until the test has an aggregate row
+    return await db.scalar(select(models.TestAggregate.version).where(models.TestAggregate.test_id == test_id))
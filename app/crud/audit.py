@@ -0,0 +1,128 @@
+import os
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import List, Optional
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import delete, func, inspect, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import qc as models
+
+#Audit rows store only what changed: {"field": {"old": ..., "new": ...}}. A CREATE carries every
+#column with old = None, so folding a record's rows in order rebuilds its state at any point.
+
+#"inline" writes audit_logs in the request's transaction. "outbox" writes the same row to audit_outbox instead
+#(still in that transaction, so an event exists exactly when its change does) and leaves the indexed
+#audit_logs insert to the background writer in app.logic.audit_writer
+AUDIT_WRITER = os.getenv("AUDIT_WRITER", "inline").lower()
+OUTBOX_ENABLED = AUDIT_WRITER == "outbox"
+OUTBOX_BATCH_SIZE = int(os.getenv("AUDIT_OUTBOX_BATCH_SIZE", "1000"))
+
+EVENT_COLUMNS = ["table_name", "record_id", "action", "changes", "user_id", "timestamp"]
+
+def _target():
+    return models.AuditOutbox if OUTBOX_ENABLED else models.AuditLog
+
+def _encode(value):
+    #Decimals stay strings so QC values keep their exact digits
+    return jsonable_encoder(value, custom_encoder={Decimal: str})
+
+def creation_changes(values: dict) -> dict:
+    return {
+        field: {"old": None, "new": value}
+        for field, value in _encode(values).items()
+        if value is not None
+    }
+
+def pending_changes(obj) -> dict:
+    """Column changes on obj since it was loaded/flushed. Must be called before the flush."""
+    state = inspect(obj)
+    changes = {}
+    for attr in state.mapper.column_attrs:
+        history = state.attrs[attr.key].history
+        if not history.has_changes():
+            continue
+        old = history.deleted[0] if history.deleted else None
+        new = history.added[0] if history.added else None
+        if old != new:
+            changes[attr.key] = _encode({"old": old, "new": new})
+    return changes
+
+def object_changes(obj) -> dict:
+    #Snapshot of a freshly flushed object, for CREATE rows. Unloaded (expired) columns are skipped
+    #rather than lazy-loaded, which the async session can't do implicitly
+    state = inspect(obj)
+    return creation_changes({
+        attr.key: getattr(obj, attr.key)
+        for attr in state.mapper.column_attrs
+        if attr.key not in state.unloaded
+    })
+
+def record(db: AsyncSession, table_name: str, record_id: int, action: str, changes: dict, user_id: Optional[int]):
+    db.add(_target()(
+        table_name=table_name,
+        record_id=record_id,
+        action=action,
+        changes=changes,
+        user_id=user_id
+    ))
+
+async def record_many(db: AsyncSession, rows: List[dict]):
+    """rows are dicts with table_name, record_id, action, changes and user_id; one multi-row insert"""
+    if rows:
+        await db.execute(insert(_target()), rows)
+
+async def get_record_state(db: AsyncSession, table_name: str, record_id: int, at: Optional[datetime] = None):
+    """Replays the delta chain up to `at` (inclusive). Returns (state, versions) or None if no history.
+    With the outbox writer, events not yet drained are not included."""
+    stmt = (
+        select(models.AuditLog.changes)
+        .where(models.AuditLog.table_name == table_name)
+        .where(models.AuditLog.record_id == record_id)
+        .order_by(models.AuditLog.timestamp, models.AuditLog.id)
+    )
+    if at is not None:
+        stmt = stmt.where(models.AuditLog.timestamp <= at)
+
+    state = {}
+    versions = 0
+    for changes in (await db.scalars(stmt)).all():
+        versions += 1
+        for field, change in (changes or {}).items():
+            state[field] = change.get("new")
+    if versions == 0:
+        return None
+    return state, versions
+
+async def drain_outbox(db: AsyncSession, batch_size: int = OUTBOX_BATCH_SIZE) -> int:
+    """Moves the oldest outbox batch into audit_logs: one INSERT ... SELECT and one DELETE in a single
+    transaction, so a crash leaves each event either still queued or written, never both or neither."""
+    outbox = models.AuditOutbox
+    #Row locks keep two drainers from copying the same events; the second waits and then sees the next batch
+    ids = (await db.scalars(
+        select(outbox.id).order_by(outbox.id).limit(batch_size).with_for_update()
+    )).all()
+    if not ids:
+        await db.commit()
+        return 0
+
+    source = (
+        select(*(getattr(outbox, column) for column in EVENT_COLUMNS))
+        .where(outbox.id.in_(ids))
+        .order_by(outbox.id)
+    )
+    await db.execute(insert(models.AuditLog).from_select(EVENT_COLUMNS, source))
+    await db.execute(delete(outbox).where(outbox.id.in_(ids)))
+    await db.commit()
+    return len(ids)
+
+async def outbox_backlog(db: AsyncSession) -> dict:
+    """Queued event count and the age of the oldest one, i.e. how far audit_logs trails the writes"""
+    pending, oldest = (await db.execute(
+        select(func.count(models.AuditOutbox.id), func.min(models.AuditOutbox.timestamp))
+    )).one()
+    lag = None
+    if oldest is not None:
+        if oldest.tzinfo is None:
+            oldest = oldest.replace(tzinfo=timezone.utc)
+        lag = max(0.0, (datetime.now(timezone.utc) - oldest).total_seconds())
+    return {"pending": pending, "oldest": oldest, "lag_seconds": lag}
@@ -0,0 +1,145 @@
+from datetime import datetime
+from typing import Optional
+import json
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import iterate_in_threadpool
+from app.db import cold_storage
+from app.models import qc as models
+
+#Rows fetched per round trip from the server-side cursor; also the size of each streamed chunk
+EXPORT_BATCH_SIZE = 5000
+
+RESULT_COLUMNS = [
+    models.QCResult.id,
+    models.QCResult.timestamp,
+    models.QCResult.value,
+    models.QCResult.status,
+    models.QCResult.is_archived,
+    models.QCResult.system_comment,
+    models.QCResult.user_comment,
+    models.QCResult.user_id,
+    models.QCResult.reviewed_by_name,
+    models.QCResult.reviewer_comment,
+    models.QCResult.test_id,
+    models.TestDefinition.analyte_name,
+    models.TestDefinition.units,
+    models.TestDefinition.mean.label("target_mean"),
+    models.TestDefinition.std_dev.label("target_sd"),
+    models.TestDefinition.instrument_id,
+    models.Instrument.name.label("instrument_name"),
+    models.Instrument.serial_number,
+]
+
+AUDIT_COLUMNS = [
+    models.AuditLog.id,
+    models.AuditLog.timestamp,
+    models.AuditLog.table_name,
+    models.AuditLog.record_id,
+    models.AuditLog.action,
+    models.AuditLog.changes,
+    models.AuditLog.user_id,
+]
+
+def column_names(columns) -> list:
+    return [column.key for column in columns]
+
+def _time_range(stmt, column, start: Optional[datetime], end: Optional[datetime]):
+    if start is not None:
+        stmt = stmt.where(column >= start)
+    if end is not None:
+        stmt = stmt.where(column < end)
+    return stmt
+
+async def _cold_partitions(table_name: str, filters, start: Optional[datetime], end: Optional[datetime]):
+    #Archived months come first (they're older than anything left in the table); the Parquet scan runs off the event loop
+    if not cold_storage.archived_months(table_name):
+        return
+    batches = cold_storage.iter_rows(table_name, filters, start, end, batch_size=EXPORT_BATCH_SIZE)
+    async for batch in iterate_in_threadpool(batches):
+        yield batch
+
+async def _result_lookup(db: AsyncSession, test_id: Optional[int], instrument_id: Optional[int]):
+    #Archived rows only carry test_id; the test/instrument columns are joined here from the (small) live tables
+    stmt = select(
+        models.TestDefinition.id,
+        models.TestDefinition.analyte_name,
+        models.TestDefinition.units,
+        models.TestDefinition.mean,
+        models.TestDefinition.std_dev,
+        models.TestDefinition.instrument_id,
+        models.Instrument.name,
+        models.Instrument.serial_number,
+    ).join(models.Instrument, models.TestDefinition.instrument_id == models.Instrument.id)
+    if test_id is not None:
+        stmt = stmt.where(models.TestDefinition.id == test_id)
+    if instrument_id is not None:
+        stmt = stmt.where(models.TestDefinition.instrument_id == instrument_id)
+    return {row[0]: tuple(row[1:]) for row in (await db.execute(stmt)).all()}
+
+async def stream_results(
+    db: AsyncSession,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    test_id: Optional[int] = None,
+    instrument_id: Optional[int] = None,
+    include_archived: bool = False
+):
+    """Yields lists of row tuples (RESULT_COLUMNS order), oldest first, without loading the whole range.
+    Months moved to the cold archive are read back from their Parquet files ahead of the table."""
+    if cold_storage.archived_months("qc_results"):
+        lookup = await _result_lookup(db, test_id, instrument_id)
+        filters = [("test_id", "in", list(lookup))]
+        if not include_archived:
+            filters.append(("status", "!=", "ARCHIVED"))
+        async for batch in _cold_partitions("qc_results", filters, start, end):
+            yield [
+                (
+                    row["id"], row["timestamp"], row["value"], row["status"], row["is_archived"],
+                    row["system_comment"], row["user_comment"], row["user_id"], row["reviewed_by_name"],
+                    row["reviewer_comment"], row["test_id"], *lookup[row["test_id"]]
+                )
+                for row in batch
+            ]
+
+    stmt = (
+        select(*RESULT_COLUMNS)
+        .join(models.TestDefinition, models.QCResult.test_id == models.TestDefinition.id)
+        .join(models.Instrument, models.TestDefinition.instrument_id == models.Instrument.id)
+        .order_by(models.QCResult.timestamp, models.QCResult.id)
+    )
+    stmt = _time_range(stmt, models.QCResult.timestamp, start, end)
+    if not include_archived:
+        stmt = stmt.where(models.QCResult.status != "ARCHIVED")
+    if test_id is not None:
+        stmt = stmt.where(models.QCResult.test_id == test_id)
+    if instrument_id is not None:
+        stmt = stmt.where(models.TestDefinition.instrument_id == instrument_id)
+
+    result = await db.stream(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+    async for partition in result.partitions():
+        yield partition
+
+async def stream_audit_logs(
+    db: AsyncSession,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    table_name: Optional[str] = None
+):
+    """Yields lists of row tuples (AUDIT_COLUMNS order), oldest first, archived months included"""
+    filters = [("table_name", "=", table_name)] if table_name is not None else []
+    async for batch in _cold_partitions("audit_logs", filters, start, end):
+        #changes is kept as JSON text in the archive; decode it so both sources yield the same values
+        for row in batch:
+            if row["changes"] is not None:
+                row["changes"] = json.loads(row["changes"])
+        yield [tuple(row[column.key] for column in AUDIT_COLUMNS) for row in batch]
+
+    stmt = select(*AUDIT_COLUMNS).order_by(models.AuditLog.timestamp, models.AuditLog.id)
+    stmt = _time_range(stmt, models.AuditLog.timestamp, start, end)
+    if table_name is not None:
+        stmt = stmt.where(models.AuditLog.table_name == table_name)
+
+    result = await db.stream(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+    async for partition in result.partitions():
+        yield partition
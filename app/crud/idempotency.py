@@ -0,0 +1,68 @@
+import os
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import cache
+from app.models import qc as models
+
+#Analyzer middleware retries POST /results/ on timeout. A submission carrying an Idempotency-Key header,
+#or an instrument_run_id + sample_sequence, is stored at most once: qc_submission_keys maps the key to
+#the result it created and a repeat gets that result back without being evaluated or written again.
+#Keys are only needed for as long as a retry can arrive; the retention job removes older ones.
+KEY_RETENTION_DAYS = int(os.getenv("IDEMPOTENCY_KEY_DAYS", "30"))
+
+def submission_key(result, idempotency_key: Optional[str] = None) -> Optional[str]:
+    if idempotency_key:
+        return f"key:{idempotency_key}"
+    run_id = getattr(result, "instrument_run_id", None)
+    sequence = getattr(result, "sample_sequence", None)
+    if run_id and sequence is not None:
+        #The same sample is run for several analytes, so the test is part of the key
+        return f"run:{result.test_id}:{run_id}:{sequence}"
+    return None
+
+def matches(result, original: models.QCResult) -> bool:
+    #A reused key with a different payload is a client bug, not a retry
+    return (
+        result.test_id == original.test_id
+        and Decimal(result.value).quantize(Decimal("0.001")) == original.value
+    )
+
+def add_key(db: AsyncSession, key: str, result_id: int):
+    db.add(models.SubmissionKey(key=key, result_id=result_id))
+
+async def add_keys(db: AsyncSession, rows: List[Tuple[str, int]]):
+    if rows:
+        await db.execute(insert(models.SubmissionKey), [{"key": key, "result_id": result_id} for key, result_id in rows])
+
+def remember(rows: Iterable[Tuple[str, int]]):
+    #Only after the commit, so the cache never points at a result that was rolled back
+    for key, result_id in rows:
+        cache.submission_keys.set(key, result_id)
+
+async def find_results(db: AsyncSession, keys: Iterable[str]) -> Dict[str, models.QCResult]:
+    """Stored results for the keys that have one. Recent keys are answered from the cache; the rest
+    with one lookup on qc_submission_keys."""
+    result_ids, missing = {}, []
+    for key in set(keys):
+        result_id = cache.submission_keys.get(key)
+        if result_id is None:
+            missing.append(key)
+        else:
+            result_ids[key] = result_id
+
+    if missing:
+        stmt = select(models.SubmissionKey.key, models.SubmissionKey.result_id).where(models.SubmissionKey.key.in_(missing))
+        for key, result_id in (await db.execute(stmt)).all():
+            result_ids[key] = result_id
+            cache.submission_keys.set(key, result_id)
+    if not result_ids:
+        return {}
+
+    stmt = select(models.QCResult).where(models.QCResult.id.in_(set(result_ids.values())))
+    by_id = {result.id: result for result in (await db.scalars(stmt)).all()}
+    return {key: by_id[result_id] for key, result_id in result_ids.items() if result_id in by_id}
+
+async def find_result(db: AsyncSession, key: str) -> Optional[models.QCResult]:
+    return (await find_results(db, [key])).get(key)
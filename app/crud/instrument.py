@@ -1,16 +1,28 @@
-from sqlalchemy.orm import Session
+from typing import Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import cache
 from app.models.qc import Instrument
-from app.schemas.qc import InstrumentCreate
+from app.schemas.qc import InstrumentCreate, Instrument as InstrumentSnapshot
 
-def get_instrument(db: Session, instrument_id: int):
-    """Retrieve a single instrument by its ID"""
-    return db.query(Instrument).filter(Instrument.id == instrument_id).first()
+async def get_instrument(db: AsyncSession, instrument_id: int):
+    """Retrieve a single instrument by its ID (cached read-only snapshot)"""
+    async def load():
+        db_instrument = await db.get(Instrument, instrument_id)
+        return InstrumentSnapshot.model_validate(db_instrument) if db_instrument else None
 
-def get_instruments(db: Session, skip: int = 0, limit: int = 100):
-    """Retrieve a list of instruments (with pagination)"""
-    return db.query(Instrument).offset(skip).limit(limit).all()
+    return await cache.instruments.get_or_load(instrument_id, load)
 
-def create_instrument(db: Session, instrument: InstrumentCreate):
+async def get_instruments(db: AsyncSession, skip: int = 0, limit: int = 100, after_id: Optional[int] = None):
+    """Retrieve a list of instruments (with pagination). after_id switches from offset to keyset paging"""
+    stmt = select(Instrument).order_by(Instrument.id)
+    if after_id is not None:
+        stmt = stmt.where(Instrument.id > after_id)
+    else:
+        stmt = stmt.offset(skip)
+    return (await db.scalars(stmt.limit(limit))).all()
+
+async def create_instrument(db: AsyncSession, instrument: InstrumentCreate):
     """Create a new instrument record in the database"""
     db_instrument = Instrument(
         name=instrument.name,
@@ -18,6 +30,7 @@ def create_instrument(db: Session, instrument: InstrumentCreate):
         serial_number=instrument.serial_number
     )
     db.add(db_instrument)
-    db.commit()
-    db.refresh(db_instrument)
-    return db_instrument
\ No newline at end of file
+    await db.commit()
+    cache.instruments.invalidate(db_instrument.id)
+    await db.refresh(db_instrument)
+    return db_instrument
@@ -1,44 +1,129 @@
-import json
-import statistics
-from fastapi.encoders import jsonable_encoder
-from sqlalchemy import update
-from sqlalchemy.orm import Session
+import asyncio
+import os
+from collections import defaultdict
+from sqlalchemy import insert, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 from app.models import qc as models
 from app.schemas import qc as schemas
-from typing import Optional
+from app.crud import aggregates, audit, idempotency, summaries
+from app.db import cache, cold_storage
+from app.logic import history_window, live_feed, running_stats
+from app.logic.rules_engine import calculate_z_score
+from typing import List, Optional
+from datetime import datetime
 from decimal import Decimal
 
 
+#Largest chart window GET /test-definitions/{id}/stats will return
+STATS_MAX_LIMIT = int(os.getenv("QC_STATS_MAX_LIMIT", "1000"))
+
+
 #Test Definition CRUD
-def create_test_definition(db: Session, test: schemas.TestDefinitionCreate):
+async def create_test_definition(db: AsyncSession, test: schemas.TestDefinitionCreate):
     db_test = models.TestDefinition(**test.model_dump())
     db.add(db_test)
-    db.commit()
-    db.refresh(db_test)
+    await db.flush()
+    await aggregates.create_empty(db, db_test.id)
+    await db.commit()
+    cache.test_definitions.invalidate(db_test.id)
+    await db.refresh(db_test)
     return db_test
 
-def get_test_definitions(db: Session, instrument_id: Optional[int] = None, skip: int = 0, limit: int = 100):
-    query = db.query(models.TestDefinition)
+async def _load_test_definition(db: AsyncSession, test_id: int):
+    #Read-only snapshot (schema object) so it can outlive the session that loaded it
+    db_test = await db.get(models.TestDefinition, test_id)
+    return schemas.TestDefinition.model_validate(db_test) if db_test else None
+
+async def get_test_definition(db: AsyncSession, test_id: int):
+    async def load():
+        return await _load_test_definition(db, test_id)
+
+    if db.info.get("read_only"):
+        #A lagging replica's copy must never land in the cache submissions are evaluated against
+        return cache.test_definitions.get(test_id) or await load()
+    return await cache.test_definitions.get_or_load(test_id, load)
+
+async def get_test_definitions(
+    db: AsyncSession,
+    instrument_id: Optional[int] = None,
+    skip: int = 0,
+    limit: int = 100,
+    after_id: Optional[int] = None
+):
+    stmt = select(models.TestDefinition).order_by(models.TestDefinition.id)
     #If looking for tests only on a given instrument, else just return all tests
     if instrument_id:
-        query = query.filter(models.TestDefinition.instrument_id == instrument_id)
-    return query.offset(skip).limit(limit).all()
+        stmt = stmt.where(models.TestDefinition.instrument_id == instrument_id)
+    if after_id is not None:
+        stmt = stmt.where(models.TestDefinition.id > after_id)
+    else:
+        stmt = stmt.offset(skip)
+    return (await db.scalars(stmt.limit(limit))).all()
 
-def update_test_definition(db: Session, test_id: int, updates: dict):
+async def update_test_definition(db: AsyncSession, test_id: int, updates: dict):
     stmt = (
         update(models.TestDefinition)
         .where(models.TestDefinition.id == test_id)
         .values(**updates)
         .execution_options(synchronize_session="fetch")
     )
-    
-    db.execute(stmt)
-    db.commit()
-    
-    return db.get(models.TestDefinition, test_id)
+
+    await db.execute(stmt)
+    await aggregates.touch(db, [test_id])
+    await db.commit()
+    cache.test_definitions.invalidate(test_id)
+
+    #Cached z-scores were computed against the old targets
+    if "mean" in updates or "std_dev" in updates:
+        history_window.invalidate(test_id)
+
+    return await db.get(models.TestDefinition, test_id, populate_existing=True)
 
 #QC Result CRUD
-def create_qc_result(db: Session, result: schemas.QCResultCreate, status: str, system_comment: str):
+async def _publish_results(db: AsyncSession, kind: str, db_results):
+    #Live feed events for committed results, tagged with the instrument so subscribers can filter on it
+    if not db_results or not live_feed.active():
+        return
+    events = []
+    for db_result in db_results:
+        test_def = await get_test_definition(db, db_result.test_id)
+        events.append(live_feed.result_event(kind, db_result, test_def.instrument_id if test_def else None))
+    await live_feed.publish(events)
+
+async def get_qc_result(db: AsyncSession, result_id: int):
+    return await db.get(models.QCResult, result_id)
+
+async def get_recent_z_scores(
+    db: AsyncSession,
+    test_def: schemas.TestDefinition,
+    limit: int = history_window.WINDOW_SIZE,
+    before: Optional[datetime] = None
+):
+    #(timestamp, z-score), newest first, the order evaluate_westgard expects its history in.
+    #before: only results run up to that time, for judging a backdated result
+    stmt = (
+        select(models.QCResult.timestamp, models.QCResult.value)
+        .where(models.QCResult.test_id == test_def.id)
+        .where(models.QCResult.status != "ARCHIVED")
+        .order_by(models.QCResult.timestamp.desc(), models.QCResult.id.desc())
+        .limit(limit)
+    )
+    if before is not None:
+        stmt = stmt.where(models.QCResult.timestamp <= before)
+    rows = (await db.execute(stmt)).all()
+
+    return [(row.timestamp, calculate_z_score(row.value, test_def.mean, test_def.std_dev)) for row in rows]
+
+async def create_qc_result(
+    db: AsyncSession,
+    result: schemas.QCResultCreate,
+    status: str,
+    system_comment: str,
+    z_score: Optional[Decimal] = None,
+    submission_key: Optional[str] = None
+):
     #Ideally the analyzer would always pass a user_id, but this ensures that even if one isn't supplied, the result still posts
     acting_user = result.user_id if result.user_id is not None else 1
 
@@ -48,113 +133,483 @@ def create_qc_result(db: Session, result: schemas.QCResultCreate, status: str, s
         user_comment=result.user_comment,
         user_id=acting_user,
         system_comment=system_comment,
-        status=status
+        status=status,
+        instrument_run_id=result.instrument_run_id,
+        sample_sequence=result.sample_sequence
     )
     db.add(db_result)
-    db.flush()
+    await db.flush()
 
-    audit_data = {
-        "value": str(result.value),
-        "status": status,
-        "system_comment": system_comment
-    }
-    db_audit = models.AuditLog(
-        table_name="qc_results",
-        record_id=db_result.id,
-        action="CREATE",
-        new_value=json.dumps(audit_data),
-        user_id=acting_user
-    )
-    db.add(db_audit)
-    db.commit()  
-    db.refresh(db_result)
+    audit.record(db, "qc_results", db_result.id, "CREATE", audit.object_changes(db_result), acting_user)
+    if submission_key is not None:
+        #A concurrent retry that got here first makes this commit fail on the key's primary key
+        idempotency.add_key(db, submission_key, db_result.id)
+    await aggregates.record_added(db, result.test_id, [(db_result.id, result.value, status, db_result.timestamp)])
+    await summaries.record_added(db, result.test_id, [(db_result.timestamp, result.value, status, system_comment)])
+    await db.commit()
+
+    if submission_key is not None:
+        idempotency.remember([(submission_key, db_result.id)])
+    if z_score is not None:
+        history_window.push(result.test_id, z_score, db_result.timestamp)
+
+    await db.refresh(db_result)
+    await _publish_results(db, "created", [db_result])
     return db_result
 
-def update_qc_result(db: Session, db_result: models.QCResult, obj_in: schemas.QCResultUpdate):
-    old_data = jsonable_encoder(db_result)
-    
+async def _insert_results(db: AsyncSession, entries: List[tuple], run_id: Optional[int] = None):
+    #Multi-row inserts for the results, their audit rows and aggregates; the caller commits
+    result_rows = []
+    for result, status, system_comment, _ in entries:
+        result_rows.append({
+            "value": result.value,
+            "test_id": result.test_id,
+            "timestamp": result.timestamp,
+            "user_comment": result.user_comment,
+            "user_id": result.user_id if result.user_id is not None else 1,
+            "system_comment": system_comment,
+            "status": status,
+            "is_archived": False,
+            "run_id": run_id,
+            "instrument_run_id": getattr(result, "instrument_run_id", None),
+            "sample_sequence": getattr(result, "sample_sequence", None),
+        })
+
+    db_results = (await db.scalars(
+        insert(models.QCResult).returning(models.QCResult, sort_by_parameter_order=True),
+        result_rows
+    )).all()
+
+    await audit.record_many(db, [
+        {
+            "table_name": "qc_results",
+            "record_id": db_result.id,
+            "action": "CREATE",
+            "changes": audit.object_changes(db_result),
+            "user_id": row["user_id"],
+        }
+        for db_result, row in zip(db_results, result_rows)
+    ])
+
+    added_by_test = defaultdict(list)
+    for db_result, row in zip(db_results, result_rows):
+        added_by_test[row["test_id"]].append(db_result)
+    for test_id, added in added_by_test.items():
+        await aggregates.record_added(db, test_id, [(r.id, r.value, r.status, r.timestamp) for r in added])
+        await summaries.record_added(db, test_id, [(r.timestamp, r.value, r.status, r.system_comment) for r in added])
+    return db_results
+
+def _push_history(entries: List[tuple], db_results):
+    #In commit order; a backdated result makes its test's window reload rather than land at the newest end
+    for (result, _, _, z_score), db_result in zip(entries, db_results):
+        if z_score is not None:
+            history_window.push(result.test_id, z_score, db_result.timestamp)
+
+async def create_qc_results_bulk(db: AsyncSession, entries: List[tuple]):
+    #entries are (result, status, system_comment, z_score) with result.timestamp already resolved
+    #One multi-row insert per table and a single commit for the whole batch
+    if not entries:
+        return []
+
+    db_results = await _insert_results(db, entries)
+    keys = [
+        (key, db_result.id)
+        for (result, _, _, _), db_result in zip(entries, db_results)
+        if (key := idempotency.submission_key(result)) is not None
+    ]
+    await idempotency.add_keys(db, keys)
+    await db.commit()
+
+    idempotency.remember(keys)
+    _push_history(entries, db_results)
+    await _publish_results(db, "created", db_results)
+    return db_results
+
+#Control sets and multi-level runs
+async def get_control_set(db: AsyncSession, control_set_id: int):
+    stmt = (
+        select(models.ControlSet)
+        .where(models.ControlSet.id == control_set_id)
+        .options(selectinload(models.ControlSet.test_definitions))
+    )
+    return (await db.scalars(stmt)).first()
+
+async def get_control_sets(
+    db: AsyncSession,
+    instrument_id: Optional[int] = None,
+    skip: int = 0,
+    limit: int = 100,
+    after_id: Optional[int] = None
+):
+    stmt = (
+        select(models.ControlSet)
+        .options(selectinload(models.ControlSet.test_definitions))
+        .order_by(models.ControlSet.id)
+    )
+    if instrument_id:
+        stmt = stmt.where(models.ControlSet.instrument_id == instrument_id)
+    if after_id is not None:
+        stmt = stmt.where(models.ControlSet.id > after_id)
+    else:
+        stmt = stmt.offset(skip)
+    return (await db.scalars(stmt.limit(limit))).all()
+
+async def find_control_set(db: AsyncSession, instrument_id: int, analyte_name: str):
+    stmt = select(models.ControlSet.id).where(
+        models.ControlSet.instrument_id == instrument_id, models.ControlSet.analyte_name == analyte_name
+    )
+    return (await db.scalars(stmt)).first()
+
+async def create_control_set(db: AsyncSession, control_set: schemas.ControlSetCreate):
+    db_set = models.ControlSet(
+        instrument_id=control_set.instrument_id,
+        analyte_name=control_set.analyte_name,
+        name=control_set.name
+    )
+    db.add(db_set)
+    await db.flush()
+
+    #Levels follow the order of test_ids, lowest first
+    for level, test_id in enumerate(control_set.test_ids, start=1):
+        await db.execute(
+            update(models.TestDefinition)
+            .where(models.TestDefinition.id == test_id)
+            .values(control_set_id=db_set.id, control_level=level)
+        )
+    await aggregates.touch(db, control_set.test_ids)
+    await db.commit()
+    for test_id in control_set.test_ids:
+        cache.test_definitions.invalidate(test_id)
+    return await get_control_set(db, db_set.id)
+
+async def get_recent_set_z_scores(
+    db: AsyncSession,
+    test_defs: List[schemas.TestDefinition],
+    limit: int = history_window.WINDOW_SIZE,
+    before: Optional[datetime] = None
+):
+    #Newest first across every level of a control set, each value scored against its own level's targets
+    by_id = {test_def.id: test_def for test_def in test_defs}
+    stmt = (
+        select(models.QCResult.test_id, models.QCResult.value)
+        .where(models.QCResult.test_id.in_(by_id))
+        .where(models.QCResult.status != "ARCHIVED")
+        .order_by(models.QCResult.timestamp.desc(), models.QCResult.id.desc())
+        .limit(limit)
+    )
+    if before is not None:
+        stmt = stmt.where(models.QCResult.timestamp <= before)
+    rows = (await db.execute(stmt)).all()
+    return [
+        calculate_z_score(row.value, by_id[row.test_id].mean, by_id[row.test_id].std_dev) for row in rows
+    ]
+
+async def create_qc_run(
+    db: AsyncSession,
+    run: schemas.QCRunCreate,
+    timestamp: datetime,
+    status: str,
+    system_comment: str,
+    entries: List[tuple]
+):
+    #The run and every level's result, audit row and aggregate update commit together
+    db_run = models.QCRun(
+        control_set_id=run.control_set_id,
+        timestamp=timestamp,
+        user_id=run.user_id if run.user_id is not None else 1,
+        status=status,
+        system_comment=system_comment
+    )
+    db.add(db_run)
+    await db.flush()
+
+    db_results = await _insert_results(db, entries, run_id=db_run.id)
+    await db.commit()
+    set_committed_value(db_run, "results", list(db_results))
+
+    _push_history(entries, db_results)
+    await _publish_results(db, "created", db_results)
+    return db_run
+
+async def get_qc_run(db: AsyncSession, run_id: int):
+    stmt = select(models.QCRun).where(models.QCRun.id == run_id).options(selectinload(models.QCRun.results))
+    return (await db.scalars(stmt)).first()
+
+#QCResultUpdate field names that differ from the column they write to
+UPDATE_FIELD_COLUMNS = {
+    "reviewer_id": "reviewed_by_id",
+    "review_comment": "reviewer_comment",
+}
+
+async def update_qc_result(db: AsyncSession, db_result: models.QCResult, obj_in: schemas.QCResultUpdate):
     update_data = obj_in.model_dump(exclude_unset=True)
     reviewer_id = update_data.get("reviewer_id", None)
+    old_status = db_result.status
+    status_changed = "status" in update_data and update_data["status"] != old_status
     for field in update_data:
-        setattr(db_result, field, update_data[field])
-    
+        setattr(db_result, UPDATE_FIELD_COLUMNS.get(field, field), update_data[field])
+
+    #Attribute history is only available until the flush
+    changes = audit.pending_changes(db_result)
     db.add(db_result)
-    db.flush()
+    await db.flush()
 
-    new_data = jsonable_encoder(db_result)
+    audit.record(db, "qc_results", db_result.id, "UPDATE", changes, reviewer_id)
+    if status_changed:
+        await aggregates.record_status_change(
+            db, db_result.test_id, db_result.id, db_result.value, old_status, db_result.status
+        )
+        await summaries.record_status_change(
+            db, db_result.test_id, db_result.timestamp, db_result.value, db_result.system_comment,
+            old_status, db_result.status
+        )
+    await aggregates.touch(db, [db_result.test_id])
+    await db.commit()
 
-    db_audit = models.AuditLog(
-        table_name="qc_results",
-        record_id=db_result.id,
-        action="UPDATE",
-        old_value=json.dumps(old_data),
-        new_value=json.dumps(new_data),
-        user_id=reviewer_id
-    )
-    
-    db.add(db_audit)
-    db.commit()
-    db.refresh(db_result)
+    #Status decides whether the result still counts towards the Westgard history
+    if status_changed:
+        history_window.invalidate(db_result.test_id)
+
+    await db.refresh(db_result)
+    await _publish_results(db, "updated", [db_result])
     return db_result
 
-def archive_qc_result(db: Session, result_id: int, reviewer_id: int, reviewer_name: str):
-    db_result = db.query(models.QCResult).filter(models.QCResult.id == result_id).first()
+async def archive_qc_result(db: AsyncSession, result_id: int, reviewer_id: int, reviewer_name: str):
+    db_result = await db.get(models.QCResult, result_id)
     if not db_result:
         return None
 
-    old_data = jsonable_encoder(db_result)
     db_result.is_archived = True
     db_result.reviewed_by_name = reviewer_name
-    db_result.reviewer_id = reviewer_id
-    
+    db_result.reviewed_by_id = reviewer_id
+
+    changes = audit.pending_changes(db_result)
     db.add(db_result)
-    db.flush()
-
-    db_audit = models.AuditLog(
-        table_name="qc_results",
-        record_id=db_result.id,
-        action="ARCHIVE",
-        old_value=json.dumps(old_data),
-        new_value=json.dumps({"is_archived": True}),
-        user_id=reviewer_id
-    )
-    
-    db.add(db_audit)
-    db.commit()
+    await db.flush()
+
+    audit.record(db, "qc_results", db_result.id, "ARCHIVE", changes, reviewer_id)
+    await aggregates.touch(db, [db_result.test_id])
+    await db.commit()
+    history_window.invalidate(db_result.test_id)
+    await _publish_results(db, "updated", [db_result])
     return db_result
 
-def get_test_statistics(db: Session, test_id: int, limit: int = 30, include_archived: bool = False):
-    test_def = db.query(models.TestDefinition).filter(models.TestDefinition.id == test_id).first()
-    
-    query = db.query(models.QCResult).filter(models.QCResult.test_id == test_id)
+async def _page_newest_first(db: AsyncSession, stmt, model, skip: int, limit: int, after: Optional[tuple]):
+    #Keyset on (timestamp, id) walks the timestamp index instead of counting past `skip` rows
+    stmt = stmt.order_by(model.timestamp.desc(), model.id.desc())
+    if after is not None:
+        stmt = stmt.where(tuple_(model.timestamp, model.id) < tuple_(*after))
+    else:
+        stmt = stmt.offset(skip)
+    return (await db.scalars(stmt.limit(limit))).all()
+
+async def get_results(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[tuple] = None,
+    test_id: Optional[int] = None,
+    instrument_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+):
+    stmt = select(models.QCResult).where(models.QCResult.is_archived == False)
+    if test_id is not None:
+        stmt = stmt.where(models.QCResult.test_id == test_id)
+    if instrument_id is not None:
+        stmt = stmt.join(models.TestDefinition).where(models.TestDefinition.instrument_id == instrument_id)
+    if start is not None:
+        stmt = stmt.where(models.QCResult.timestamp >= start)
+    if end is not None:
+        stmt = stmt.where(models.QCResult.timestamp < end)
+    return await _page_newest_first(db, stmt, models.QCResult, skip, limit, after)
+
+async def get_audit_logs(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[tuple] = None,
+    test_id: Optional[int] = None,
+    instrument_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+):
+    stmt = select(models.AuditLog)
+    #Test/instrument filters only make sense for the QC result trail
+    if test_id is not None or instrument_id is not None:
+        stmt = stmt.join(
+            models.QCResult, models.QCResult.id == models.AuditLog.record_id
+        ).where(models.AuditLog.table_name == "qc_results")
+        if test_id is not None:
+            stmt = stmt.where(models.QCResult.test_id == test_id)
+        if instrument_id is not None:
+            stmt = stmt.join(models.TestDefinition).where(models.TestDefinition.instrument_id == instrument_id)
+    if start is not None:
+        stmt = stmt.where(models.AuditLog.timestamp >= start)
+    if end is not None:
+        stmt = stmt.where(models.AuditLog.timestamp < end)
+    return await _page_newest_first(db, stmt, models.AuditLog, skip, limit, after)
+
+async def get_result_series(db: AsyncSession, test_id: int):
+    #Oldest first, same population (everything not ARCHIVED) the live Westgard history draws from
+    stmt = (
+        select(
+            models.QCResult.id,
+            models.QCResult.value,
+            models.QCResult.status,
+            models.QCResult.system_comment,
+            models.QCResult.timestamp,
+            models.QCResult.run_id
+        )
+        .where(models.QCResult.test_id == test_id)
+        .where(models.QCResult.status != "ARCHIVED")
+        .order_by(models.QCResult.timestamp, models.QCResult.id)
+    )
+    return (await db.execute(stmt)).all()
+
+async def apply_reevaluation(db: AsyncSession, test_id: int, changes: List[dict], user_id: Optional[int] = None):
+    #changes are dicts with id, timestamp (ISO), old_status, new_status, old_message and message
+    if not changes:
+        return 0
+
+    await db.execute(
+        update(models.QCResult),
+        [{"id": c["id"], "status": c["new_status"], "system_comment": c["message"]} for c in changes]
+    )
+    await audit.record_many(db, [
+        {
+            "table_name": "qc_results",
+            "record_id": c["id"],
+            "action": "REEVALUATE",
+            "changes": {
+                "status": {"old": c["old_status"], "new": c["new_status"]},
+                "system_comment": {"old": c.get("old_message"), "new": c["message"]},
+            },
+            "user_id": user_id,
+        }
+        for c in changes
+    ])
+    await summaries.record_reevaluated(db, test_id, [
+        (datetime.fromisoformat(c["timestamp"]), c.get("old_message"), c["message"])
+        for c in changes if c.get("timestamp")
+    ])
+    await aggregates.touch(db, [test_id])
+    await db.commit()
+    history_window.invalidate(test_id)
+    if live_feed.active():
+        changed = (await db.scalars(
+            select(models.QCResult).where(models.QCResult.id.in_([c["id"] for c in changes]))
+        )).all()
+        await _publish_results(db, "reevaluated", changed)
+    return len(changes)
+
+def _row_value(row, name: str):
+    #Chart rows are ORM results, or dicts when they were read back from the cold archive
+    return row[name] if isinstance(row, dict) else getattr(row, name)
+
+async def _population_values(db: AsyncSession, test_id: int, limit: int) -> List[Decimal]:
+    #Newest first, every result that counts towards the statistics (not ARCHIVED), cold months included
+    stmt = (
+        select(models.QCResult.value)
+        .where(models.QCResult.test_id == test_id)
+        .where(models.QCResult.status != "ARCHIVED")
+        .order_by(models.QCResult.timestamp.desc(), models.QCResult.id.desc())
+        .limit(limit)
+    )
+    values = list((await db.scalars(stmt)).all())
+    if len(values) < limit and cold_storage.archived_months("qc_results"):
+        rows = await asyncio.to_thread(
+            cold_storage.recent_rows, "qc_results", [("test_id", "=", test_id), ("status", "!=", "ARCHIVED")], limit - len(values)
+        )
+        values.extend(row["value"] for row in rows)
+    return [Decimal(value) for value in values]
+
+async def get_test_statistics(
+    db: AsyncSession,
+    test_id: int,
+    limit: int = 30,
+    include_archived: bool = False,
+    fresh_definition: bool = False
+):
+    if fresh_definition:
+        #The response is about to be tagged with the test's version; another worker's cached targets may predate it.
+        #Read past the cache rather than evicting it: the submission path relies on that entry
+        test_def = await _load_test_definition(db, test_id)
+    else:
+        test_def = await get_test_definition(db, test_id)
+
+    stmt = select(models.QCResult).where(models.QCResult.test_id == test_id)
 
     if not include_archived:
-        query = query.filter(models.QCResult.status != "ARCHIVED")
+        stmt = stmt.where(models.QCResult.status != "ARCHIVED")
 
-    results = query.order_by(models.QCResult.timestamp.desc()).limit(limit).all()
+    results = (await db.scalars(stmt.order_by(models.QCResult.timestamp.desc()).limit(limit))).all()
+    if len(results) < limit and cold_storage.archived_months("qc_results"):
+        #Quiet tests can have most of their chart in the cold archive
+        filters = [("test_id", "=", test_id)]
+        if not include_archived:
+            filters.append(("status", "!=", "ARCHIVED"))
+        results = list(results) + await asyncio.to_thread(
+            cold_storage.recent_rows, "qc_results", filters, limit - len(results)
+        )
 
     if not results or not test_def:
         return None
 
-    stats_values = [float(r.value) for r in results if r.status != "ARCHIVED"]
-    
-    if stats_values:
-        actual_mean = statistics.mean(stats_values)
-        actual_sd = statistics.stdev(stats_values) if len(stats_values) > 1 else 0
-    else:
-        actual_mean = 0
-        actual_sd = 0
+    #Mean/SD come from the maintained aggregate rather than re-reading and re-summing rows
+    agg = await aggregates.get_aggregate(db, test_id)
+    recent_values = [Decimal(value) for _, value in agg.recent]
+
+    windows = {}
+    for size in running_stats.WINDOW_SIZES:
+        window = recent_values[:size]
+        mean, sd = running_stats.window_summary(window)
+        windows[size] = {
+            "n": len(window),
+            "mean": mean,
+            "sd": sd,
+            "cv": running_stats.cv_percent(mean, sd),
+        }
+
+    window_values = recent_values[:limit]
+    if limit > len(recent_values) and agg.count > len(recent_values):
+        #Past the largest rolling window the aggregate keeps; without archived results the chart is that population
+        if include_archived:
+            window_values = await _population_values(db, test_id, limit)
+        else:
+            window_values = [Decimal(_row_value(row, "value")) for row in results]
+    actual_mean, actual_sd = running_stats.window_summary(window_values)
+    cumulative_mean, cumulative_sd = running_stats.summarize(agg.count, agg.total, agg.m2)
 
     return {
         "test_definition": test_def,
         "recent_results": results[::-1],
         "target_mean": test_def.mean,
         "target_sd": test_def.std_dev,
-        "actual_mean": Decimal(str(round(actual_mean, 3))),
-        "actual_sd": Decimal(str(round(actual_sd, 3))),
+        "actual_mean": Decimal(str(round(actual_mean or 0, 3))),
+        "actual_sd": Decimal(str(round(actual_sd or 0, 3))),
+        "result_count": agg.count,
+        "cumulative_mean": cumulative_mean,
+        "cumulative_sd": cumulative_sd,
+        "cumulative_cv": running_stats.cv_percent(cumulative_mean, cumulative_sd),
+        "bias": running_stats.bias_percent(cumulative_mean, test_def.mean),
+        "windows": windows,
         "plus_2sd": test_def.mean + (test_def.std_dev * 2),
         "minus_2sd": test_def.mean - (test_def.std_dev * 2),
         "plus_3sd": test_def.mean + (test_def.std_dev * 3),
         "minus_3sd": test_def.mean - (test_def.std_dev * 3),
 
     }
+
+#Per-result fields in the columnar stats payload; enough to draw and click through the Levey-Jennings chart
+CHART_COLUMNS = ("id", "timestamp", "value", "status")
+
+def columnar_stats(stats: dict) -> dict:
+    """get_test_statistics output with recent_results as parallel arrays (oldest first) instead of full results"""
+    results = stats["recent_results"]
+    columnar = {key: value for key, value in stats.items() if key not in ("recent_results", "test_definition", "windows")}
+    columnar["test_definition"] = stats["test_definition"].model_dump()
+    #JSON object keys are strings
+    columnar["windows"] = {str(size): window for size, window in stats["windows"].items()}
+    columnar["results"] = {name: [_row_value(row, name) for row in results] for name in CHART_COLUMNS}
+    return columnar
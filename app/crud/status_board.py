@@ -0,0 +1,165 @@
+from decimal import Decimal
+from typing import Optional
+from sqlalchemy import Float, case, func, literal, select, true
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import qc as models
+from app.logic import running_stats
+
+#The lab-wide QC status board: every test's latest result, open review items and current-window
+#mean/SD from a single statement. On PostgreSQL each test reads its newest rows through LATERAL
+#subqueries on ix_qc_results_test_active_ts; elsewhere (SQLite) row_number() over the results does it.
+
+OPEN_STATUSES = ("REJECT", "WARNING")
+
+
+def _open_counts():
+    #Served by the partial index on unreviewed REJECT/WARNING rows, which stays small
+    return (
+        select(
+            models.QCResult.test_id,
+            func.sum(case((models.QCResult.status == "REJECT", 1), else_=0)).label("open_rejects"),
+            func.sum(case((models.QCResult.status == "WARNING", 1), else_=0)).label("open_warnings"),
+        )
+        .where(models.QCResult.status.in_(OPEN_STATUSES))
+        .where(models.QCResult.reviewed_by_id.is_(None))
+        .group_by(models.QCResult.test_id)
+        .subquery("open_items")
+    )
+
+
+def _newest_first(stmt):
+    return stmt.order_by(models.QCResult.timestamp.desc(), models.QCResult.id.desc())
+
+
+def _lateral(window: int):
+    test = models.TestDefinition
+    latest = _newest_first(
+        select(
+            models.QCResult.id, models.QCResult.value, models.QCResult.status,
+            models.QCResult.system_comment, models.QCResult.timestamp
+        )
+        .where(models.QCResult.test_id == test.id)
+        .where(models.QCResult.status != "ARCHIVED")
+    ).limit(1).correlate(test).lateral("latest")
+
+    rows = _newest_first(
+        select((models.QCResult.value - test.mean).label("deviation"))
+        .where(models.QCResult.test_id == test.id)
+        .where(models.QCResult.status != "ARCHIVED")
+    ).limit(window).correlate(test).subquery("window_rows")
+    totals = select(
+        func.count(rows.c.deviation).label("n"),
+        func.sum(rows.c.deviation, type_=Float).label("total"),
+        func.sum(rows.c.deviation * rows.c.deviation, type_=Float).label("total_sq"),
+    ).correlate(test).lateral("window_totals")
+    return latest, totals, true(), true()
+
+
+def _ranked(window: int, instrument_id: Optional[int]):
+    ranked = (
+        select(
+            models.QCResult.test_id, models.QCResult.id, models.QCResult.value, models.QCResult.status,
+            models.QCResult.system_comment, models.QCResult.timestamp,
+            (models.QCResult.value - models.TestDefinition.mean).label("deviation"),
+            func.row_number().over(
+                partition_by=models.QCResult.test_id,
+                order_by=(models.QCResult.timestamp.desc(), models.QCResult.id.desc())
+            ).label("rn"),
+        )
+        .join(models.TestDefinition, models.TestDefinition.id == models.QCResult.test_id)
+        .where(models.QCResult.status != "ARCHIVED")
+    )
+    if instrument_id is not None:
+        ranked = ranked.where(models.TestDefinition.instrument_id == instrument_id)
+    ranked = ranked.subquery("ranked")
+
+    latest = select(ranked).where(ranked.c.rn == 1).subquery("latest")
+    totals = (
+        select(
+            ranked.c.test_id,
+            func.count(ranked.c.deviation).label("n"),
+            func.sum(ranked.c.deviation, type_=Float).label("total"),
+            func.sum(ranked.c.deviation * ranked.c.deviation, type_=Float).label("total_sq"),
+        )
+        .where(ranked.c.rn <= window)
+        .group_by(ranked.c.test_id)
+        .subquery("window_totals")
+    )
+    test_id = models.TestDefinition.id
+    return latest, totals, latest.c.test_id == test_id, totals.c.test_id == test_id
+
+
+def _window_summary(n: int, target: Decimal, total, total_sq):
+    """total and total_sq are over deviations from the target mean, which keeps a float sum of squares
+    from cancelling away the SD. They come back as floats: the column's Numeric(10, 3) would round them"""
+    if not n:
+        return None, None
+    total, total_sq = Decimal(str(total)), Decimal(str(total_sq))
+    m2 = float(total_sq - total * total / n)
+    return running_stats.summarize(n, total + n * Decimal(target), max(m2, 0.0))
+
+
+async def get_status_board(db: AsyncSession, instrument_id: Optional[int] = None, window: int = 30) -> dict:
+    if db.get_bind().dialect.name == "postgresql":
+        latest, totals, latest_on, totals_on = _lateral(window)
+    else:
+        latest, totals, latest_on, totals_on = _ranked(window, instrument_id)
+    open_items = _open_counts()
+    test, instrument = models.TestDefinition, models.Instrument
+
+    stmt = (
+        select(
+            instrument.id.label("instrument_id"), instrument.name, instrument.serial_number,
+            test.id.label("test_id"), test.analyte_name, test.units, test.control_level,
+            test.mean, test.std_dev,
+            latest.c.id.label("latest_result_id"), latest.c.value.label("latest_value"),
+            latest.c.status.label("latest_status"), latest.c.system_comment.label("latest_system_comment"),
+            latest.c.timestamp.label("latest_timestamp"),
+            func.coalesce(open_items.c.open_rejects, literal(0)).label("open_rejects"),
+            func.coalesce(open_items.c.open_warnings, literal(0)).label("open_warnings"),
+            totals.c.n, totals.c.total, totals.c.total_sq,
+        )
+        .select_from(test)
+        .join(instrument, instrument.id == test.instrument_id)
+        .outerjoin(latest, latest_on)
+        .outerjoin(totals, totals_on)
+        .outerjoin(open_items, open_items.c.test_id == test.id)
+        .order_by(instrument.id, test.analyte_name, test.control_level, test.id)
+    )
+    if instrument_id is not None:
+        stmt = stmt.where(test.instrument_id == instrument_id)
+
+    instruments = {}
+    for row in (await db.execute(stmt)).all():
+        entry = instruments.get(row.instrument_id)
+        if entry is None:
+            entry = instruments[row.instrument_id] = {
+                "instrument_id": row.instrument_id,
+                "name": row.name,
+                "serial_number": row.serial_number,
+                "open_rejects": 0,
+                "open_warnings": 0,
+                "tests": [],
+            }
+        mean, sd = _window_summary(row.n or 0, row.mean, row.total, row.total_sq)
+        entry["open_rejects"] += row.open_rejects
+        entry["open_warnings"] += row.open_warnings
+        entry["tests"].append({
+            "test_id": row.test_id,
+            "analyte_name": row.analyte_name,
+            "units": row.units,
+            "control_level": row.control_level,
+            "target_mean": row.mean,
+            "target_sd": row.std_dev,
+            "latest_result_id": row.latest_result_id,
+            "latest_value": row.latest_value,
+            "latest_status": row.latest_status,
+            "latest_system_comment": row.latest_system_comment,
+            "latest_timestamp": row.latest_timestamp,
+            "open_rejects": row.open_rejects,
+            "open_warnings": row.open_warnings,
+            "window_n": row.n or 0,
+            "window_mean": mean,
+            "window_sd": sd,
+        })
+    return {"window": window, "instruments": list(instruments.values())}
@@ -0,0 +1,176 @@
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from typing import Dict, Optional, Sequence, Tuple
+from sqlalchemy import Date, cast, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import qc as models
+from app.logic import running_stats
+from app.logic.rules_engine import RULE_NAMES, rule_name
+
+#Daily rollups in qc_daily_summaries. Like aggregates.py, every helper runs inside the caller's
+#transaction and the caller commits; the upserts only ever add deltas, so concurrent writers to the
+#same day can't lose each other's counts.
+
+RULE_COLUMNS = {
+    "1-3s": "rule_1_3s",
+    "2-2s": "rule_2_2s",
+    "R-4s": "rule_r_4s",
+    "4-1s": "rule_4_1s",
+    "10-x": "rule_10_x",
+    "1-2s": "rule_1_2s",
+}
+SUM_COLUMNS = ("count", "total", "total_sq") + tuple(RULE_COLUMNS.values())
+WARNING_RULES = {"1-2s"}
+
+
+def _counts(status: Optional[str]) -> bool:
+    #Same population as the stats endpoint and TestAggregate
+    return status != "ARCHIVED"
+
+
+def day_of(timestamp: datetime) -> date:
+    #Buckets are UTC days; SQLite hands back naive datetimes that are already UTC
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc)
+    return timestamp.date()
+
+
+def _add(delta: Dict[str, object], value: Decimal, system_comment: Optional[str], sign: int):
+    value = Decimal(value)
+    delta["count"] += sign
+    delta["total"] += sign * value
+    delta["total_sq"] += sign * value * value
+    rule = rule_name(system_comment)
+    if rule is not None:
+        delta[RULE_COLUMNS[rule]] += sign
+
+
+def _empty_delta() -> Dict[str, object]:
+    return {column: 0 for column in SUM_COLUMNS}
+
+
+async def _apply(db: AsyncSession, test_id: int, deltas: Dict[date, Dict[str, object]]):
+    rows = [{"test_id": test_id, "day": day, **delta} for day, delta in sorted(deltas.items())]
+    if not rows:
+        return
+    insert = pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+    stmt = insert(models.QCDailySummary)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["test_id", "day"],
+        set_={column: getattr(models.QCDailySummary, column) + stmt.excluded[column] for column in SUM_COLUMNS}
+    )
+    await db.execute(stmt, rows)
+
+
+async def record_added(db: AsyncSession, test_id: int, entries: Sequence[Tuple[datetime, Decimal, str, Optional[str]]]):
+    """entries are (timestamp, value, status, system_comment)"""
+    deltas = defaultdict(_empty_delta)
+    for timestamp, value, status, system_comment in entries:
+        if _counts(status):
+            _add(deltas[day_of(timestamp)], value, system_comment, 1)
+    await _apply(db, test_id, deltas)
+
+
+async def record_status_change(
+    db: AsyncSession,
+    test_id: int,
+    timestamp: datetime,
+    value: Decimal,
+    system_comment: Optional[str],
+    old_status: str,
+    new_status: str
+):
+    was_counted, now_counted = _counts(old_status), _counts(new_status)
+    if was_counted == now_counted:
+        return
+    delta = _empty_delta()
+    _add(delta, value, system_comment, 1 if now_counted else -1)
+    await _apply(db, test_id, {day_of(timestamp): delta})
+
+
+async def record_reevaluated(db: AsyncSession, test_id: int, entries: Sequence[Tuple[datetime, Optional[str], Optional[str]]]):
+    """entries are (timestamp, old system_comment, new system_comment); the population doesn't change, only rules"""
+    deltas = defaultdict(_empty_delta)
+    for timestamp, old_message, new_message in entries:
+        old_rule, new_rule = rule_name(old_message), rule_name(new_message)
+        if old_rule == new_rule:
+            continue
+        delta = deltas[day_of(timestamp)]
+        if old_rule is not None:
+            delta[RULE_COLUMNS[old_rule]] -= 1
+        if new_rule is not None:
+            delta[RULE_COLUMNS[new_rule]] += 1
+    await _apply(db, test_id, deltas)
+
+
+def _period(db: AsyncSession, granularity: str):
+    day = models.QCDailySummary.day
+    if granularity == "day":
+        return day
+    if db.get_bind().dialect.name == "postgresql":
+        return cast(func.date_trunc("month", day), Date)
+    return func.strftime("%Y-%m-01", day)
+
+
+def _bucket(period, count: int, total, total_sq, rules: Dict[str, int]) -> dict:
+    total, total_sq = Decimal(total or 0), Decimal(total_sq or 0)
+    m2 = float(total_sq - total * total / count) if count else 0.0
+    mean, sd = running_stats.summarize(count, total, max(m2, 0.0))
+    return {
+        "period": date.fromisoformat(period) if isinstance(period, str) else period,
+        "n": count,
+        "mean": mean,
+        "sd": sd,
+        "cv": running_stats.cv_percent(mean, sd),
+        "rejects": sum(n for rule, n in rules.items() if rule not in WARNING_RULES),
+        "warnings": sum(n for rule, n in rules.items() if rule in WARNING_RULES),
+        "rules": rules,
+    }
+
+
+async def get_summary(
+    db: AsyncSession,
+    test_id: int,
+    granularity: str = "day",
+    start: Optional[date] = None,
+    end: Optional[date] = None
+) -> dict:
+    """Per day or per month buckets between start and end (inclusive), plus the whole range as one bucket.
+    Reads at most one row per day per test, so multi-year ranges stay cheap."""
+    summary = models.QCDailySummary
+    period = _period(db, granularity).label("period")
+    stmt = (
+        select(period, *(func.sum(getattr(summary, column)).label(column) for column in SUM_COLUMNS))
+        .where(summary.test_id == test_id)
+        .group_by(period)
+        .having(func.sum(summary.count) > 0)
+        .order_by(period)
+    )
+    if start is not None:
+        stmt = stmt.where(summary.day >= start)
+    if end is not None:
+        stmt = stmt.where(summary.day <= end)
+
+    buckets = []
+    count, total, total_sq = 0, Decimal("0"), Decimal("0")
+    rule_totals = dict.fromkeys(RULE_NAMES, 0)
+    for row in (await db.execute(stmt)).all():
+        rules = {rule: int(getattr(row, RULE_COLUMNS[rule]) or 0) for rule in RULE_NAMES}
+        buckets.append(_bucket(row.period, int(row.count), row.total, row.total_sq, rules))
+        count += int(row.count)
+        total += Decimal(row.total or 0)
+        total_sq += Decimal(row.total_sq or 0)
+        for rule, n in rules.items():
+            rule_totals[rule] += n
+
+    return {
+        "test_id": test_id,
+        "granularity": granularity,
+        "start": start,
+        "end": end,
+        "buckets": buckets,
+        "total": _bucket(None, count, total, total_sq, rule_totals),
+    }
@@ -0,0 +1,12 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import cache
+from app.models.qc import User
+from app.schemas.qc import User as UserSnapshot
+
+async def get_user(db: AsyncSession, user_id: int):
+    """Retrieve a user by ID for auth checks (cached read-only snapshot)"""
+    async def load():
+        db_user = await db.get(User, user_id)
+        return UserSnapshot.model_validate(db_user) if db_user else None
+
+    return await cache.users.get_or_load(user_id, load)
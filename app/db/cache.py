@@ -0,0 +1,88 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+#Lookup tables (instruments, test definitions, users) change rarely. Entries are invalidated by the CRUD
+#writes in this process; the TTL bounds how stale another worker's copy can get.
+CACHE_TTL_SECONDS = float(os.getenv("LOOKUP_CACHE_TTL", "60"))
+CACHE_MAX_ENTRIES = int(os.getenv("LOOKUP_CACHE_SIZE", "1024"))
+CACHE_ENABLED = os.getenv("LOOKUP_CACHE", "true").lower() in ("1", "true", "yes")
+
+
+class LookupCache:
+    """TTL + LRU cache of read-only snapshots. Misses (None) are never stored."""
+
+    def __init__(self, name: str, maxsize: int = CACHE_MAX_ENTRIES, ttl: float = CACHE_TTL_SECONDS):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable):
+        """The cached value, or None on a miss (or with the cache disabled)"""
+        if not CACHE_ENABLED:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        return None
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]):
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        value = await loader()
+        if value is not None and CACHE_ENABLED:
+            self.set(key, value)
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable = None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+test_definitions = LookupCache("test_definitions")
+instruments = LookupCache("instruments")
+users = LookupCache("users")
+#Submission key -> result id of recently stored results, so an analyzer retry skips the key lookup
+submission_keys = LookupCache(
+    "submission_keys",
+    maxsize=int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("IDEMPOTENCY_CACHE_TTL", "900"))
+)
+
+CACHES = [test_definitions, instruments, users, submission_keys]
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    return {cache.name: cache.stats() for cache in CACHES}
@@ -0,0 +1,198 @@
+import heapq
+import json
+import os
+import re
+from datetime import date, datetime, timezone
+from typing import Iterable, Iterator, List, Optional, Sequence
+
+from sqlalchemy import JSON, Boolean, Date, DateTime, Integer, Numeric
+
+from app.db.partitions import month_bounds
+from app.models import qc as models
+
+#Months of qc_results / audit_logs moved out of the database by the retention job
+#(app/logic/retention.py): one zstd Parquet file per table per month, <QC_ARCHIVE_DIR>/<table>/YYYY-MM.parquet,
+#rows sorted by (timestamp, id) with the table's own columns. Exports and stats read them back through here.
+ARCHIVE_DIR = os.getenv("QC_ARCHIVE_DIR", "archive")
+#Whole months older than this are archived
+RETENTION_MONTHS = int(os.getenv("QC_RETENTION_MONTHS", "24"))
+READ_BATCH_SIZE = 5000
+
+TABLES = {
+    "qc_results": models.QCResult.__table__,
+    "audit_logs": models.AuditLog.__table__,
+}
+
+_FILE_NAME = re.compile(r"^(\d{4})-(\d{2})\.parquet$")
+
+
+def _arrow():
+    #pyarrow is only needed once something has been archived; keep it off the import path until then
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+    return pa, ds, pq
+
+
+def arrow_schema(pa, table_name: str):
+    fields = []
+    for column in TABLES[table_name].columns:
+        if isinstance(column.type, Boolean):
+            arrow_type = pa.bool_()
+        elif isinstance(column.type, Integer):
+            arrow_type = pa.int64()
+        elif isinstance(column.type, Numeric):
+            arrow_type = pa.decimal128(column.type.precision or 20, column.type.scale or 3)
+        elif isinstance(column.type, DateTime):
+            arrow_type = pa.timestamp("us", tz="UTC")
+        elif isinstance(column.type, Date):
+            arrow_type = pa.date32()
+        else:
+            #Strings, and JSON columns as their JSON text
+            arrow_type = pa.string()
+        fields.append(pa.field(column.name, arrow_type))
+    return pa.schema(fields)
+
+
+def month_path(table_name: str, month: date) -> str:
+    return os.path.join(ARCHIVE_DIR, table_name, f"{month:%Y-%m}.parquet")
+
+
+def archived_months(table_name: str) -> List[date]:
+    try:
+        names = os.listdir(os.path.join(ARCHIVE_DIR, table_name))
+    except FileNotFoundError:
+        return []
+    months = []
+    for name in names:
+        match = _FILE_NAME.match(name)
+        if match:
+            months.append(date(int(match.group(1)), int(match.group(2)), 1))
+    return sorted(months)
+
+
+def as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    #SQLite and naive query parameters are UTC already
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _encode(table_name: str, row: dict) -> dict:
+    encoded = dict(row)
+    for column in TABLES[table_name].columns:
+        value = encoded.get(column.name)
+        if isinstance(column.type, JSON) and value is not None and not isinstance(value, str):
+            encoded[column.name] = json.dumps(value, default=str)
+        elif isinstance(value, datetime):
+            encoded[column.name] = as_utc(value)
+    return encoded
+
+
+def read_month(table_name: str, month: date) -> List[dict]:
+    pa, ds, pq = _arrow()
+    return pq.read_table(month_path(table_name, month)).to_pylist()
+
+
+def _previous_rows(pq, path: str) -> Iterator[dict]:
+    #An earlier file for the month, one row group at a time; it is already in (timestamp, id) order
+    parquet = pq.ParquetFile(path)
+    for index in range(parquet.num_row_groups):
+        yield from parquet.read_row_group(index).to_pylist()
+
+
+def _merged(table_name: str, batches: Iterable[List[dict]], previous: Iterable[dict]) -> Iterator[dict]:
+    #Both sides are sorted by (timestamp, id), so they merge as they stream. A row in both (archived by a run
+    #that failed before deleting it) comes out once, with the database's copy first
+    rows = (_encode(table_name, row) for batch in batches for row in batch)
+    last = None
+    for row in heapq.merge(rows, previous, key=lambda row: (row["timestamp"], row["id"])):
+        key = (row["timestamp"], row["id"])
+        if key != last:
+            yield row
+        last = key
+
+
+def write_month(table_name: str, month: date, batches: Iterable[List[dict]]) -> int:
+    """Write one month from row-dict batches (oldest first). Rows already in an earlier file for the
+    month (late arrivals since the last run) are merged in. Only a batch at a time is held in memory.
+    Returns the rows in the file."""
+    pa, ds, pq = _arrow()
+    schema = arrow_schema(pa, table_name)
+    path = month_path(table_name, month)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    previous = _previous_rows(pq, path) if os.path.exists(path) else iter(())
+    #Written beside the final name and renamed, so readers see the whole month or none of it
+    partial = path + ".partial"
+    written, chunk = 0, []
+    with pq.ParquetWriter(partial, schema, compression="zstd") as writer:
+        for row in _merged(table_name, batches, previous):
+            chunk.append(row)
+            if len(chunk) == READ_BATCH_SIZE:
+                writer.write_table(pa.Table.from_pylist(chunk, schema=schema))
+                written, chunk = written + len(chunk), []
+        if chunk:
+            writer.write_table(pa.Table.from_pylist(chunk, schema=schema))
+            written += len(chunk)
+    os.replace(partial, path)
+    return written
+
+
+def _expression(pa, ds, pq, filters: Sequence[tuple], start: Optional[datetime], end: Optional[datetime]):
+    expression = pq.filters_to_expression(list(filters)) if filters else None
+    bounds = []
+    if start is not None:
+        bounds.append(ds.field("timestamp") >= pa.scalar(as_utc(start), pa.timestamp("us", tz="UTC")))
+    if end is not None:
+        bounds.append(ds.field("timestamp") < pa.scalar(as_utc(end), pa.timestamp("us", tz="UTC")))
+    for bound in bounds:
+        expression = bound if expression is None else expression & bound
+    return expression
+
+
+def _months_in_range(table_name: str, start: Optional[datetime], end: Optional[datetime]) -> List[date]:
+    months = []
+    for month in archived_months(table_name):
+        month_start, month_end = month_bounds(month)
+        if (start is None or as_utc(start) < month_end) and (end is None or as_utc(end) > month_start):
+            months.append(month)
+    return months
+
+
+def iter_rows(
+    table_name: str,
+    filters: Sequence[tuple] = (),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    batch_size: int = READ_BATCH_SIZE
+) -> Iterator[List[dict]]:
+    """Archived rows oldest first, in batches of row dicts. filters use pyarrow's DNF tuples,
+    e.g. [("test_id", "=", 5), ("status", "!=", "ARCHIVED")], and are pushed down to the row groups."""
+    months = _months_in_range(table_name, start, end)
+    if not months:
+        return
+    pa, ds, pq = _arrow()
+    expression = _expression(pa, ds, pq, filters, start, end)
+    for month in months:
+        dataset = ds.dataset(month_path(table_name, month), format="parquet")
+        #Single-threaded scan keeps the file's (timestamp, id) order
+        for batch in dataset.to_batches(filter=expression, batch_size=batch_size, use_threads=False):
+            if batch.num_rows:
+                yield batch.to_pylist()
+
+
+def recent_rows(table_name: str, filters: Sequence[tuple], limit: int) -> List[dict]:
+    """Up to `limit` archived rows newest first, reading back one month at a time"""
+    months = archived_months(table_name)
+    if not months or limit <= 0:
+        return []
+    pa, ds, pq = _arrow()
+    expression = _expression(pa, ds, pq, filters, None, None)
+    rows = []
+    for month in reversed(months):
+        table = ds.dataset(month_path(table_name, month), format="parquet").to_table(filter=expression)
+        rows.extend(reversed(table.slice(max(0, table.num_rows - (limit - len(rows)))).to_pylist()))
+        if len(rows) >= limit:
+            break
+    return rows
@@ -0,0 +1,130 @@
+import logging
+import os
+import re
+from datetime import date, datetime, timezone
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+logger = logging.getLogger(__name__)
+
+#Monthly RANGE partitions on timestamp for qc_results and audit_logs (PostgreSQL only, set up by
+#migration 0008). Each month is <table>_pYYYY_MM; <table>_default catches rows outside every month
+#so an analyzer replaying an old backlog can't fail an insert. Queries with a timestamp bound only
+#touch the matching months, and "newest first ... LIMIT n" walks the partitions newest to oldest.
+PARTITIONED_TABLES = ("qc_results", "audit_logs")
+
+#Months created ahead of the current one by the retention job (and the migration)
+PARTITIONS_AHEAD = int(os.getenv("QC_PARTITIONS_AHEAD", "3"))
+
+_PARTITION_NAME = re.compile(r"_p(\d{4})_(\d{2})$")
+
+
+def month_start(value) -> date:
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc)
+        value = value.date()
+    return value.replace(day=1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_bounds(month: date):
+    #Partition bounds and archive ranges are whole UTC months
+    start = datetime(month.year, month.month, 1, tzinfo=timezone.utc)
+    next_month = add_months(month, 1)
+    return start, datetime(next_month.year, next_month.month, 1, tzinfo=timezone.utc)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y_%m}"
+
+
+def is_partitioned(conn, table: str) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    return bool(conn.execute(text("""
+        SELECT EXISTS (
+            SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = :table
+        )
+    """), {"table": table}).scalar())
+
+
+def list_partitions(conn, table: str) -> List[date]:
+    """Months that have their own partition, oldest first (the default partition isn't listed)"""
+    names = conn.execute(text("""
+        SELECT child.relname FROM pg_inherits i
+        JOIN pg_class parent ON parent.oid = i.inhparent
+        JOIN pg_class child ON child.oid = i.inhrelid
+        WHERE parent.relname = :table
+    """), {"table": table}).scalars().all()
+    months = []
+    for name in names:
+        match = _PARTITION_NAME.search(name)
+        if match:
+            months.append(date(int(match.group(1)), int(match.group(2)), 1))
+    return sorted(months)
+
+
+def create_partition(conn, table: str, month: date):
+    start, end = month_bounds(month)
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {partition_name(table, month)} PARTITION OF {table} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    ))
+
+
+def split_default(conn, table: str, month: date):
+    """Create the month's partition when the default one already holds rows for it (e.g. results
+    dated after the last partition, if the retention job didn't run for a while). PostgreSQL refuses
+    to create it while they're there, so the default is detached, its rows for the month moved into
+    the new partition, and attached again. The parent stays locked until the caller commits."""
+    start, end = month_bounds(month)
+    name, default = partition_name(table, month), f"{table}_default"
+    in_month = f"timestamp >= '{start.isoformat()}' AND timestamp < '{end.isoformat()}'"
+    conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {default}"))
+    create_partition(conn, table, month)
+    conn.execute(text(f"INSERT INTO {name} SELECT * FROM {default} WHERE {in_month}"))
+    conn.execute(text(f"DELETE FROM {default} WHERE {in_month}"))
+    conn.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {default} DEFAULT"))
+
+
+def _default_has_rows(conn, table: str, month: date) -> bool:
+    start, end = month_bounds(month)
+    return bool(conn.execute(text(
+        f"SELECT EXISTS (SELECT 1 FROM {table}_default WHERE timestamp >= :start AND timestamp < :end)"
+    ), {"start": start, "end": end}).scalar())
+
+
+def ensure_partitions(conn, table: str, ahead: int = PARTITIONS_AHEAD, today: Optional[date] = None) -> List[date]:
+    """Create any missing months from the newest existing partition through `ahead` months from now.
+    A month that can't be created is logged and ends the run (later months would leave a gap)."""
+    current = month_start(today or datetime.now(timezone.utc))
+    existing = list_partitions(conn, table)
+    month = add_months(existing[-1], 1) if existing else current
+    created = []
+    while month <= add_months(current, ahead):
+        try:
+            with conn.begin_nested():
+                if _default_has_rows(conn, table, month):
+                    split_default(conn, table, month)
+                else:
+                    create_partition(conn, table, month)
+        except DBAPIError as exc:
+            logger.error("%s: could not create partition %s: %s", table, partition_name(table, month), exc.orig)
+            break
+        created.append(month)
+        month = add_months(month, 1)
+    return created
+
+
+def drop_partition(conn, table: str, month: date):
+    #Detach first so the parent's lock is short, then drop the now standalone table
+    name = partition_name(table, month)
+    conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+    conn.execute(text(f"DROP TABLE {name}"))
@@ -0,0 +1,192 @@
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app import metrics
+from app.db.session import AsyncSessionLocal, _instrument, pool_settings, to_async_url
+
+logger = logging.getLogger(__name__)
+
+#Read replicas for the reporting endpoints (stats, status board, listings, audit trail, exports).
+#Submissions, reviews and the Westgard history read stay on the primary; get_db is unchanged.
+
+#Comma-separated, same form as DATABASE_URL. Unset: every read goes to the primary
+REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+#A replica further behind than this takes no reads until it catches up
+MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_SECONDS", "2"))
+#For the health check and for opening a connection, so a dead host falls back quickly
+CONNECT_TIMEOUT = float(os.getenv("REPLICA_CONNECT_TIMEOUT", "2"))
+
+#An idle primary sends no WAL, so the last replay time alone would make a caught-up standby look ever
+#further behind; it only counts while there is received WAL still to replay
+STANDBY_SQL = text("""
+    SELECT
+        pg_is_in_recovery(),
+        EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming'),
+        CASE
+            WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+        END
+""")
+
+#Connection failures on checkout; anything raised once the endpoint has the session is its own error
+CONNECT_ERRORS = (DBAPIError, OSError, asyncio.TimeoutError)
+
+
+class Replica:
+    def __init__(self, url: str):
+        async_url = to_async_url(url)
+        self.name = make_url(url).render_as_string(hide_password=True)
+        settings = dict(pool_settings(async_url))
+        if make_url(async_url).drivername == "postgresql+asyncpg":
+            settings["connect_args"] = {"timeout": CONNECT_TIMEOUT}
+        self.engine = create_async_engine(async_url, **settings)
+        _instrument(self.engine.sync_engine)
+        #read_only lets the CRUD layer skip its lazy backfill writes, which a standby would refuse
+        self.sessionmaker = async_sessionmaker(
+            self.engine, class_=AsyncSession, autoflush=False, expire_on_commit=False, info={"read_only": True}
+        )
+        #Unused until the first health check passes
+        self.healthy = False
+        self.lag_seconds: Optional[float] = None
+        self.error: Optional[str] = None
+        self.checked_at: Optional[float] = None
+        self.reads = 0
+        self.failures = 0
+
+    async def _probe(self):
+        async with self.engine.connect() as conn:
+            if conn.dialect.name != "postgresql":
+                await conn.execute(text("SELECT 1"))
+                return 0.0, None
+            in_recovery, streaming, lag = (await conn.execute(STANDBY_SQL)).one()
+            if in_recovery and not streaming:
+                return None, "not streaming from the primary"
+            return float(lag), None
+
+    async def check(self):
+        try:
+            lag, problem = await asyncio.wait_for(self._probe(), CONNECT_TIMEOUT)
+        except Exception as exc:
+            lag, problem = None, f"{type(exc).__name__}: {exc}"[:200]
+        if problem is None and lag > MAX_LAG_SECONDS:
+            problem = f"{lag:.1f}s behind (limit {MAX_LAG_SECONDS:g}s)"
+        if self.healthy and problem:
+            logger.warning("Replica %s taken out of rotation: %s", self.name, problem)
+        elif not self.healthy and problem is None and self.checked_at is not None:
+            logger.info("Replica %s back in rotation", self.name)
+        self.healthy, self.lag_seconds, self.error = problem is None, lag, problem
+        self.checked_at = time.time()
+
+    def mark_down(self, exc: BaseException):
+        #Until the next health check says otherwise
+        self.healthy = False
+        self.failures += 1
+        self.error = f"{type(exc).__name__}: {exc}"[:200]
+        logger.warning("Replica %s failed on connect, reading from the next one: %s", self.name, self.error)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "healthy": self.healthy,
+            "lag_seconds": self.lag_seconds,
+            "error": self.error,
+            "checked_at": self.checked_at,
+            "reads": self.reads,
+            "failures": self.failures,
+        }
+
+
+class ReplicaSet:
+    """Routes read-only sessions across the healthy replicas in turn, falling back to the primary.
+    A background task started from the app lifespan re-checks health and lag every CHECK_INTERVAL."""
+
+    def __init__(self, urls: List[str] = REPLICA_URLS, interval: float = CHECK_INTERVAL):
+        self.replicas = [Replica(url) for url in urls]
+        self.interval = interval
+        self.primary_reads = 0
+        self._turn = 0
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = asyncio.Event()
+
+    async def check(self):
+        await asyncio.gather(*(replica.check() for replica in self.replicas))
+
+    async def _run(self):
+        while not self._stopping.is_set():
+            await self.check()
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        if self.replicas and self._task is None:
+            self._stopping.clear()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._stopping.set()
+            await self._task
+            self._task = None
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+    def _candidates(self) -> List[Replica]:
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return []
+        self._turn = (self._turn + 1) % len(healthy)
+        return healthy[self._turn:] + healthy[:self._turn]
+
+    @asynccontextmanager
+    async def session(self):
+        for replica in self._candidates():
+            db = replica.sessionmaker()
+            try:
+                #Check a connection out now, so a replica that died since its last check is skipped
+                #before the endpoint runs rather than failing it
+                await db.connection()
+            except CONNECT_ERRORS as exc:
+                await db.close()
+                replica.mark_down(exc)
+                continue
+            replica.reads += 1
+            metrics.DB_READ_ROUTES.inc("replica")
+            try:
+                yield db
+            finally:
+                await db.close()
+            return
+
+        self.primary_reads += 1
+        metrics.DB_READ_ROUTES.inc("primary")
+        async with AsyncSessionLocal() as db:
+            yield db
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None,
+            "max_lag_seconds": MAX_LAG_SECONDS,
+            "primary_reads": self.primary_reads,
+            "replicas": [replica.stats() for replica in self.replicas],
+        }
+
+
+replica_set = ReplicaSet()
+
+
+# Dependency for read-only endpoints that can tolerate REPLICA_MAX_LAG_SECONDS of staleness
+async def get_read_db():
+    async with replica_set.session() as db:
+        yield db
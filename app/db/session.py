@@ -1,5 +1,8 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from app import metrics
 import os
 
 # The DATABASE_URL is pulled from the environment variable defined in docker-compose.yml
@@ -8,19 +11,67 @@ SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
 if SQLALCHEMY_DATABASE_URL is None:
     raise ValueError("DATABASE_URL environment variable is not set!")
 
-# The engine is the actual connection to the database
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# Async drivers for the sync URLs we accept in DATABASE_URL
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
 
-# Each instance of the SessionLocal class will be a database session
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def to_async_url(url: str) -> str:
+    parsed = make_url(url)
+    return parsed.set(drivername=ASYNC_DRIVERS.get(parsed.drivername, parsed.drivername)).render_as_string(hide_password=False)
+
+# The API runs on the async engine. Set ASYNC_DATABASE_URL to override the driver swap above
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or to_async_url(SQLALCHEMY_DATABASE_URL)
+
+# Pool sizing is per process; with several uvicorn workers the database sees workers * (size + overflow)
+POOL_SETTINGS = {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+    "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT", "30")),
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes"),
+}
+
+def pool_settings(url: str) -> dict:
+    # SQLite (local quick runs) uses its own file-based pooling and rejects the QueuePool arguments
+    return {} if make_url(url).get_backend_name() == "sqlite" else POOL_SETTINGS
+
+def _instrument(engine):
+    # Statement count / DB time / rows per request for /metrics, plus the SLOW_QUERY_MS log
+    event.listen(engine, "before_cursor_execute", metrics.before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", metrics.after_cursor_execute)
+
+# The engine is the actual connection to the database. The API only uses the async one
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **pool_settings(ASYNC_DATABASE_URL))
+_instrument(async_engine.sync_engine)
+
+_sync = {}
+
+def get_engine():
+    # The sync engine (retention job, benchmarks, scripts) is built on first use, so API workers
+    # never import psycopg2 or open a second pool
+    if "engine" not in _sync:
+        _sync["engine"] = create_engine(SQLALCHEMY_DATABASE_URL, **pool_settings(SQLALCHEMY_DATABASE_URL))
+        _instrument(_sync["engine"])
+        _sync["SessionLocal"] = sessionmaker(autocommit=False, autoflush=False, bind=_sync["engine"])
+    return _sync["engine"]
+
+def __getattr__(name):
+    # `from app.db.session import engine` / `SessionLocal` keep working, they just resolve lazily
+    if name in ("engine", "SessionLocal"):
+        get_engine()
+        return _sync[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Objects stay readable after commit, an async session can't lazy-load expired attributes during serialization
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 
 # Base class for classes to inherit from to produce database tables
 Base = declarative_base()
 
 # Dependency to get a DB session for each request
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
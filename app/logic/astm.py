@@ -0,0 +1,259 @@
+import os
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from typing import List, Optional
+from zoneinfo import ZoneInfo
+
+#ASTM E1381 (low level: ENQ/ACK handshake, checksummed frames, EOT) and E1394 / LIS2-A2 (records)
+#as analyzers send them to a LIS. Parsing is incremental and does no I/O: feed it bytes as they come
+#off the socket and act on what it returns. app/logic/astm_listener.py does the networking.
+
+ENQ = b"\x05"
+ACK = b"\x06"
+NAK = b"\x15"
+EOT = b"\x04"
+STX = b"\x02"
+ETX = b"\x03"
+ETB = b"\x17"
+CR = b"\r"
+LF = b"\n"
+
+#E1381 caps a frame at 247 characters, 240 of them message text
+MAX_FRAME_TEXT = 240
+#Anything longer than this between STX and the trailer is garbage, not a frame
+MAX_FRAME_BYTES = 4096
+
+#H.5 (sender name or ID) is "name^version^serial" on most analyzers; which component holds the serial
+SERIAL_COMPONENT = int(os.getenv("ASTM_SERIAL_COMPONENT", "3"))
+#Analyzer clocks send local time without an offset
+ANALYZER_TIMEZONE = ZoneInfo(os.getenv("ASTM_TIMEZONE", "UTC"))
+#Only results under an order with action code Q (quality control) are QC; patient results are skipped
+QC_ONLY = os.getenv("ASTM_QC_ONLY", "true").lower() in ("1", "true", "yes")
+
+
+def checksum(body: bytes) -> bytes:
+    #Modulo-256 sum of everything after STX up to and including ETX/ETB, as two uppercase hex digits
+    return b"%02X" % (sum(body) & 0xFF)
+
+
+def encode_frame(number: int, text: bytes, final: bool) -> bytes:
+    body = b"%d" % (number % 8) + text + (ETX if final else ETB)
+    return STX + body + checksum(body) + CR + LF
+
+
+def encode_message(records: List[str], start_number: int = 1) -> List[bytes]:
+    """Frames for one message (records without their CR), each record starting a new frame and
+    split with ETB where it's longer than a frame"""
+    frames, number = [], start_number
+    for record in records:
+        text = record.encode("latin-1") + CR
+        for offset in range(0, len(text), MAX_FRAME_TEXT):
+            chunk = text[offset:offset + MAX_FRAME_TEXT]
+            frames.append(encode_frame(number, chunk, offset + MAX_FRAME_TEXT >= len(text)))
+            number += 1
+    return frames
+
+
+@dataclass
+class Frame:
+    number: int
+    text: bytes
+    final: bool
+    valid: bool
+
+
+_LINK_CONTROL = re.compile(b"[\x02\x04\x05]")
+_FRAME_END = re.compile(b"[\x02\x03\x17]")
+
+
+class FrameParser:
+    """Splits the link-layer byte stream into ENQ, EOT and Frame events. Scans with re rather than
+    byte by byte; a frame split across reads is kept until its trailer arrives."""
+
+    def __init__(self):
+        self._buffer = b""
+        #Offset of the current frame's first byte after STX, or -1 between frames
+        self._start = -1
+
+    def feed(self, data: bytes) -> list:
+        buffer = self._buffer + data if self._buffer else data
+        events, position = [], 0
+        while position < len(buffer):
+            if self._start < 0:
+                match = _LINK_CONTROL.search(buffer, position)
+                if match is None:
+                    #Line noise and stray CR/LF between frames are ignored
+                    position = len(buffer)
+                    break
+                char, position = buffer[match.start():match.start() + 1], match.end()
+                if char == STX:
+                    self._start = position
+                else:
+                    events.append(char)
+                continue
+
+            match = _FRAME_END.search(buffer, position)
+            if match is None:
+                if len(buffer) - self._start > MAX_FRAME_BYTES:
+                    events.append(Frame(-1, b"", False, False))
+                    self._start, position = -1, len(buffer)
+                break
+            end = match.start()
+            if buffer[end:end + 1] == STX:
+                #A new frame before the old one ended: report the broken one so it is NAKed
+                events.append(Frame(-1, buffer[self._start:end], False, False))
+                self._start = position = end + 1
+                continue
+            if len(buffer) < end + 5:
+                #<ETX|ETB> C1 C2 CR LF not all here yet
+                position = end
+                break
+            events.append(self._finish(buffer[self._start:end + 5]))
+            self._start, position = -1, end + 5
+
+        if self._start >= 0:
+            self._buffer = buffer[self._start:]
+            self._start = 0
+        else:
+            self._buffer = b""
+        return events
+
+    def _finish(self, raw: bytes) -> Frame:
+        body, trailer = raw[:-4], raw[-4:]
+        number = body[0] - 0x30 if body and 0x30 <= body[0] <= 0x37 else -1
+        valid = number >= 0 and trailer[:2].upper() == checksum(body) and trailer[2:] == CR + LF
+        return Frame(number, body[1:-1], body[-1:] == ETX, valid)
+
+
+class RecordParser:
+    """Joins frame text into E1394 records (CR-terminated) and splits them into fields. The header
+    record declares the delimiters for the rest of the message."""
+
+    def __init__(self):
+        self._buffer = ""
+        self.field, self.repeat, self.component, self.escape = "|", "\\", "^", "&"
+
+    def feed(self, text: bytes) -> List[List[str]]:
+        self._buffer += text.decode("latin-1")
+        *complete, self._buffer = self._buffer.split("\r")
+        records = []
+        for record in complete:
+            record = record.lstrip("\n")
+            if not record:
+                continue
+            if record[0] == "H" and len(record) >= 5:
+                self.field, self.repeat, self.component, self.escape = record[1:5]
+            records.append(record.split(self.field))
+        return records
+
+    def components(self, field: str) -> List[str]:
+        return field.split(self.component)
+
+    def unescape(self, value: str) -> str:
+        if self.escape not in value:
+            return value
+        e = self.escape
+        for code, char in (("F", self.field), ("S", self.component), ("R", self.repeat), ("E", self.escape)):
+            value = value.replace(f"{e}{code}{e}", char)
+        return value
+
+
+@dataclass
+class ASTMResult:
+    serial: str
+    analyte: str
+    level: Optional[int]
+    value: Decimal
+    units: str
+    timestamp: Optional[datetime]
+    specimen_id: str
+    sequence: int
+
+
+def _field(record: List[str], number: int) -> str:
+    #ASTM numbers fields from 1, the record type being field 1
+    return record[number - 1] if len(record) >= number else ""
+
+
+def parse_timestamp(value: str) -> Optional[datetime]:
+    digits = value[:14]
+    try:
+        if len(digits) == 14:
+            parsed = datetime.strptime(digits, "%Y%m%d%H%M%S")
+        elif len(digits) >= 12:
+            parsed = datetime.strptime(digits[:12], "%Y%m%d%H%M")
+        else:
+            return None
+    except ValueError:
+        return None
+    return parsed.replace(tzinfo=ANALYZER_TIMEZONE)
+
+
+class MessageAssembler:
+    """Turns the records of one message into QC results. Results come back when the terminator (L)
+    record arrives, so a message is only acted on once it is complete."""
+
+    def __init__(self, records: RecordParser):
+        self.records = records
+        self.skipped = 0
+        self._reset()
+
+    def _reset(self):
+        self.serial = ""
+        self.sent_at: Optional[datetime] = None
+        self._specimen = ""
+        self._is_qc = False
+        self._results: List[ASTMResult] = []
+
+    def add(self, record: List[str]) -> Optional[List[ASTMResult]]:
+        kind = record[0][-1:].upper() if record[0] else ""
+        if kind == "H":
+            self._reset()
+            sender = self.records.components(_field(record, 5))
+            if len(sender) >= SERIAL_COMPONENT:
+                self.serial = self.records.unescape(sender[SERIAL_COMPONENT - 1]).strip()
+            self.sent_at = parse_timestamp(_field(record, 14))
+        elif kind == "P":
+            self._specimen, self._is_qc = "", False
+        elif kind == "O":
+            self._specimen = self.records.unescape(self.records.components(_field(record, 3))[0]).strip()
+            self._is_qc = _field(record, 12).strip().upper() == "Q"
+        elif kind == "R":
+            result = self._result(record)
+            if result is None:
+                self.skipped += 1
+            else:
+                self._results.append(result)
+        elif kind == "L":
+            results = self._results
+            self._results = []
+            return results
+        return None
+
+    def _result(self, record: List[str]) -> Optional[ASTMResult]:
+        if QC_ONLY and not self._is_qc:
+            return None
+        #Universal test ID ^^^<local code>^<control level>; the level is this LIS's convention for multi-level QC
+        test_id = self.records.components(_field(record, 3))
+        analyte = self.records.unescape(test_id[3]).strip() if len(test_id) > 3 else ""
+        level = test_id[4].strip() if len(test_id) > 4 else ""
+        try:
+            value = Decimal(self.records.components(_field(record, 4))[0].strip())
+            sequence = int(_field(record, 2))
+        except (InvalidOperation, ValueError):
+            #Flagged or non-numeric results ("<0.1", "****") can't be QC-evaluated
+            return None
+        if not analyte or not value.is_finite():
+            return None
+        return ASTMResult(
+            serial=self.serial,
+            analyte=analyte,
+            level=int(level) if level.isdigit() else None,
+            value=value,
+            units=_field(record, 5),
+            timestamp=parse_timestamp(_field(record, 13)) or self.sent_at,
+            specimen_id=self._specimen,
+            sequence=sequence,
+        )
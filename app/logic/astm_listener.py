@@ -0,0 +1,310 @@
+"""
+ASTM E1381/E1394 (LIS2-A2) TCP listener: analyzers connect directly instead of going through
+middleware and one POST /results/ per value.
+
+Runs as one process of its own (the astm service in docker-compose):
+
+    python -m app.logic.astm_listener --port 4001
+
+The API processes write results for the same tests, so a standalone listener always reads the Westgard
+history from the database rather than a per-process window (QC_HISTORY_CACHE must be false for the API
+too). With a single-worker API it can instead be started from the lifespan by setting ASTM_LISTEN_PORT,
+sharing that worker's history window and live feed. The port is bound without SO_REUSEPORT, so with more
+workers only the first gets it and connections never spread across windows.
+
+Each QC result (R record under an order with action code Q) is mapped to a test definition by the
+instrument serial from the header (Instrument.serial_number) and the analyte in the universal test ID
+(TestDefinition.analyte_name, with ^<level> picking the control level when the analyte has several).
+Results from all connections are micro-batched into ingest.ingest_batch, the path POST /results/batch
+uses. The frame carrying a message's terminator record is only ACKed once its results are committed;
+if storing fails the connection is dropped unacknowledged, and the analyzer's retransmission is
+deduplicated by instrument run (specimen ID + result time) and sequence number.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from app.db.session import AsyncSessionLocal
+from app.logic import astm, history_window, ingest
+from app.models import qc as models
+from app.schemas import qc as schemas_qc
+
+logger = logging.getLogger(__name__)
+
+ASTM_LISTEN_HOST = os.getenv("ASTM_LISTEN_HOST", "0.0.0.0")
+#Unset: the API doesn't start the listener
+ASTM_LISTEN_PORT = os.getenv("ASTM_LISTEN_PORT")
+#A batch is written when it has this many results or its first result has waited this long
+BATCH_SIZE = int(os.getenv("ASTM_BATCH_SIZE", "500"))
+BATCH_WAIT_MS = float(os.getenv("ASTM_BATCH_WAIT_MS", "20"))
+#An unknown serial/analyte reloads the index, at most this often
+INDEX_RELOAD_SECONDS = float(os.getenv("ASTM_INDEX_RELOAD_SECONDS", "30"))
+#E1381 gives the sender 15 s to hear back about a frame; a silent connection is closed after this
+IDLE_TIMEOUT_SECONDS = float(os.getenv("ASTM_IDLE_TIMEOUT", "300"))
+READ_SIZE = 65536
+
+
+class InstrumentIndex:
+    """(serial number, analyte) -> test definition ids by control level, held in memory"""
+
+    def __init__(self, reload_seconds: float = INDEX_RELOAD_SECONDS):
+        self.reload_seconds = reload_seconds
+        self.loaded_at: Optional[float] = None
+        self._tests: Dict[Tuple[str, str], List[Tuple[Optional[int], int]]] = {}
+        self._lock = asyncio.Lock()
+
+    async def load(self):
+        stmt = (
+            select(models.Instrument.serial_number, models.TestDefinition.analyte_name,
+                   models.TestDefinition.control_level, models.TestDefinition.id)
+            .join(models.TestDefinition, models.TestDefinition.instrument_id == models.Instrument.id)
+            .order_by(models.TestDefinition.id)
+        )
+        tests = defaultdict(list)
+        async with AsyncSessionLocal() as db:
+            for serial, analyte, level, test_id in (await db.execute(stmt)).all():
+                tests[(serial.strip(), analyte.strip().casefold())].append((level, test_id))
+        self._tests = dict(tests)
+        self.loaded_at = time.monotonic()
+
+    def __len__(self):
+        return len(self._tests)
+
+    def _lookup(self, serial: str, analyte: str, level: Optional[int]) -> Optional[int]:
+        candidates = self._tests.get((serial, analyte.casefold()))
+        if not candidates:
+            return None
+        if level is not None:
+            return next((test_id for test_level, test_id in candidates if test_level == level), None)
+        #Without a level only an unambiguous analyte maps
+        return candidates[0][1] if len(candidates) == 1 else None
+
+    async def resolve(self, serial: str, analyte: str, level: Optional[int]) -> Optional[int]:
+        test_id = self._lookup(serial, analyte, level)
+        if test_id is None and (self.loaded_at is None or time.monotonic() - self.loaded_at > self.reload_seconds):
+            #Picks up instruments and tests created since the last load
+            async with self._lock:
+                if self.loaded_at is None or time.monotonic() - self.loaded_at > self.reload_seconds:
+                    await self.load()
+            test_id = self._lookup(serial, analyte, level)
+        return test_id
+
+
+class MicroBatcher:
+    """Collects results from every connection and stores them a batch at a time"""
+
+    def __init__(self, size: int = BATCH_SIZE, wait_ms: float = BATCH_WAIT_MS):
+        self.size = size
+        self.wait = wait_ms / 1000
+        self.batches = 0
+        self._queue: "asyncio.Queue[Tuple[schemas_qc.QCResultBatchItem, asyncio.Future]]" = asyncio.Queue()
+
+    def submit(self, items: List[schemas_qc.QCResultBatchItem]) -> List[asyncio.Future]:
+        loop = asyncio.get_running_loop()
+        futures = []
+        for item in items:
+            future = loop.create_future()
+            self._queue.put_nowait((item, future))
+            futures.append(future)
+        return futures
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.wait
+        while len(batch) < self.size:
+            if self._queue.empty():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            else:
+                batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _store(self, items: List[schemas_qc.QCResultBatchItem]) -> schemas_qc.QCResultBatchResponse:
+        for attempt in range(2):
+            async with AsyncSessionLocal() as db:
+                try:
+                    return await ingest.ingest_batch(db, items)
+                except IntegrityError:
+                    #A retransmission raced another connection; the second pass replays what it stored
+                    if attempt:
+                        raise
+
+    async def run(self):
+        while True:
+            batch = await self._collect()
+            try:
+                response = await self._store([item for item, _ in batch])
+            except Exception as exc:
+                logger.exception("Storing a batch of %d ASTM results failed", len(batch))
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+            self.batches += 1
+            for (_, future), status in zip(batch, response.items):
+                if not future.done():
+                    future.set_result(status)
+
+
+class ASTMListener:
+    def __init__(self, host: str = ASTM_LISTEN_HOST, port: Optional[int] = None):
+        self.host = host
+        self.port = port if port is not None else int(ASTM_LISTEN_PORT or 4001)
+        self.index = InstrumentIndex()
+        self.batcher = MicroBatcher()
+        self.counters = defaultdict(int)
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._tasks: List[asyncio.Task] = []
+
+    async def serve(self):
+        await self.index.load()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self._tasks.append(asyncio.create_task(self.batcher.run()))
+        logger.info("ASTM listener on %s:%d", self.host, self.port)
+
+    def start(self):
+        #From the API lifespan; errors (port in use, database down) are logged rather than stopping the API
+        async def serve():
+            try:
+                await self.serve()
+            except Exception:
+                logger.exception("ASTM listener failed to start")
+        self._tasks.append(asyncio.create_task(serve()))
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _store_message(self, results: List[astm.ASTMResult]) -> bool:
+        items = []
+        for result in results:
+            test_id = await self.index.resolve(result.serial, result.analyte, result.level)
+            if test_id is None:
+                self.counters["unmapped"] += 1
+                logger.warning("No test definition for %s %s (level %s)", result.serial, result.analyte, result.level)
+                continue
+            run_id = None
+            if result.timestamp is not None:
+                run_id = f"{result.specimen_id}@{result.timestamp:%Y%m%d%H%M%S}"[-64:]
+            items.append(schemas_qc.QCResultBatchItem(
+                test_id=test_id,
+                value=result.value,
+                timestamp=result.timestamp,
+                instrument_run_id=run_id,
+                sample_sequence=result.sequence if run_id else None,
+            ))
+        if not items:
+            return True
+
+        statuses = await asyncio.gather(*self.batcher.submit(items), return_exceptions=True)
+        if any(isinstance(status, Exception) for status in statuses):
+            return False
+        for status in statuses:
+            self.counters["replayed" if status.replayed else "stored" if status.success else "rejected"] += 1
+        return True
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.counters["connections"] += 1
+        peer = writer.get_extra_info("peername")
+        frames = astm.FrameParser()
+        records = assembler = None
+        expected = last = None
+        try:
+            while True:
+                data = await asyncio.wait_for(reader.read(READ_SIZE), IDLE_TIMEOUT_SECONDS)
+                if not data:
+                    break
+                for event in frames.feed(data):
+                    if event == astm.ENQ:
+                        #Establishment phase: a new transfer, frames count from 1
+                        records = astm.RecordParser()
+                        assembler = astm.MessageAssembler(records)
+                        expected, last = 1, None
+                        writer.write(astm.ACK)
+                    elif event == astm.EOT:
+                        records = assembler = None
+                    elif records is None or not event.valid:
+                        self.counters["naks"] += 1
+                        writer.write(astm.NAK)
+                    elif event.number == last:
+                        #Our ACK was lost and the sender repeated the frame
+                        writer.write(astm.ACK)
+                    elif event.number != expected:
+                        self.counters["naks"] += 1
+                        writer.write(astm.NAK)
+                    else:
+                        last, expected = event.number, (event.number + 1) % 8
+                        for record in records.feed(event.text):
+                            results = assembler.add(record)
+                            if results is None:
+                                continue
+                            self.counters["messages"] += 1
+                            self.counters["skipped"] += assembler.skipped
+                            assembler.skipped = 0
+                            if not await self._store_message(results):
+                                #Unacknowledged, the analyzer resends the message later
+                                logger.warning("Dropping ASTM connection from %s, results not stored", peer)
+                                return
+                        writer.write(astm.ACK)
+                await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._server is not None,
+            "port": self.port,
+            "batches": self.batcher.batches,
+            "index_entries": len(self.index),
+            **self.counters,
+        }
+
+
+listener = ASTMListener()
+
+
+async def _serve_forever(host: str, port: int):
+    server = ASTMListener(host, port)
+    await server.serve()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=ASTM_LISTEN_HOST)
+    parser.add_argument("--port", type=int, default=int(ASTM_LISTEN_PORT or 4001))
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    #Results also arrive through the API's own processes, which this one's window would never see
+    history_window.HISTORY_CACHE_ENABLED = False
+    try:
+        asyncio.run(_serve_forever(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
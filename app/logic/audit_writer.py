@@ -0,0 +1,84 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, Optional
+
+from app.crud import audit
+from app.db.session import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+#Seconds to sleep once the outbox is empty; a full batch is followed straight away by the next one
+DRAIN_INTERVAL = float(os.getenv("AUDIT_DRAIN_INTERVAL", "0.5"))
+
+
+class AuditWriter:
+    """Background task that drains audit_outbox into audit_logs. Started from the app lifespan when
+    AUDIT_WRITER=outbox. Events live in the database until drained, so a restart only delays them."""
+
+    def __init__(self, interval: float = DRAIN_INTERVAL, batch_size: int = audit.OUTBOX_BATCH_SIZE):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.written = 0
+        self.batches = 0
+        self.errors = 0
+        self.last_drain: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = asyncio.Event()
+
+    async def drain(self) -> int:
+        """Drains until the outbox is empty (or a batch comes back short); returns events written"""
+        total = 0
+        while True:
+            async with AsyncSessionLocal() as db:
+                moved = await audit.drain_outbox(db, self.batch_size)
+            if moved:
+                total += moved
+                self.written += moved
+                self.batches += 1
+            self.last_drain = time.time()
+            if moved < self.batch_size:
+                return total
+
+    async def _run(self):
+        while not self._stopping.is_set():
+            try:
+                await self.drain()
+            except Exception:
+                #Leave the events queued and retry on the next tick
+                self.errors += 1
+                logger.exception("Audit outbox drain failed")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        if self._task is None:
+            self._stopping.clear()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._stopping.set()
+        await self._task
+        self._task = None
+        #Best effort so a clean shutdown leaves nothing behind; anything missed is picked up on the next start
+        try:
+            await self.drain()
+        except Exception:
+            logger.exception("Final audit outbox drain failed")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None,
+            "written": self.written,
+            "batches": self.batches,
+            "errors": self.errors,
+            "last_drain": self.last_drain,
+        }
+
+
+writer = AuditWriter()
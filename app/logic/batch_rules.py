@@ -0,0 +1,99 @@
+from decimal import Decimal
+from typing import NamedTuple, Sequence
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+#Same precedence and wording as evaluate_westgard, first match wins
+RULE_OUTCOMES = [
+    ("1-3s", "REJECT", "Rule 1-3s Violation: Result exceeds 3SD"),
+    ("2-2s", "REJECT", "2-2s Violation"),
+    ("R-4s", "REJECT", "R-4s Violation"),
+    ("4-1s", "REJECT", "4-1s Violation"),
+    ("10-x", "REJECT", "10-x Violation"),
+    ("1-2s", "WARNING", "Rule 1-2s Warning: Result exceeds 2SD"),
+]
+PASS_OUTCOME = ("PASS", "Results within acceptable limits")
+#Statuses the engine itself assigns; anything else (VERIFIED, ...) is a reviewer decision
+ENGINE_STATUSES = {"PASS", "WARNING", "REJECT"}
+
+#Largest magnitude we let int64 hold before falling back to Python ints (leaves room for the 4*SD comparison)
+_INT64_SAFE = 2 ** 59
+
+
+class BatchEvaluation(NamedTuple):
+    statuses: np.ndarray
+    messages: np.ndarray
+    flags: dict
+
+
+def _to_scaled_ints(values: Sequence[Decimal], mean: Decimal, std_dev: Decimal):
+    #z = (value - mean) / std_dev, so comparing z against k is the same as comparing
+    #(value - mean) against k * std_dev. Scaling everything to integers keeps that exact,
+    #which is what lets the batch engine agree with the Decimal engine at the 2SD/3SD edges.
+    numbers = [Decimal(v) for v in values] + [Decimal(mean), Decimal(std_dev)]
+    places = max(0, max(-n.as_tuple().exponent for n in numbers))
+    scale = Decimal(10) ** places
+
+    deviations = [int((n - numbers[-2]) * scale) for n in numbers[:-2]]
+    sd = int(numbers[-1] * scale)
+
+    if sd == 0:
+        #calculate_z_score treats a zero SD as z = 0 for every point
+        return np.zeros(len(deviations), dtype=np.int64), 1
+    if sd < 0:
+        deviations = [-d for d in deviations]
+        sd = -sd
+
+    largest = max([abs(d) for d in deviations] + [sd])
+    dtype = np.int64 if largest * 8 < _INT64_SAFE else object
+    return np.array(deviations, dtype=dtype), sd
+
+
+def _window_all(mask: np.ndarray, size: int) -> np.ndarray:
+    #True at i when mask[i-size+1..i] are all True; False where the window doesn't fit
+    out = np.zeros(len(mask), dtype=bool)
+    if len(mask) >= size:
+        out[size - 1:] = sliding_window_view(mask, size).all(axis=1)
+    return out
+
+
+def evaluate_westgard_batch(values: Sequence[Decimal], mean: Decimal, std_dev: Decimal) -> BatchEvaluation:
+    """Evaluate a chronological series in one pass. Point i sees points before it as its history,
+    exactly as if evaluate_westgard had been called with the previous 10 z-scores, newest first."""
+    n = len(values)
+    if n == 0:
+        empty = np.array([], dtype=object)
+        return BatchEvaluation(empty, empty, {rule: np.zeros(0, dtype=bool) for rule, _, _ in RULE_OUTCOMES})
+
+    d, sd = _to_scaled_ints(values, mean, std_dev)
+    position = np.arange(n)
+
+    above_3 = d > 3 * sd
+    below_3 = d < -3 * sd
+    above_2 = d > 2 * sd
+    below_2 = d < -2 * sd
+    above_1 = d > sd
+    below_1 = d < -sd
+
+    prev_above_2 = np.concatenate(([False], above_2[:-1]))
+    prev_below_2 = np.concatenate(([False], below_2[:-1]))
+    spread = np.zeros(n, dtype=bool)
+    if n > 1:
+        spread[1:] = np.abs(d[1:] - d[:-1]) >= 4 * sd
+
+    flags = {
+        "1-3s": above_3 | below_3,
+        #The scalar engine only checks 2-2s once it has at least two previous values
+        "2-2s": (position >= 2) & ((above_2 & prev_above_2) | (below_2 & prev_below_2)),
+        "R-4s": spread,
+        "4-1s": _window_all(above_1, 4) | _window_all(below_1, 4),
+        "10-x": _window_all(d > 0, 10) | _window_all(d < 0, 10),
+        "1-2s": above_2 | below_2,
+    }
+    flags = {rule: np.asarray(mask, dtype=bool) for rule, mask in flags.items()}
+
+    conditions = [flags[rule] for rule, _, _ in RULE_OUTCOMES]
+    statuses = np.select(conditions, [status for _, status, _ in RULE_OUTCOMES], default=PASS_OUTCOME[0])
+    messages = np.select(conditions, [message for _, _, message in RULE_OUTCOMES], default=PASS_OUTCOME[1])
+    return BatchEvaluation(statuses.astype(object), messages.astype(object), flags)
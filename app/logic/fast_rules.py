@@ -0,0 +1,132 @@
+import os
+from decimal import Decimal
+from typing import List, Optional, Sequence
+
+from app.logic.rules_engine import ValidationResult, calculate_z_score, evaluate_westgard
+
+#Instruments whose submissions go through evaluate_westgard_fast: comma-separated ids, or * for all
+FAST_RULES_INSTRUMENTS = os.getenv("QC_FAST_RULES_INSTRUMENTS", "").strip()
+_FAST_ALL = FAST_RULES_INSTRUMENTS == "*"
+_FAST_IDS = frozenset(
+    int(part) for part in FAST_RULES_INSTRUMENTS.split(",") if part.strip() and not _FAST_ALL
+)
+
+#Float error here is ~1e-16 relative; anything within this (scaled) distance of a rule threshold
+#is handed to the Decimal engine, so the two paths can only ever agree
+_EPS = 1e-12
+
+OUTCOMES = {
+    "1-3s": ("REJECT", "Rule 1-3s Violation: Result exceeds 3SD"),
+    "2-2s": ("REJECT", "2-2s Violation"),
+    "R-4s": ("REJECT", "R-4s Violation"),
+    "4-1s": ("REJECT", "4-1s Violation"),
+    "10-x": ("REJECT", "10-x Violation"),
+    "1-2s": ("WARNING", "Rule 1-2s Warning: Result exceeds 2SD"),
+    None: ("PASS", "Results within acceptable limits"),
+}
+
+
+def use_fast_rules(instrument_id: Optional[int]) -> bool:
+    return _FAST_ALL or instrument_id in _FAST_IDS
+
+
+class _Undecided(Exception):
+    pass
+
+
+def _near_threshold(x: float, tol: float) -> bool:
+    #Every rule compares against a whole number of SDs; too close to one and the float can't be trusted.
+    #Near zero is fine: float() keeps the sign, which is all 10-x looks at
+    x = abs(x)
+    if x <= 0.5:
+        return False
+    frac = x % 1.0
+    return frac <= tol or frac >= 1 - tol
+
+
+def _sign(x: float, exact: Decimal) -> int:
+    #float() can only lose a nonzero Decimal to underflow
+    if x > 0:
+        return 1
+    if x < 0:
+        return -1
+    if exact != 0:
+        raise _Undecided
+    return 0
+
+
+def _fired_rule(z: float, z_tol: float, z_sign: int, history: Sequence[Decimal], floats: Sequence[float]):
+    """Which rule evaluate_westgard would report, in its precedence order. One pass over at most 9 history points."""
+    n = len(history)
+    abs_z = abs(z)
+
+    if abs_z > 3 + z_tol:
+        return "1-3s"
+    if _near_threshold(z, z_tol):
+        raise _Undecided
+
+    if n >= 1:
+        h0 = floats[0]
+        h0_tol = _EPS * (1 + abs(h0))
+        if _near_threshold(h0, h0_tol) or abs(abs(z - h0) - 4) <= z_tol + h0_tol:
+            raise _Undecided
+
+        if n > 1 and ((z > 2 and h0 > 2) or (z < -2 and h0 < -2)):
+            return "2-2s"
+        if abs(z - h0) >= 4:
+            return "R-4s"
+
+    if n >= 3 and abs_z > 1:
+        #4-1s: current plus 3 previous all beyond +1SD or all beyond -1SD
+        for i in range(3):
+            h = floats[i]
+            if i and _near_threshold(h, _EPS * (1 + abs(h))):
+                raise _Undecided
+            if not (h > 1 if z > 0 else h < -1):
+                break
+        else:
+            return "4-1s"
+
+    if n >= 9 and z_sign != 0:
+        #10-x: current plus 9 previous all on the same side of the mean
+        for i in range(9):
+            if _sign(floats[i], history[i]) != z_sign:
+                break
+        else:
+            return "10-x"
+
+    if abs_z > 2:
+        return "1-2s"
+    return None
+
+
+def evaluate_westgard_fast(
+    value: Decimal,
+    mean: Decimal,
+    std_dev: Decimal,
+    history: List[Decimal],
+    history_floats: Optional[Sequence[float]] = None
+) -> ValidationResult:
+    """Same decisions as evaluate_westgard, with the rule arithmetic done on floats. history_floats is the
+    history as floats (history_window keeps them); comparisons too close to a threshold to trust a float
+    fall back to the Decimal engine. z_score is still the exact Decimal, so the shared history stays exact."""
+    sd = float(std_dev)
+    if sd == 0:
+        return evaluate_westgard(value, mean, std_dev, history)
+
+    v, m = float(value), float(mean)
+    z = (v - m) / sd
+    #Rounding of value, mean and the subtraction, scaled back into z units
+    z_tol = _EPS * ((abs(v) + abs(m)) / abs(sd) + abs(z) + 1)
+    if history_floats is None:
+        history_floats = [float(h) for h in history[:9]]
+
+    try:
+        z_sign = _sign(z, value - mean)
+        rule = _fired_rule(z, z_tol, z_sign, history, history_floats)
+    except _Undecided:
+        return evaluate_westgard(value, mean, std_dev, history)
+
+    status, message = OUTCOMES[rule]
+    #Plain constructor: on pydantic 2.5 model_construct is the slower of the two
+    return ValidationResult(status=status, message=message, z_score=calculate_z_score(value, mean, std_dev))
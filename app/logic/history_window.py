@@ -0,0 +1,104 @@
+import os
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+#Set QC_HISTORY_CACHE=false when running several workers, each process would otherwise keep its own (stale) window
+HISTORY_CACHE_ENABLED = os.getenv("QC_HISTORY_CACHE", "true").lower() in ("1", "true", "yes")
+
+#The deepest Westgard rule (10-x) looks at the current value plus 9 previous ones
+WINDOW_SIZE = 10
+
+_windows: Dict[int, deque] = {}
+#Same z-scores as floats, for the fast rules path; float(Decimal) is too slow to redo on every submission
+_float_windows: Dict[int, deque] = {}
+#Timestamp of the newest result in each window, so a backdated push can be told apart from a new one
+_newest: Dict[int, Optional[datetime]] = {}
+#Bumped on every push/invalidate so a slow seed can't overwrite newer state
+_generations: Dict[int, int] = {}
+_lock = threading.Lock()
+
+#loader() returns the test's recent results as (timestamp, z-score), newest first
+Loader = Callable[[], Awaitable[List[Tuple[datetime, Decimal]]]]
+
+
+def as_utc(timestamp: datetime) -> datetime:
+    #SQLite hands timestamps back without an offset; they're stored in UTC
+    return timestamp.replace(tzinfo=timezone.utc) if timestamp.tzinfo is None else timestamp
+
+
+async def get_history(test_id: int, loader: Loader) -> Tuple[List[Decimal], Optional[datetime]]:
+    """Recent z-scores for a test, newest first, and the timestamp of the newest one (None without results).
+    Seeds from loader() on first use."""
+    if not HISTORY_CACHE_ENABLED:
+        rows = await loader()
+        return [z for _, z in rows], as_utc(rows[0][0]) if rows else None
+    history, _, newest = await get_history_with_floats(test_id, loader)
+    return history, newest
+
+
+async def get_history_with_floats(test_id: int, loader: Loader) -> Tuple[List[Decimal], List[float], Optional[datetime]]:
+    """get_history plus the same window as floats, read under one lock so the two always match"""
+    if not HISTORY_CACHE_ENABLED:
+        rows = await loader()
+        history = [z for _, z in rows]
+        return history, [float(z) for z in history], as_utc(rows[0][0]) if rows else None
+
+    with _lock:
+        window = _windows.get(test_id)
+        if window is not None:
+            return list(window), list(_float_windows[test_id]), _newest.get(test_id)
+        generation = _generations.get(test_id, 0)
+
+    rows = await loader()
+    history = [z for _, z in rows]
+    floats = [float(z) for z in history]
+
+    with _lock:
+        if _generations.get(test_id, 0) == generation and test_id not in _windows:
+            _windows[test_id] = deque(history[:WINDOW_SIZE], maxlen=WINDOW_SIZE)
+            _float_windows[test_id] = deque(floats[:WINDOW_SIZE], maxlen=WINDOW_SIZE)
+            _newest[test_id] = as_utc(rows[0][0]) if rows else None
+    return history, floats, as_utc(rows[0][0]) if rows else None
+
+
+def push(test_id: int, z_score: Decimal, timestamp: datetime) -> None:
+    """Record a committed result. Tests that were never seeded are left for the next lazy load."""
+    if not HISTORY_CACHE_ENABLED:
+        return
+    timestamp = as_utc(timestamp)
+    with _lock:
+        _generations[test_id] = _generations.get(test_id, 0) + 1
+        window = _windows.get(test_id)
+        if window is None:
+            return
+        newest = _newest.get(test_id)
+        if newest is not None and timestamp < newest:
+            #Backdated: it belongs somewhere behind the newest entry, so reload the window from the database.
+            #A tie stays at the front, the database orders it after the older row by id
+            _windows.pop(test_id, None)
+            _float_windows.pop(test_id, None)
+            _newest.pop(test_id, None)
+            return
+        window.appendleft(z_score)
+        _float_windows[test_id].appendleft(float(z_score))
+        _newest[test_id] = timestamp
+
+
+def invalidate(test_id: int) -> None:
+    """Drop a test's window, e.g. after its targets change or a result leaves the history"""
+    with _lock:
+        _generations[test_id] = _generations.get(test_id, 0) + 1
+        _windows.pop(test_id, None)
+        _float_windows.pop(test_id, None)
+        _newest.pop(test_id, None)
+
+
+def clear() -> None:
+    with _lock:
+        _windows.clear()
+        _float_windows.clear()
+        _newest.clear()
+        _generations.clear()
@@ -0,0 +1,149 @@
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import metrics
+from app.crud import idempotency as crud_idempotency
+from app.crud import qc as crud_qc
+from app.logic import history_window
+from app.logic.fast_rules import evaluate_westgard_fast, use_fast_rules
+from app.logic.rules_engine import evaluate_westgard
+from app.schemas import qc as schemas_qc
+
+#Evaluation and storage of submitted results, shared by the HTTP endpoints and the ASTM listener
+
+def run_rules_engine(value, test_def, history, history_floats=None):
+    #evaluate_westgard plus its timing and the rule that fired, for /metrics.
+    #With history_floats (instruments listed in QC_FAST_RULES_INSTRUMENTS) the float engine decides instead
+    start = time.perf_counter()
+    if history_floats is not None:
+        evaluation = evaluate_westgard_fast(value, test_def.mean, test_def.std_dev, history, history_floats)
+    else:
+        evaluation = evaluate_westgard(value=value, mean=test_def.mean, std_dev=test_def.std_dev, history=history)
+    metrics.observe_evaluation(time.perf_counter() - start, evaluation.status, evaluation.message)
+    return evaluation
+
+async def load_history(db, test_def):
+    #(z-scores, same as floats or None, timestamp of the newest stored result); floats only for the
+    #instruments on the fast rules path
+    loader = lambda: crud_qc.get_recent_z_scores(db, test_def)
+    if use_fast_rules(test_def.instrument_id):
+        return await history_window.get_history_with_floats(test_def.id, loader)
+    history, newest = await history_window.get_history(test_def.id, loader)
+    return history, None, newest
+
+async def history_before(db, test_def, timestamp: datetime, earlier: Sequence[Tuple[datetime, Decimal]] = ()):
+    """History for a result run at `timestamp`, older than the test's newest stored result: the stored
+    results run up to then merged with `earlier` (timestamp, z-score) pairs not stored yet, oldest first"""
+    stored = await crud_qc.get_recent_z_scores(db, test_def, before=timestamp)
+    #At the same timestamp, a result not stored yet is the newer one; it will get the higher id
+    merged = sorted(
+        [(history_window.as_utc(ts), 0, -i, z) for i, (ts, z) in enumerate(stored)]
+        + [(ts, 1, i, z) for i, (ts, z) in enumerate(earlier)],
+        key=lambda entry: entry[:3],
+        reverse=True
+    )
+    history = [z for _, _, _, z in merged[:history_window.WINDOW_SIZE]]
+    return history, [float(z) for z in history] if use_fast_rules(test_def.instrument_id) else None
+
+async def history_at(db, test_def, timestamp: Optional[datetime] = None):
+    """(z-scores, floats or None) a result run at `timestamp` is judged against: the cached window,
+    unless the result is backdated behind the newest stored one"""
+    history_z, history_floats, newest = await load_history(db, test_def)
+    if timestamp is not None and newest is not None and timestamp < newest:
+        return await history_before(db, test_def, timestamp)
+    return history_z, history_floats
+
+async def ingest_batch(db: AsyncSession, results: List[schemas_qc.QCResultBatchItem]) -> schemas_qc.QCResultBatchResponse:
+    """Evaluates and stores a batch in one transaction, with a status per item. Raises IntegrityError
+    (after rolling back) when a concurrent submission stored one of its keys first; retrying replays it."""
+    received_at = datetime.now(timezone.utc)
+    statuses = {}
+    pending = []
+
+    #Items whose instrument run id + sample sequence are already stored are answered with the original result
+    keys = {}
+    for index, item in enumerate(results):
+        key = crud_idempotency.submission_key(item)
+        if key is not None:
+            keys[index] = key
+    originals = await crud_idempotency.find_results(db, keys.values()) if keys else {}
+    first_index = {}
+    for index, key in keys.items():
+        item = results[index]
+        if key in originals:
+            if crud_idempotency.matches(item, originals[key]):
+                statuses[index] = schemas_qc.QCResultBatchStatus(
+                    index=index, success=True, replayed=True, result=originals[key]
+                )
+            else:
+                statuses[index] = schemas_qc.QCResultBatchStatus(
+                    index=index, success=False, detail="This submission key was already used for a different result"
+                )
+        elif key in first_index:
+            statuses[index] = schemas_qc.QCResultBatchStatus(
+                index=index, success=False, detail=f"Same instrument run and sample sequence as item {first_index[key]}"
+            )
+        else:
+            first_index[key] = index
+
+    #Group by test so each definition and its history window is only loaded once
+    by_test = defaultdict(list)
+    for index, item in enumerate(results):
+        if index in statuses:
+            continue
+        timestamp = item.timestamp or received_at
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        by_test[item.test_id].append((index, item.model_copy(update={"timestamp": timestamp})))
+
+    for test_id, items in by_test.items():
+        test_def = await crud_qc.get_test_definition(db, test_id)
+        if not test_def:
+            for index, _ in items:
+                statuses[index] = schemas_qc.QCResultBatchStatus(
+                    index=index, success=False, detail="Test definition not found"
+                )
+            continue
+
+        history_z, history_floats, newest = await load_history(db, test_def)
+
+        #Oldest first, so every value is judged against the ones run before it (in this batch too)
+        items.sort(key=lambda entry: entry[1].timestamp)
+        #Resent or clock-skewed analyzer results can predate what is stored; those are judged on what ran
+        #before them, not the results that came in since
+        backdated = newest is not None and items[0][1].timestamp < newest
+        earlier = []
+        for index, item in items:
+            if backdated:
+                history_z, history_floats = await history_before(db, test_def, item.timestamp, earlier)
+            evaluation = run_rules_engine(item.value, test_def, history_z, history_floats)
+            pending.append((index, item, evaluation))
+            earlier.append((item.timestamp, evaluation.z_score))
+            history_z = [evaluation.z_score] + history_z[:history_window.WINDOW_SIZE - 1]
+            if history_floats is not None:
+                history_floats = [float(evaluation.z_score)] + history_floats[:history_window.WINDOW_SIZE - 1]
+
+    try:
+        db_results = await crud_qc.create_qc_results_bulk(
+            db,
+            [(item, evaluation.status, evaluation.message, evaluation.z_score) for _, item, evaluation in pending]
+        )
+    except IntegrityError:
+        await db.rollback()
+        raise
+    for (index, _, _), db_result in zip(pending, db_results):
+        statuses[index] = schemas_qc.QCResultBatchStatus(index=index, success=True, result=db_result)
+
+    items = [statuses[index] for index in range(len(results))]
+    return schemas_qc.QCResultBatchResponse(
+        created=len(db_results),
+        replayed=sum(item.replayed for item in items),
+        failed=sum(not item.success for item in items),
+        items=items
+    )
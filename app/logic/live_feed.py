@@ -0,0 +1,214 @@
+import asyncio
+import json
+import logging
+import os
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set
+from sqlalchemy import func, select
+from sqlalchemy.engine import make_url
+from app.db.session import ASYNC_DATABASE_URL, async_engine
+from app.schemas.qc import QCResult
+
+logger = logging.getLogger(__name__)
+
+#"memory" only reaches subscribers connected to the worker that made the change. "postgres" sends every
+#event through NOTIFY so each worker's LISTEN connection fans it out to its own subscribers
+LIVE_FEED_BACKEND = os.getenv("LIVE_FEED_BACKEND", "memory").lower()
+NOTIFY_CHANNEL = os.getenv("LIVE_FEED_CHANNEL", "qc_feed")
+#Per-subscriber buffer; a client that falls this far behind loses its oldest events (and is told so)
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("LIVE_FEED_QUEUE_SIZE", "256"))
+
+
+class Subscription:
+    """One connected client. Idle subscribers are just a queue and a few set entries in the hub."""
+
+    def __init__(self, hub: "FeedHub", instrument_ids: Iterable[int], test_ids: Iterable[int]):
+        self.hub = hub
+        self.instrument_ids: Set[int] = set(instrument_ids)
+        self.test_ids: Set[int] = set(test_ids)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.dropped = 0
+
+    @property
+    def everything(self) -> bool:
+        return not self.instrument_ids and not self.test_ids
+
+    def offer(self, event: dict):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            #Never block the publisher on a slow client
+            self.queue.get_nowait()
+            self.queue.put_nowait(event)
+            self.dropped += 1
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[dict]:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+class FeedHub:
+    """In-process fan-out of QC events, indexed by instrument and test so a publish only touches
+    the subscribers that asked for it"""
+
+    def __init__(self):
+        self._by_instrument: Dict[int, Set[Subscription]] = defaultdict(set)
+        self._by_test: Dict[int, Set[Subscription]] = defaultdict(set)
+        self._everything: Set[Subscription] = set()
+        self.published = 0
+
+    def subscribe(self, instrument_ids: Iterable[int] = (), test_ids: Iterable[int] = ()) -> Subscription:
+        subscription = Subscription(self, instrument_ids, test_ids)
+        self._index(subscription)
+        return subscription
+
+    def update(self, subscription: Subscription, instrument_ids: Iterable[int], test_ids: Iterable[int]):
+        self._unindex(subscription)
+        subscription.instrument_ids = set(instrument_ids)
+        subscription.test_ids = set(test_ids)
+        self._index(subscription)
+
+    def unsubscribe(self, subscription: Subscription):
+        self._unindex(subscription)
+
+    def _index(self, subscription: Subscription):
+        if subscription.everything:
+            self._everything.add(subscription)
+        for instrument_id in subscription.instrument_ids:
+            self._by_instrument[instrument_id].add(subscription)
+        for test_id in subscription.test_ids:
+            self._by_test[test_id].add(subscription)
+
+    def _unindex(self, subscription: Subscription):
+        self._everything.discard(subscription)
+        for index, keys in ((self._by_instrument, subscription.instrument_ids), (self._by_test, subscription.test_ids)):
+            for key in keys:
+                subscribers = index.get(key)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del index[key]
+
+    def has_subscribers(self) -> bool:
+        return bool(self._everything or self._by_instrument or self._by_test)
+
+    def dispatch(self, event: dict):
+        targets = set(self._everything)
+        targets.update(self._by_instrument.get(event.get("instrument_id"), ()))
+        targets.update(self._by_test.get(event.get("test_id"), ()))
+        for subscription in targets:
+            subscription.offer(event)
+        self.published += 1
+
+    def stats(self) -> Dict[str, Any]:
+        subscribers = set(self._everything)
+        for index in (self._by_instrument, self._by_test):
+            for subscription_set in index.values():
+                subscribers.update(subscription_set)
+        return {
+            "backend": LIVE_FEED_BACKEND,
+            "subscribers": len(subscribers),
+            "instruments_watched": len(self._by_instrument),
+            "tests_watched": len(self._by_test),
+            "published": self.published,
+        }
+
+
+hub = FeedHub()
+
+
+def active() -> bool:
+    #Lets writers skip building events nobody could receive
+    return LIVE_FEED_BACKEND == "postgres" or hub.has_subscribers()
+
+
+def result_event(kind: str, result, instrument_id: Optional[int]) -> dict:
+    #kind is created / updated / reevaluated; result is anything schemas.QCResult can validate
+    return {
+        "type": f"result.{kind}",
+        "test_id": result.test_id,
+        "instrument_id": instrument_id,
+        "result": QCResult.model_validate(result).model_dump(mode="json"),
+    }
+
+
+async def publish(events: List[dict]):
+    """Call after the change has committed"""
+    if not events:
+        return
+    if LIVE_FEED_BACKEND == "postgres":
+        await _notify(events)
+    else:
+        for event in events:
+            hub.dispatch(event)
+
+
+async def _notify(events: List[dict]):
+    try:
+        async with async_engine.connect() as conn:
+            for event in events:
+                #NOTIFY payloads are capped at 8000 bytes, a single result event is well under that
+                await conn.execute(select(func.pg_notify(NOTIFY_CHANNEL, json.dumps(event))))
+            await conn.commit()
+    except Exception:
+        #The feed is best effort; the write it describes has already committed
+        logger.exception("Live feed NOTIFY failed")
+
+
+class PostgresListener:
+    """Keeps one LISTEN connection per worker and hands every notification to the local hub"""
+
+    def __init__(self, channel: str = NOTIFY_CHANNEL, retry_interval: float = 2.0):
+        self.channel = channel
+        self.retry_interval = retry_interval
+        self._task: Optional[asyncio.Task] = None
+
+    def _on_notify(self, connection, pid, channel, payload):
+        try:
+            hub.dispatch(json.loads(payload))
+        except ValueError:
+            logger.warning("Ignoring malformed live feed payload")
+
+    async def _run(self):
+        #Only needed with the postgres backend
+        import asyncpg
+
+        dsn = make_url(ASYNC_DATABASE_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(dsn)
+                await connection.add_listener(self.channel, self._on_notify)
+                #Wake up now and then to notice a dropped connection and reconnect
+                while not connection.is_closed():
+                    await asyncio.sleep(self.retry_interval)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Live feed LISTEN connection failed, retrying")
+            finally:
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+            await asyncio.sleep(self.retry_interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+
+listener = PostgresListener()
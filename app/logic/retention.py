@@ -0,0 +1,110 @@
+"""
+Retention job: moves whole months of qc_results and audit_logs older than QC_RETENTION_MONTHS into
+compressed Parquet files under QC_ARCHIVE_DIR, then removes them from the database (dropping the
+month's partition on PostgreSQL). Also creates the next QC_PARTITIONS_AHEAD monthly partitions and
+removes submission idempotency keys older than IDEMPOTENCY_KEY_DAYS.
+Run it from cron or a scheduled container, e.g. nightly:
+
+    python -m app.logic.retention
+    python -m app.logic.retention --older-than-months 36 --dry-run
+    python -m app.logic.retention --partitions-only
+
+A month is only removed from the database after its file has been written and holds every row of it.
+Rolling statistics (test_aggregates, qc_daily_summaries) are left as they are, the rows still count.
+"""
+import argparse
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, select
+
+from app.crud import idempotency
+from app.db import cold_storage, partitions
+from app.db.session import engine
+from app.models import qc as models
+
+ROWS_PER_FETCH = 5000
+
+
+def _oldest_month(conn, table):
+    oldest = conn.execute(select(func.min(table.c.timestamp))).scalar()
+    return partitions.month_start(cold_storage.as_utc(oldest)) if oldest is not None else None
+
+
+def archive_month(conn, table_name: str, month, dry_run: bool = False) -> int:
+    table = cold_storage.TABLES[table_name]
+    start, end = partitions.month_bounds(month)
+    in_range = (table.c.timestamp >= start) & (table.c.timestamp < end)
+
+    count = conn.execute(select(func.count()).select_from(table).where(in_range)).scalar()
+    if dry_run or not count:
+        return count
+
+    result = conn.execution_options(stream_results=True, yield_per=ROWS_PER_FETCH).execute(
+        select(table).where(in_range).order_by(table.c.timestamp, table.c.id)
+    )
+    streamed = 0
+
+    def batches():
+        nonlocal streamed
+        for batch in result.partitions():
+            streamed += len(batch)
+            yield [dict(row._mapping) for row in batch]
+
+    cold_storage.write_month(table_name, month, batches())
+    if streamed != count:
+        raise RuntimeError(f"{table_name} {month:%Y-%m}: wrote {streamed} rows, database has {count}; not removing")
+
+    if partitions.is_partitioned(conn, table_name) and month in partitions.list_partitions(conn, table_name):
+        partitions.drop_partition(conn, table_name, month)
+    #Also catches rows that landed in the default partition (or the whole month, when not partitioned)
+    conn.execute(table.delete().where(in_range))
+    conn.commit()
+    return count
+
+
+def purge_submission_keys(conn, days: int = idempotency.KEY_RETENTION_DAYS) -> int:
+    #An analyzer retry arrives within minutes; the keys only need to outlive that
+    keys = models.SubmissionKey.__table__
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    removed = conn.execute(keys.delete().where(keys.c.created_at < cutoff)).rowcount
+    conn.commit()
+    return removed
+
+
+def run(older_than_months: int = cold_storage.RETENTION_MONTHS, dry_run: bool = False, partitions_only: bool = False):
+    cutoff = partitions.add_months(partitions.month_start(datetime.now(timezone.utc)), -older_than_months)
+    with engine.connect() as conn:
+        for table_name in cold_storage.TABLES:
+            if partitions.is_partitioned(conn, table_name) and not dry_run:
+                created = partitions.ensure_partitions(conn, table_name)
+                conn.commit()
+                for month in created:
+                    print(f"{table_name}: created partition {partitions.partition_name(table_name, month)}")
+            if partitions_only:
+                continue
+
+            month = _oldest_month(conn, cold_storage.TABLES[table_name])
+            while month is not None and month < cutoff:
+                moved = archive_month(conn, table_name, month, dry_run=dry_run)
+                if moved:
+                    verb = "would move" if dry_run else "moved"
+                    print(f"{table_name} {month:%Y-%m}: {verb} {moved:,} rows to {cold_storage.month_path(table_name, month)}")
+                month = partitions.add_months(month, 1)
+
+        if not dry_run and not partitions_only:
+            removed = purge_submission_keys(conn)
+            if removed:
+                print(f"qc_submission_keys: removed {removed:,} keys older than {idempotency.KEY_RETENTION_DAYS} days")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--older-than-months", type=int, default=cold_storage.RETENTION_MONTHS)
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be moved")
+    parser.add_argument("--partitions-only", action="store_true", help="Only create upcoming partitions")
+    args = parser.parse_args()
+    run(args.older_than_months, dry_run=args.dry_run, partitions_only=args.partitions_only)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,47 +1,58 @@
 from decimal import Decimal
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel
 
+#Rule names as they appear in the engine's messages, in precedence order
+RULE_NAMES = ("1-3s", "2-2s", "R-4s", "4-1s", "10-x", "1-2s")
+
 class ValidationResult(BaseModel):
     status: str
     message: str
+    z_score: Optional[Decimal] = None
 
 def calculate_z_score(value: Decimal, mean: Decimal, std_dev: Decimal) -> Decimal:
     if std_dev == 0: return Decimal("0")
     return (value - mean) / std_dev
 
+def rule_name(message: Optional[str]) -> Optional[str]:
+    #"Rule 1-3s Violation: ..." -> "1-3s"; PASS (and reviewer text) -> None
+    for rule in RULE_NAMES:
+        if message and rule in message:
+            return rule
+    return None
+
 def evaluate_westgard(value: Decimal, mean: Decimal, std_dev: Decimal, history:List[Decimal]) -> ValidationResult:
     current_z = calculate_z_score(value, mean, std_dev)
 
     #Rule 1-3s: REJECT (Random Error)
     if abs(current_z) > 3:
-        return ValidationResult(status="REJECT", message="Rule 1-3s Violation: Result exceeds 3SD")
+        return ValidationResult(status="REJECT", message="Rule 1-3s Violation: Result exceeds 3SD", z_score=current_z)
     
     #Rule 2-2s: REJECT (Systemic Error)
     if len(history) > 1:
         prev_z = history[0]
         if (current_z > 2 and prev_z > 2) or (current_z < -2 and prev_z < -2):
-            return ValidationResult(status="REJECT", message="2-2s Violation")
+            return ValidationResult(status="REJECT", message="2-2s Violation", z_score=current_z)
         
     #Rule R-4s: REJECT (Random Error)
     if len(history) >= 1:
         if abs(current_z - history[0]) >= 4:
-            return ValidationResult(status="REJECT", message="R-4s Violation")    
+            return ValidationResult(status="REJECT", message="R-4s Violation", z_score=current_z)    
 
     #Rule 4-1s: REJECT (Systematic Error)
     if len(history) >= 3:
         last_4 = [current_z] + history[:3]
         if all(z > 1 for z in last_4) or all(z < -1 for z in last_4):
-            return ValidationResult(status="REJECT", message="4-1s Violation")
+            return ValidationResult(status="REJECT", message="4-1s Violation", z_score=current_z)
 
     #Rule 10-x: REJECT (Systematic Error/Bias)
     if len(history) >= 9:
         last_10 = [current_z] + history[:9]
         if all(z > 0 for z in last_10) or all(z < 0 for z in last_10):
-            return ValidationResult(status="REJECT", message="10-x Violation")
+            return ValidationResult(status="REJECT", message="10-x Violation", z_score=current_z)
 
     #Rule 1-2s: WARNING (Random Error)
     if abs(current_z) > 2:
-        return ValidationResult(status="WARNING", message="Rule 1-2s Warning: Result exceeds 2SD")
+        return ValidationResult(status="WARNING", message="Rule 1-2s Warning: Result exceeds 2SD", z_score=current_z)
         
-    return ValidationResult(status="PASS", message="Results within acceptable limits")
\ No newline at end of file
+    return ValidationResult(status="PASS", message="Results within acceptable limits", z_score=current_z)
\ No newline at end of file
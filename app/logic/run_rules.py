@@ -0,0 +1,69 @@
+from decimal import Decimal
+from typing import List, NamedTuple, Optional, Sequence
+
+from app.logic.rules_engine import ValidationResult
+
+#Across-level rules, checked after each level has been through evaluate_westgard against its own history.
+#2-2s and R-4s look within the run; 4-1s and 10-x count consecutive results across levels and runs.
+RUN_MESSAGES = {
+    "2-2s": "2-2s Violation (across levels)",
+    "R-4s": "R-4s Violation (within run)",
+    "4-1s": "4-1s Violation (across levels)",
+    "10-x": "10-x Violation (across levels)",
+}
+STATUS_SEVERITY = {"PASS": 0, "WARNING": 1, "REJECT": 2}
+PASS_MESSAGE = "Results within acceptable limits"
+
+
+class RunEvaluation(NamedTuple):
+    #Per level, in the order the levels were passed in
+    results: List[ValidationResult]
+    status: str
+    message: str
+    #Across-level rule that rejected the run, if any
+    run_rule: Optional[str]
+
+
+def _same_side(z_scores: Sequence[Decimal], limit: int) -> bool:
+    return all(z > limit for z in z_scores) or all(z < -limit for z in z_scores)
+
+
+def across_level_rule(run_z: Sequence[Decimal], set_history: Sequence[Decimal]) -> Optional[str]:
+    """run_z: this run's z-scores, newest first. set_history: earlier z-scores of every level in the set, newest first."""
+    if len(run_z) > 1:
+        if sum(1 for z in run_z if z > 2) >= 2 or sum(1 for z in run_z if z < -2) >= 2:
+            return "2-2s"
+        if max(run_z) - min(run_z) >= 4:
+            return "R-4s"
+
+    combined = list(run_z) + list(set_history[:10])
+    if len(combined) >= 4 and _same_side(combined[:4], 1):
+        return "4-1s"
+    if len(combined) >= 10 and _same_side(combined[:10], 0):
+        return "10-x"
+    return None
+
+
+def evaluate_run(level_results: List[ValidationResult], set_history: Sequence[Decimal]) -> RunEvaluation:
+    """Combine the per-level evaluate_westgard results of one run with the across-level rules.
+    An across-level violation rejects every level of the run; a level's own REJECT message is kept."""
+    #Levels are stored in order, so the highest level is the newest row of the run
+    run_rule = across_level_rule([result.z_score for result in reversed(level_results)], set_history)
+
+    results = level_results
+    if run_rule is not None:
+        message = RUN_MESSAGES[run_rule]
+        results = [
+            result if result.status == "REJECT"
+            else ValidationResult(status="REJECT", message=message, z_score=result.z_score)
+            for result in level_results
+        ]
+
+    worst = max(results, key=lambda result: STATUS_SEVERITY.get(result.status, 0))
+    if run_rule is not None:
+        message = RUN_MESSAGES[run_rule]
+    elif worst.status == "PASS":
+        message = PASS_MESSAGE
+    else:
+        message = "; ".join(dict.fromkeys(result.message for result in results if result.status != "PASS"))
+    return RunEvaluation(results=results, status=worst.status, message=message, run_rule=run_rule)
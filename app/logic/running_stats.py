@@ -0,0 +1,67 @@
+import math
+from decimal import Decimal
+from typing import List, Optional, Sequence, Tuple
+
+#Rolling windows reported next to the cumulative figures; the largest one bounds what we keep per test
+WINDOW_SIZES = (20, 30, 100)
+MAX_WINDOW = max(WINDOW_SIZES)
+
+
+def add_value(count: int, total: Decimal, m2: float, value: Decimal) -> Tuple[int, Decimal, float]:
+    """Welford update for one new observation"""
+    if count == 0:
+        return 1, value, 0.0
+    old_mean = total / count
+    count += 1
+    total += value
+    new_mean = total / count
+    m2 += float((value - old_mean) * (value - new_mean))
+    return count, total, m2
+
+
+def remove_value(count: int, total: Decimal, m2: float, value: Decimal) -> Tuple[int, Decimal, float]:
+    """Reverse Welford update, for a result leaving the population (e.g. archived)"""
+    if count <= 1:
+        return 0, Decimal("0"), 0.0
+    old_mean = total / count
+    count -= 1
+    total -= value
+    new_mean = total / count
+    m2 -= float((value - new_mean) * (value - old_mean))
+    #Float drift can push a near-zero M2 slightly negative
+    return count, total, max(m2, 0.0)
+
+
+def summarize(count: int, total: Decimal, m2: float) -> Tuple[Optional[float], Optional[float]]:
+    """Mean and sample SD, matching statistics.mean/stdev (SD is 0 for a single value)"""
+    if count == 0:
+        return None, None
+    mean = float(total / count)
+    sd = math.sqrt(m2 / (count - 1)) if count > 1 else 0.0
+    return mean, sd
+
+
+def window_summary(values: Sequence[Decimal]) -> Tuple[Optional[float], Optional[float]]:
+    count, total, m2 = 0, Decimal("0"), 0.0
+    for value in values:
+        count, total, m2 = add_value(count, total, m2, value)
+    return summarize(count, total, m2)
+
+
+def cv_percent(mean: Optional[float], sd: Optional[float]) -> Optional[float]:
+    if mean is None or sd is None or mean == 0:
+        return None
+    return sd / abs(mean) * 100
+
+
+def bias_percent(mean: Optional[float], target: Decimal) -> Optional[float]:
+    if mean is None or not target:
+        return None
+    return (mean - float(target)) / float(target) * 100
+
+
+def push_recent(recent: List[list], entries: Sequence[Tuple[int, Decimal]]) -> List[list]:
+    """recent is [[result_id, "value"], ...] newest first; entries are oldest first and all newer than recent[0]"""
+    for result_id, value in entries:
+        recent = [[result_id, str(value)]] + recent
+    return recent[:MAX_WINDOW]
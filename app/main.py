@@ -1,11 +1,35 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.db.session import engine, Base
+from fastapi.responses import PlainTextResponse
+from app import metrics
 from app.api.endpoints import router as api_router
+from app.api.exports import router as export_router
+from app.api.live import router as live_router
+from app.crud.audit import OUTBOX_ENABLED
+from app.db.replicas import replica_set
+from app.logic.audit_writer import writer as audit_writer
+from app.logic import astm_listener, live_feed
 from fastapi.middleware.cors import CORSMiddleware
 
-Base.metadata.create_all(bind=engine)
+#The schema is owned by Alembic now, run `alembic upgrade head` before starting the API
 
-app = FastAPI(title="LIMS-QC-Automate")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if OUTBOX_ENABLED:
+        audit_writer.start()
+    if live_feed.LIVE_FEED_BACKEND == "postgres":
+        live_feed.listener.start()
+    if astm_listener.ASTM_LISTEN_PORT:
+        astm_listener.listener.start()
+    #No-op without DATABASE_REPLICA_URLS
+    replica_set.start()
+    yield
+    await replica_set.stop()
+    await astm_listener.listener.stop()
+    await live_feed.listener.stop()
+    await audit_writer.stop()
+
+app = FastAPI(title="LIMS-QC-Automate", lifespan=lifespan)
 
 origins = [
     "http://localhost:5173",
@@ -20,9 +44,19 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+#Outermost, so its timing includes CORS handling and the full response body
+app.add_middleware(metrics.MetricsMiddleware)
+
 app.include_router(api_router, prefix="/api/v1")
+app.include_router(export_router, prefix="/api/v1")
+app.include_router(live_router, prefix="/api/v1")
+
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/")
 def read_root():
@@ -0,0 +1,225 @@
+import contextvars
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional, Sequence, Tuple
+
+from app.logic.rules_engine import rule_name
+
+#Per-process Prometheus metrics, rendered by GET /metrics in the text exposition format.
+#With several uvicorn workers each one reports its own numbers; scrape them all or aggregate upstream.
+
+slow_query_logger = logging.getLogger("app.slow_query")
+
+#Unset disables the slow-query log; otherwise statements slower than this many milliseconds are logged
+#with their bind parameters (which can include patient-adjacent values, so keep it off by default)
+SLOW_QUERY_MS = os.getenv("SLOW_QUERY_MS")
+SLOW_QUERY_SECONDS = float(SLOW_QUERY_MS) / 1000 if SLOW_QUERY_MS else None
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ENGINE_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.01)
+STATEMENT_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _le(bound) -> str:
+    return f'le="{bound}"'
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                yield f"{self.name}{_labels(self.label_names, labels)} {_number(value)}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        #labels -> [per-bucket counts..., +Inf count, sum]
+        self._series: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    yield f"{self.name}_bucket{_labels(self.label_names, labels, _le(bound))} {count}"
+                yield f"{self.name}_bucket{_labels(self.label_names, labels, _le('+Inf'))} {series[-2]}"
+                yield f"{self.name}_sum{_labels(self.label_names, labels)} {_number(series[-1])}"
+                yield f"{self.name}_count{_labels(self.label_names, labels)} {series[-2]}"
+
+
+REQUESTS = Counter("qc_http_requests_total", "HTTP requests handled", ["method", "route", "status"])
+REQUEST_SECONDS = Histogram(
+    "qc_http_request_duration_seconds", "Time spent in the handler, response body included", ["method", "route"]
+)
+REQUEST_STATEMENTS = Histogram(
+    "qc_http_request_db_statements", "SQL statements executed per request", ["method", "route"], STATEMENT_BUCKETS
+)
+DB_STATEMENTS = Counter("qc_db_statements_total", "SQL statements executed", ["method", "route"])
+DB_SECONDS = Counter("qc_db_time_seconds_total", "Time spent waiting on SQL statements", ["method", "route"])
+DB_ROWS = Counter("qc_db_rows_total", "Rows returned or affected, as reported by the driver", ["method", "route"])
+SLOW_QUERIES = Counter("qc_db_slow_queries_total", "Statements slower than SLOW_QUERY_MS", ["method", "route"])
+RULES_SECONDS = Histogram("qc_rules_evaluation_seconds", "evaluate_westgard time per result", [], ENGINE_BUCKETS)
+RULE_OUTCOMES = Counter("qc_westgard_outcomes_total", "Rules engine decisions by the rule that fired", ["rule", "status"])
+IDEMPOTENT_REPLAYS = Counter(
+    "qc_idempotent_replays_total", "Submissions answered with an already stored result", ["endpoint"]
+)
+
+DB_READ_ROUTES = Counter(
+    "qc_db_read_routes_total", "Read-only endpoint sessions by where they were served (replica or primary)", ["target"]
+)
+
+REGISTRY = [
+    REQUESTS, REQUEST_SECONDS, REQUEST_STATEMENTS, DB_STATEMENTS, DB_SECONDS, DB_ROWS,
+    SLOW_QUERIES, RULES_SECONDS, RULE_OUTCOMES, IDEMPOTENT_REPLAYS, DB_READ_ROUTES,
+]
+
+
+def render() -> str:
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+def _route(scope) -> str:
+    #Route template (/api/v1/results/{result_id}) keeps the label set bounded
+    return getattr(scope.get("route"), "path", None) or "unmatched"
+
+
+class RequestStats:
+    __slots__ = ("scope", "statements", "db_seconds", "rows")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.rows = 0
+
+
+#Set by the middleware for the lifetime of one request; SQL run outside a request (scripts, the
+#audit writer) is counted under route="background"
+current_request: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar("current_request", default=None)
+
+
+def _rows_reported(cursor) -> int:
+    if cursor.rowcount is not None and cursor.rowcount >= 0:
+        return cursor.rowcount
+    #SQLite reports -1 for SELECT; SQLAlchemy's async adapters keep the prefetched rows on the cursor
+    rows = getattr(cursor, "_rows", None)
+    return len(rows) if rows is not None else 0
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    #On the statement's own execution context rather than the pooled connection: one that raises never
+    #reaches after_cursor_execute, and its start time goes away with it
+    if context is not None:
+        context._query_start = time.perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_query_start", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    stats = current_request.get()
+    rows = _rows_reported(cursor)
+    if stats is not None:
+        stats.statements += 1
+        stats.db_seconds += elapsed
+        stats.rows += rows
+    else:
+        DB_STATEMENTS.inc("", "background")
+        DB_SECONDS.inc("", "background", amount=elapsed)
+        DB_ROWS.inc("", "background", amount=rows)
+
+    if SLOW_QUERY_SECONDS is not None and elapsed >= SLOW_QUERY_SECONDS:
+        method, route = (stats.scope["method"], _route(stats.scope)) if stats is not None else ("", "background")
+        SLOW_QUERIES.inc(method, route)
+        slow_query_logger.warning(
+            "slow query %.1f ms on %s %s: %s | params=%r", elapsed * 1000, method, route, statement, parameters
+        )
+
+
+def rule_fired(message: str) -> str:
+    return rule_name(message) or "none"
+
+
+def observe_evaluation(seconds: float, status: str, message: str):
+    RULES_SECONDS.observe(seconds)
+    RULE_OUTCOMES.inc(rule_fired(message), status)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware, so the timing covers streamed bodies and the contextvar reaches the SQL hooks"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = current_request.set(stats)
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            current_request.reset(token)
+            route = _route(scope)
+            method = scope["method"]
+            REQUESTS.inc(method, route, str(status["code"]))
+            REQUEST_SECONDS.observe(elapsed, method, route)
+            REQUEST_STATEMENTS.observe(stats.statements, method, route)
+            DB_STATEMENTS.inc(method, route, amount=stats.statements)
+            DB_SECONDS.inc(method, route, amount=stats.db_seconds)
+            DB_ROWS.inc(method, route, amount=stats.rows)
@@ -1,10 +1,11 @@
 import enum
-from sqlalchemy import Integer, String, DateTime, ForeignKey, Numeric, Boolean, Enum
+from sqlalchemy import Integer, String, DateTime, ForeignKey, Numeric, Boolean, Enum, Index, Float, JSON, UniqueConstraint, Date
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
 from app.db.session import Base
 from decimal import Decimal
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional
 
 class Instrument(Base):
@@ -17,18 +18,37 @@ class Instrument(Base):
     
     test_definitions = relationship("TestDefinition", back_populates="instrument")
 
+class ControlSet(Base):
+    #The control levels (one TestDefinition each) run together for an analyte on an instrument
+    __tablename__ = "control_sets"
+    __table_args__ = (UniqueConstraint("instrument_id", "analyte_name"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    instrument_id: Mapped[int] = mapped_column(Integer, ForeignKey("instruments.id"))
+    analyte_name: Mapped[str] = mapped_column(String, nullable=False)
+    name: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+
+    test_definitions = relationship(
+        "TestDefinition", back_populates="control_set", order_by="TestDefinition.control_level"
+    )
+
 class TestDefinition(Base):
     __tablename__ = "test_definitions"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
-    instrument_id: Mapped[int] = mapped_column(Integer, ForeignKey("instruments.id"))
+    instrument_id: Mapped[int] = mapped_column(Integer, ForeignKey("instruments.id"), index=True)
     analyte_name: Mapped[str] = mapped_column(String, nullable=False)
     units: Mapped[str] = mapped_column(String)
     
     mean: Mapped[Decimal] = mapped_column(Numeric(10, 3))
     std_dev: Mapped[Decimal] = mapped_column(Numeric(10, 3))
 
+    #Set for tests that are one level of a ControlSet (1 = lowest)
+    control_set_id: Mapped[Optional[int]] = mapped_column(Integer, ForeignKey("control_sets.id"), nullable=True, index=True)
+    control_level: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+
     instrument = relationship("Instrument", back_populates="test_definitions")
+    control_set = relationship("ControlSet", back_populates="test_definitions")
     results = relationship("QCResult", back_populates="test_definition")
 
 class QCResult(Base):
@@ -48,9 +68,94 @@ class QCResult(Base):
     reviewed_by_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
     reviewed_by_name: Mapped[Optional[str]] = mapped_column(String, nullable=True)
     reviewer_comment: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    #Multi-level runs submitted through POST /runs/; NULL for single results
+    run_id: Mapped[Optional[int]] = mapped_column(Integer, ForeignKey("qc_runs.id"), nullable=True, index=True)
+    #The analyzer's own run id and sample sequence number, when the middleware sends them
+    instrument_run_id: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    sample_sequence: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
 
     test_definition = relationship("TestDefinition", back_populates="results")
 
+    #Fetch the server-side timestamp on flush so the CREATE audit delta can record it
+    __mapper_args__ = {"eager_defaults": True}
+
+#Westgard history fetch and stats: newest non-archived results for one test
+Index(
+    "ix_qc_results_test_active_ts",
+    QCResult.test_id, QCResult.timestamp.desc(), QCResult.id.desc(),
+    postgresql_where=QCResult.status != "ARCHIVED",
+    sqlite_where=QCResult.status != "ARCHIVED",
+)
+#Stats with include_archived=true
+Index("ix_qc_results_test_ts", QCResult.test_id, QCResult.timestamp.desc())
+#Result listing, which only ever shows non-archived rows
+Index(
+    "ix_qc_results_unarchived_ts",
+    QCResult.timestamp.desc(), QCResult.id.desc(),
+    postgresql_where=QCResult.is_archived == False,
+    sqlite_where=QCResult.is_archived == False,
+)
+#QC status board: unreviewed REJECT/WARNING results per test
+Index(
+    "ix_qc_results_test_open",
+    QCResult.test_id,
+    postgresql_where=QCResult.status.in_(("REJECT", "WARNING")) & QCResult.reviewed_by_id.is_(None),
+    sqlite_where=QCResult.status.in_(("REJECT", "WARNING")) & QCResult.reviewed_by_id.is_(None),
+)
+
+class SubmissionKey(Base):
+    #One row per idempotent submission (Idempotency-Key header, or test + instrument run id + sample sequence).
+    #Its own table: a unique index on the partitioned qc_results would have to include timestamp
+    __tablename__ = "qc_submission_keys"
+
+    key: Mapped[str] = mapped_column(String(300), primary_key=True)
+    result_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+class QCRun(Base):
+    #All control levels of one analytical run; status is the worst of its results
+    __tablename__ = "qc_runs"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    control_set_id: Mapped[int] = mapped_column(Integer, ForeignKey("control_sets.id"), index=True)
+    timestamp: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    user_id: Mapped[int] = mapped_column(Integer)
+    status: Mapped[str] = mapped_column(String)
+    system_comment: Mapped[str] = mapped_column(String)
+
+    results = relationship("QCResult", order_by="QCResult.id")
+
+class TestAggregate(Base):
+    #Running statistics over a test's non-archived results, kept in step with qc_results by the CRUD layer
+    __tablename__ = "test_aggregates"
+
+    test_id: Mapped[int] = mapped_column(Integer, ForeignKey("test_definitions.id"), primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, default=0)
+    total: Mapped[Decimal] = mapped_column(Numeric(20, 3), default=0)
+    m2: Mapped[float] = mapped_column(Float, default=0.0) #Welford sum of squared deviations
+    #[[result_id, "value"], ...] newest first, enough for the largest rolling window. NULL = not loaded yet
+    recent: Mapped[Optional[list]] = mapped_column(JSON, nullable=True)
+    #Bumped by every write that changes what the stats endpoint returns for the test; its ETag
+    version: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+
+class QCDailySummary(Base):
+    #Per test per UTC day rollup of the non-archived results, kept in step by the CRUD layer like
+    #TestAggregate. Sums rather than means so buckets can be merged into months (and un-merged on archive).
+    #rule_* count the rule named in the engine's system_comment, which a review doesn't change
+    __tablename__ = "qc_daily_summaries"
+
+    test_id: Mapped[int] = mapped_column(Integer, ForeignKey("test_definitions.id"), primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, default=0)
+    total: Mapped[Decimal] = mapped_column(Numeric(20, 3), default=0)
+    total_sq: Mapped[Decimal] = mapped_column(Numeric(30, 6), default=0)
+    rule_1_3s: Mapped[int] = mapped_column(Integer, default=0)
+    rule_2_2s: Mapped[int] = mapped_column(Integer, default=0)
+    rule_r_4s: Mapped[int] = mapped_column(Integer, default=0)
+    rule_4_1s: Mapped[int] = mapped_column(Integer, default=0)
+    rule_10_x: Mapped[int] = mapped_column(Integer, default=0)
+    rule_1_2s: Mapped[int] = mapped_column(Integer, default=0)
+
 class AuditLog(Base):
     __tablename__ = "audit_logs"
 
@@ -58,11 +163,28 @@ class AuditLog(Base):
     table_name: Mapped[str] = mapped_column(String)
     record_id: Mapped[int] = mapped_column(Integer)
     action: Mapped[str] = mapped_column(String) #CRUD
-    old_value: Mapped[str] = mapped_column(String, nullable=True)
-    new_value: Mapped[str] = mapped_column(String, nullable=True)
+    #Only the fields this action touched: {"field": {"old": ..., "new": ...}}
+    changes: Mapped[Optional[dict]] = mapped_column(JSON().with_variant(JSONB(), "postgresql"), nullable=True)
     user_id: Mapped[int] = mapped_column(Integer, nullable=True) #For Auth if implemented
     timestamp: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
+#Audit trail browsing (newest first) and per-record history lookups
+Index("ix_audit_logs_ts", AuditLog.timestamp.desc(), AuditLog.id.desc())
+Index("ix_audit_logs_record", AuditLog.table_name, AuditLog.record_id)
+
+class AuditOutbox(Base):
+    #Audit events committed with the change they describe, waiting for the background writer
+    #(AUDIT_WRITER=outbox) to move them into audit_logs. No secondary indexes, so it stays cheap to append to
+    __tablename__ = "audit_outbox"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    table_name: Mapped[str] = mapped_column(String)
+    record_id: Mapped[int] = mapped_column(Integer)
+    action: Mapped[str] = mapped_column(String)
+    changes: Mapped[Optional[dict]] = mapped_column(JSON().with_variant(JSONB(), "postgresql"), nullable=True)
+    user_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    timestamp: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
 class UserRole(str, enum.Enum):
     TECH = "tech"
     SUPERVISOR = "supervisor"
@@ -1,6 +1,6 @@
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import AliasChoices, BaseModel, Field, ConfigDict
 from decimal import Decimal
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional
 
 class InstrumentBase(BaseModel):
@@ -29,6 +29,23 @@ class TestDefinitionCreate(TestDefinitionBase):
 class TestDefinition(TestDefinitionBase):
     id: int
     instrument_id: int
+    control_set_id: Optional[int] = None
+    control_level: Optional[int] = None
+    model_config = ConfigDict(from_attributes=True)
+
+class ControlSetCreate(BaseModel):
+    instrument_id: int
+    analyte_name: str
+    name: Optional[str] = None
+    #One test definition per control level, lowest level first
+    test_ids: list[int] = Field(..., min_length=1)
+
+class ControlSet(BaseModel):
+    id: int
+    instrument_id: int
+    analyte_name: str
+    name: Optional[str] = None
+    test_definitions: list[TestDefinition] = []
     model_config = ConfigDict(from_attributes=True)
 
 class QCResultCreate(BaseModel):
@@ -36,16 +53,64 @@ class QCResultCreate(BaseModel):
     test_id: int
     user_id: Optional[int] = None
     user_comment: Optional[str] = None
+    #Together they identify the sample on the analyzer, so a retried submission isn't stored twice
+    instrument_run_id: Optional[str] = Field(None, max_length=64)
+    sample_sequence: Optional[int] = None
 
 class QCResult(QCResultCreate):
     id: int
     test_id: int
+    run_id: Optional[int] = None
     timestamp: datetime
     status: str
     system_comment: str
     user_comment: Optional[str] = None
     reviewed_by_name: Optional[str] = None
-    review_comment: Optional[str] = None
+    #Stored as reviewer_comment on the model
+    review_comment: Optional[str] = Field(None, validation_alias=AliasChoices("review_comment", "reviewer_comment"))
+    model_config = ConfigDict(from_attributes=True)
+
+class QCResultBatchItem(QCResultCreate):
+    #Analyzers flushing a backlog send the run time; falls back to receive time if omitted
+    timestamp: Optional[datetime] = None
+
+class QCResultBatchCreate(BaseModel):
+    results: list[QCResultBatchItem]
+
+class QCResultBatchStatus(BaseModel):
+    index: int
+    success: bool
+    #The item's submission key was already stored; result is the original, nothing was written
+    replayed: bool = False
+    detail: Optional[str] = None
+    result: Optional[QCResult] = None
+
+class QCResultBatchResponse(BaseModel):
+    created: int
+    replayed: int = 0
+    failed: int
+    items: list[QCResultBatchStatus]
+
+class QCRunLevel(BaseModel):
+    test_id: int
+    value: Decimal
+    user_comment: Optional[str] = None
+
+class QCRunCreate(BaseModel):
+    control_set_id: int
+    user_id: Optional[int] = None
+    #Run time from the analyzer; falls back to receive time if omitted
+    timestamp: Optional[datetime] = None
+    results: list[QCRunLevel] = Field(..., min_length=1)
+
+class QCRun(BaseModel):
+    id: int
+    control_set_id: int
+    timestamp: datetime
+    user_id: int
+    status: str
+    system_comment: str
+    results: list[QCResult] = []
     model_config = ConfigDict(from_attributes=True)
 
 class QCResultUpdate(BaseModel):
@@ -55,6 +120,12 @@ class QCResultUpdate(BaseModel):
     review_comment: Optional[str] = None
     reviewed_by_name: Optional[str] = None
 
+class WindowStats(BaseModel):
+    n: int
+    mean: Optional[float] = None
+    sd: Optional[float] = None
+    cv: Optional[float] = None
+
 class TestStats(BaseModel):
     test_definition: TestDefinition
     recent_results: list[QCResult]
@@ -62,15 +133,89 @@ class TestStats(BaseModel):
     target_sd: Decimal
     actual_mean: Decimal
     actual_sd: Decimal
+    #Over every non-archived result; CV and bias (vs. target mean) are percentages
+    result_count: int = 0
+    cumulative_mean: Optional[float] = None
+    cumulative_sd: Optional[float] = None
+    cumulative_cv: Optional[float] = None
+    bias: Optional[float] = None
+    windows: dict[int, WindowStats] = {}
+
+class SummaryBucket(BaseModel):
+    #period is the day or the first of the month; None for the whole-range total
+    period: Optional[date] = None
+    n: int
+    mean: Optional[float] = None
+    sd: Optional[float] = None
+    cv: Optional[float] = None
+    #Engine flags (from system_comment), so a reviewed REJECT still counts here
+    rejects: int = 0
+    warnings: int = 0
+    rules: dict[str, int] = {}
+
+class TestSummary(BaseModel):
+    test_id: int
+    granularity: str
+    start: Optional[date] = None
+    end: Optional[date] = None
+    buckets: list[SummaryBucket]
+    total: SummaryBucket
+
+class TestStatus(BaseModel):
+    test_id: int
+    analyte_name: str
+    units: Optional[str] = None
+    control_level: Optional[int] = None
+    target_mean: Decimal
+    target_sd: Decimal
+    #Newest non-archived result; all None for a test with no results yet
+    latest_result_id: Optional[int] = None
+    latest_value: Optional[Decimal] = None
+    latest_status: Optional[str] = None
+    latest_system_comment: Optional[str] = None
+    latest_timestamp: Optional[datetime] = None
+    #REJECT/WARNING results nobody has reviewed yet
+    open_rejects: int = 0
+    open_warnings: int = 0
+    window_n: int = 0
+    window_mean: Optional[float] = None
+    window_sd: Optional[float] = None
+
+class InstrumentStatus(BaseModel):
+    instrument_id: int
+    name: str
+    serial_number: Optional[str] = None
+    open_rejects: int = 0
+    open_warnings: int = 0
+    tests: list[TestStatus]
+
+class QCStatusBoard(BaseModel):
+    window: int
+    instruments: list[InstrumentStatus]
+
+class User(BaseModel):
+    #Snapshot used for auth checks; never carries the password hash
+    id: int
+    username: str
+    full_name: Optional[str] = None
+    role: str
+    model_config = ConfigDict(from_attributes=True)
 
 class AuditLog(BaseModel):
     id: int
     table_name: str
     record_id: int
     action: str
-    old_value: Optional[str] = None
-    new_value: Optional[str] = None
+    changes: Optional[dict] = None
     user_id: Optional[int]
     timestamp: datetime
 
     model_config = ConfigDict(from_attributes=True)
+
+class RecordState(BaseModel):
+    #A record as it stood at `at`, rebuilt from its audit deltas
+    table_name: str
+    record_id: int
+    at: Optional[datetime] = None
+    versions: int
+    state: dict
@@ -0,0 +1,175 @@
+"""
+Simulated analyzers for the ASTM listener (app/logic/astm_listener.py): many concurrent instrument
+connections, each sending QC messages with E1381 framing and waiting for every ACK like a real analyzer.
+
+    python -m benchmarks.astm_simulator --setup --instruments 50
+    python -m benchmarks.astm_simulator --port 4001 --instruments 50 --messages 20 --json astm.json
+    python -m benchmarks.astm_simulator --serve --setup --instruments 50 --messages 20
+
+--setup creates the instruments (serials SIM-0001, ...) and their test definitions if they are missing.
+--serve runs the listener in this process against DATABASE_URL instead of connecting to a running one.
+Reports per message latency (ENQ to the ACK of its last frame) and stored results per second.
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from app.logic import astm
+from benchmarks.common import print_table, run_metadata, summarize, write_json
+
+#Analyte, units, target mean, target SD
+ANALYTES = [
+    ("GLU", "mg/dL", 100.0, 5.0),
+    ("NA", "mmol/L", 140.0, 2.0),
+    ("K", "mmol/L", 4.2, 0.1),
+    ("CL", "mmol/L", 102.0, 2.0),
+    ("CREA", "mg/dL", 1.0, 0.05),
+    ("UREA", "mg/dL", 30.0, 1.5),
+    ("ALT", "U/L", 40.0, 3.0),
+    ("AST", "U/L", 35.0, 3.0),
+]
+
+
+def serial(number: int) -> str:
+    return f"SIM-{number:04d}"
+
+
+async def setup(instruments: int, analytes: int):
+    from sqlalchemy import select
+    from app.db.session import AsyncSessionLocal
+    from app.models import qc as models
+
+    async with AsyncSessionLocal() as db:
+        existing = {
+            row.serial_number: row.id
+            for row in (await db.execute(select(models.Instrument.serial_number, models.Instrument.id))).all()
+        }
+        defined = set((await db.execute(
+            select(models.TestDefinition.instrument_id, models.TestDefinition.analyte_name)
+        )).all())
+        for number in range(1, instruments + 1):
+            if serial(number) not in existing:
+                instrument = models.Instrument(name=f"Simulated analyzer {number}", model="ASTM sim", serial_number=serial(number))
+                db.add(instrument)
+                await db.flush()
+                existing[serial(number)] = instrument.id
+            instrument_id = existing[serial(number)]
+            for analyte, units, mean, sd in ANALYTES[:analytes]:
+                if (instrument_id, analyte) not in defined:
+                    db.add(models.TestDefinition(
+                        analyte_name=analyte, units=units, mean=mean, std_dev=sd, instrument_id=instrument_id
+                    ))
+        await db.commit()
+
+
+class SimulatedAnalyzer:
+    def __init__(self, number: int, analytes: int, seed: int):
+        self.serial = serial(number)
+        self.analytes = ANALYTES[:analytes]
+        self.rng = random.Random(seed)
+        #Distinct result times per analyzer and message, so every message is a new run
+        self.clock = datetime(2030, 1, 1, tzinfo=timezone.utc) + timedelta(days=number)
+
+    def message(self, number: int):
+        self.clock += timedelta(minutes=1)
+        stamp = f"{self.clock:%Y%m%d%H%M%S}"
+        records = [
+            f"H|\\^&|||SIM^1.0^{self.serial}|||||||P|LIS2-A2|{stamp}",
+            "P|1",
+            f"O|1|QC-{number}||^^^ALL|R||||||Q",
+        ]
+        for sequence, (analyte, units, mean, sd) in enumerate(self.analytes, start=1):
+            value = round(self.rng.gauss(mean, sd), 3)
+            records.append(f"R|{sequence}|^^^{analyte}|{value}|{units}||N||F||||{stamp}")
+        records.append("L|1|N")
+        return astm.encode_message(records)
+
+    async def run(self, host: str, port: int, messages: int, latencies: list, errors: list):
+        reader, writer = await asyncio.open_connection(host, port)
+
+        async def send(data: bytes) -> bool:
+            writer.write(data)
+            await writer.drain()
+            #E1381: the receiver has 15 s to answer
+            return await asyncio.wait_for(reader.readexactly(1), 15) == astm.ACK
+
+        try:
+            for number in range(messages):
+                frames = self.message(number)
+                started = time.perf_counter()
+                if not await send(astm.ENQ):
+                    errors.append("ENQ refused")
+                    continue
+                for frame in frames:
+                    if not await send(frame):
+                        errors.append("frame NAKed")
+                        break
+                else:
+                    latencies.append(time.perf_counter() - started)
+                writer.write(astm.EOT)
+                await writer.drain()
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError) as exc:
+            errors.append(type(exc).__name__)
+        finally:
+            writer.close()
+
+
+async def bench(args) -> dict:
+    listener = None
+    if args.setup:
+        await setup(args.instruments, args.analytes)
+    if args.serve:
+        from app.logic.astm_listener import ASTMListener
+        listener = ASTMListener("127.0.0.1", args.port)
+        await listener.serve()
+
+    analyzers = [SimulatedAnalyzer(number, args.analytes, seed=number) for number in range(1, args.instruments + 1)]
+    latencies, errors = [], []
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        analyzer.run(args.host, args.port, args.messages, latencies, errors) for analyzer in analyzers
+    ))
+    elapsed = time.perf_counter() - started
+
+    results = {"astm_message": summarize(latencies, elapsed, len(errors))}
+    sent = len(latencies) * args.analytes
+    results["astm_message"]["results_per_s"] = round(sent / elapsed, 1) if elapsed else 0.0
+    stats = None
+    if listener is not None:
+        stats = listener.stats()
+        await listener.stop()
+    return results, stats, sent
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4001)
+    parser.add_argument("--instruments", type=int, default=20, help="Concurrent analyzer connections")
+    parser.add_argument("--messages", type=int, default=20, help="Messages per analyzer")
+    parser.add_argument("--analytes", type=int, default=8, choices=range(1, len(ANALYTES) + 1), help="Results per message")
+    parser.add_argument("--setup", action="store_true", help="Create missing simulated instruments and tests")
+    parser.add_argument("--serve", action="store_true", help="Run the listener in this process")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    results, stats, sent = asyncio.run(bench(args))
+    print_table(results)
+    print(f"\n{sent:,} results acknowledged, {results['astm_message']['results_per_s']:,} results/s")
+    if stats:
+        print(f"Listener: {stats}")
+
+    write_json(args.json_path, {
+        "benchmark": "astm_simulator",
+        "metadata": run_metadata(os.getenv("DATABASE_URL")),
+        "config": vars(args),
+        "results": results,
+        "listener": stats,
+    })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Shared helpers for the benchmark scripts: latency summaries and the JSON report format."""
+import json
+import platform
+import subprocess
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy.engine import make_url
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    #Nearest-rank on an already sorted list
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(latencies: List[float], elapsed: Optional[float] = None, errors: int = 0) -> Dict[str, float]:
+    """latencies in seconds -> count, error count, p50/p95/p99/mean/max in ms and throughput per second"""
+    values = sorted(latencies)
+    summary = {
+        "count": len(values),
+        "errors": errors,
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "mean_ms": round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+        "max_ms": round(values[-1] * 1000, 3) if values else 0.0,
+    }
+    if elapsed:
+        summary["throughput_per_s"] = round(len(values) / elapsed, 1)
+    return summary
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_metadata(database_url: Optional[str] = None) -> dict:
+    metadata = {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+    }
+    if database_url:
+        metadata["database"] = make_url(database_url).get_backend_name()
+    return metadata
+
+
+def print_table(results: Dict[str, dict]):
+    print(f"\n{'name':<28}{'count':>9}{'err':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'per s':>10}")
+    for name, s in results.items():
+        print(
+            f"{name:<28}{s['count']:>9}{s['errors']:>6}{s['p50_ms']:>10.3f}{s['p95_ms']:>10.3f}"
+            f"{s['p99_ms']:>10.3f}{s.get('throughput_per_s', 0):>10.1f}"
+        )
+
+
+def write_json(path: Optional[str], payload: dict):
+    if path:
+        with open(path, "w") as f:
+            json.dump(payload, f, indent=2, default=str)
+        print(f"\nWrote {path}")
+
+
+class Stopwatch:
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+        return False
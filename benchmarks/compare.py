@@ -0,0 +1,43 @@
+"""
+Compares two JSON reports from load_test / micro and flags latency regressions.
+
+    python -m benchmarks.compare baseline.json candidate.json --metric p95_ms --threshold 10
+
+Exits 1 when any operation's metric got worse by more than --threshold percent.
+"""
+import argparse
+import json
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--metric", default="p95_ms", choices=["p50_ms", "p95_ms", "p99_ms", "mean_ms"])
+    parser.add_argument("--threshold", type=float, default=10.0, help="Allowed slowdown in percent")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)["results"]
+    with open(args.candidate) as f:
+        candidate = json.load(f)["results"]
+
+    regressions = []
+    print(f"{'name':<28}{'baseline':>12}{'candidate':>12}{'change':>10}")
+    for name in baseline:
+        if name not in candidate:
+            continue
+        before, after = baseline[name][args.metric], candidate[name][args.metric]
+        change = (after - before) / before * 100 if before else 0.0
+        flag = ""
+        if change > args.threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<28}{before:>12.3f}{after:>12.3f}{change:>9.1f}%{flag}")
+
+    if regressions:
+        raise SystemExit(f"\n{args.metric} regressed by more than {args.threshold}% for: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Query-time comparison for the qc_results / audit_logs hot queries with and without
+the indexes from migration 0002.
+
+PostgreSQL only. Point DATABASE_URL at a scratch database (it will be seeded and the
+0002 indexes will be dropped and rebuilt), then:
+
+    alembic upgrade head
+    python -m benchmarks.index_benchmark --rows 10000000
+
+Seeding 10M results takes a few minutes; it is skipped when the table is already big enough.
+"""
+import argparse
+import json
+import statistics
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import text
+
+from app.db.session import engine
+
+QUERIES = {
+    #submit_qc_result Westgard history
+    "history_fetch": """
+        SELECT * FROM qc_results
+        WHERE test_id = :test_id AND status <> 'ARCHIVED'
+        ORDER BY timestamp DESC, id DESC LIMIT 10
+    """,
+    #get_test_statistics, include_archived=false / true
+    "stats_window": """
+        SELECT * FROM qc_results
+        WHERE test_id = :test_id AND status <> 'ARCHIVED'
+        ORDER BY timestamp DESC LIMIT 30
+    """,
+    "stats_window_archived": """
+        SELECT * FROM qc_results
+        WHERE test_id = :test_id
+        ORDER BY timestamp DESC LIMIT 30
+    """,
+    #read_results
+    "results_page": """
+        SELECT * FROM qc_results
+        WHERE is_archived = false
+        ORDER BY timestamp DESC, id DESC LIMIT 100
+    """,
+    #get_audit_logs
+    "audit_page": """
+        SELECT * FROM audit_logs
+        ORDER BY timestamp DESC, id DESC LIMIT 100
+    """,
+    "audit_for_record": """
+        SELECT * FROM audit_logs
+        WHERE table_name = 'qc_results' AND record_id = :record_id
+    """,
+}
+
+
+def seed(conn, rows: int, tests: int):
+    existing = conn.execute(text("SELECT count(*) FROM qc_results")).scalar()
+    if existing >= rows:
+        print(f"qc_results already has {existing:,} rows, skipping seed")
+        return
+
+    print(f"Seeding {rows - existing:,} results across {tests} tests...")
+    conn.execute(text(
+        "INSERT INTO instruments (name, model, serial_number) "
+        "VALUES ('Bench Analyzer', 'BENCH', 'BENCH-SN') ON CONFLICT (serial_number) DO NOTHING"
+    ))
+    instrument_id = conn.execute(text("SELECT id FROM instruments WHERE serial_number = 'BENCH-SN'")).scalar()
+    have_tests = conn.execute(
+        text("SELECT count(*) FROM test_definitions WHERE instrument_id = :i"), {"i": instrument_id}
+    ).scalar()
+    conn.execute(text("""
+        INSERT INTO test_definitions (instrument_id, analyte_name, units, mean, std_dev)
+        SELECT :i, 'Analyte ' || g, 'mg/dL', 100, 5 FROM generate_series(1, :n) g
+    """), {"i": instrument_id, "n": max(0, tests - have_tests)})
+    test_ids = conn.execute(
+        text("SELECT id FROM test_definitions WHERE instrument_id = :i ORDER BY id"), {"i": instrument_id}
+    ).scalars().all()
+
+    #Spread results over ~3 years, ~2% archived, one CREATE audit row per result
+    conn.execute(text("""
+        INSERT INTO qc_results (value, timestamp, test_id, user_id, status, is_archived, system_comment)
+        SELECT
+            round((100 + 5 * (random() + random() + random() - 1.5) * 2)::numeric, 3),
+            now() - (g || ' seconds')::interval * 10,
+            (:test_ids)[1 + (g % cardinality(:test_ids))],
+            1,
+            CASE WHEN g % 50 = 0 THEN 'ARCHIVED' ELSE 'PASS' END,
+            g % 50 = 0,
+            'seeded'
+        FROM generate_series(1, :n) g
+    """), {"test_ids": test_ids, "n": rows - existing})
+    conn.execute(text("""
+        INSERT INTO audit_logs (table_name, record_id, action, changes, user_id, timestamp)
+        SELECT 'qc_results', id, 'CREATE', '{}', 1, timestamp FROM qc_results
+        WHERE id > coalesce((SELECT max(record_id) FROM audit_logs WHERE table_name = 'qc_results'), 0)
+    """))
+    conn.commit()
+
+
+def time_queries(conn, params: dict, repeat: int):
+    conn.execute(text("ANALYZE qc_results"))
+    conn.execute(text("ANALYZE audit_logs"))
+    timings = {}
+    for name, sql in QUERIES.items():
+        runs = []
+        plan_node = None
+        for _ in range(repeat):
+            plan = conn.execute(text("EXPLAIN (ANALYZE, FORMAT JSON) " + sql), params).scalar()
+            runs.append(plan[0]["Execution Time"])
+            plan_node = plan[0]["Plan"]
+        while plan_node.get("Plans") and plan_node["Node Type"] in ("Limit", "Sort", "Gather Merge"):
+            plan_node = plan_node["Plans"][0]
+        timings[name] = {
+            "median_ms": round(statistics.median(runs), 3),
+            "scan": plan_node["Node Type"],
+            "index": plan_node.get("Index Name"),
+        }
+    conn.commit()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--tests", type=int, default=400)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    if engine.dialect.name != "postgresql":
+        raise SystemExit("The index benchmark needs PostgreSQL (DATABASE_URL)")
+
+    alembic_cfg = Config("alembic.ini")
+
+    with engine.connect() as conn:
+        seed(conn, args.rows, args.tests)
+        test_id = conn.execute(text("SELECT test_id FROM qc_results ORDER BY id DESC LIMIT 1")).scalar()
+        record_id = conn.execute(text("SELECT max(id) / 2 FROM qc_results")).scalar()
+    params = {"test_id": test_id, "record_id": record_id}
+
+    print("Dropping hot-path indexes (downgrade to 0001)...")
+    command.downgrade(alembic_cfg, "0001")
+    with engine.connect() as conn:
+        before = time_queries(conn, params, args.repeat)
+
+    print("Rebuilding hot-path indexes (upgrade to head)...")
+    command.upgrade(alembic_cfg, "head")
+    with engine.connect() as conn:
+        after = time_queries(conn, params, args.repeat)
+
+    print(f"\n{'query':<24}{'no index (ms)':>16}{'indexed (ms)':>16}{'speedup':>10}  plan")
+    for name in QUERIES:
+        b, a = before[name]["median_ms"], after[name]["median_ms"]
+        speedup = b / a if a else float("inf")
+        print(f"{name:<24}{b:>16.3f}{a:>16.3f}{speedup:>9.0f}x  {before[name]['scan']} -> {after[name]['scan']} ({after[name]['index']})")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"rows": args.rows, "before": before, "after": after}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Drives the QC submission and dashboard endpoints at a fixed concurrency and reports
+p50/p95/p99 latency and throughput per operation.
+
+Against a running API (seed it first with benchmarks.seed):
+
+    python -m benchmarks.load_test --base-url http://localhost:80 --concurrency 50 --duration 60
+
+Without --base-url the app is driven in-process over ASGI using DATABASE_URL, which is handy
+for quick SQLite runs but measures the app and database without any HTTP server in front.
+"""
+import argparse
+import asyncio
+import random
+import time
+from collections import defaultdict
+
+import httpx
+
+from benchmarks.common import print_table, run_metadata, summarize, write_json
+
+API = "/api/v1"
+
+#Default mix, roughly a bench: mostly submissions and chart loads, some list browsing. The status
+#board is off unless asked for (--mix status=5)
+DEFAULT_MIX = {"submit": 50, "stats": 30, "results": 10, "audit": 10, "status": 0}
+
+
+def build_operations(test_defs: list):
+    def submit():
+        test = random.choice(test_defs)
+        value = round(float(test["mean"]) + float(test["std_dev"]) * random.gauss(0, 1), 3)
+        return "POST", f"{API}/results/", {"value": value, "test_id": test["id"]}
+
+    def stats():
+        return "GET", f"{API}/test-definitions/{random.choice(test_defs)['id']}/stats", None
+
+    def results():
+        return "GET", f"{API}/results/?limit=100&test_id={random.choice(test_defs)['id']}", None
+
+    def audit():
+        return "GET", f"{API}/audit-logs/?limit=100", None
+
+    def status():
+        return "GET", f"{API}/qc-status", None
+
+    return {"submit": submit, "stats": stats, "results": results, "audit": audit, "status": status}
+
+
+async def load_test_definitions(client: httpx.AsyncClient, limit: int) -> list:
+    tests, cursor = [], None
+    while len(tests) < limit:
+        params = {"limit": 1000}
+        if cursor:
+            params["cursor"] = cursor
+        response = await client.get(f"{API}/test-definitions/", params=params)
+        response.raise_for_status()
+        tests.extend(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    return tests[:limit]
+
+
+async def worker(client, operations, names, weights, deadline, remaining, latencies, errors):
+    while time.perf_counter() < deadline:
+        if remaining is not None:
+            if remaining[0] <= 0:
+                return
+            remaining[0] -= 1
+        name = random.choices(names, weights)[0]
+        method, url, body = operations[name]()
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, json=body)
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        if ok:
+            latencies[name].append(time.perf_counter() - start)
+        else:
+            errors[name] += 1
+
+
+def make_client(base_url: str, timeout: float) -> httpx.AsyncClient:
+    if base_url:
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+        return httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits)
+    from app.main import app
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=timeout)
+
+
+async def run(args) -> dict:
+    mix = dict(DEFAULT_MIX)
+    for entry in args.mix or []:
+        name, weight = entry.split("=")
+        if name not in mix:
+            raise SystemExit(f"Unknown operation {name!r}, expected one of {', '.join(mix)}")
+        mix[name] = int(weight)
+    names = [name for name, weight in mix.items() if weight > 0]
+    weights = [mix[name] for name in names]
+
+    async with make_client(args.base_url, args.timeout) as client:
+        test_defs = await load_test_definitions(client, args.max_tests)
+        if not test_defs:
+            raise SystemExit("No test definitions found, run benchmarks.seed first")
+        operations = build_operations(test_defs)
+
+        if args.warmup:
+            warm = {name: [] for name in names}
+            await asyncio.gather(*(
+                worker(client, operations, names, weights, time.perf_counter() + args.warmup, None, warm, defaultdict(int))
+                for _ in range(args.concurrency)
+            ))
+
+        latencies = {name: [] for name in names}
+        errors = defaultdict(int)
+        remaining = [args.requests] if args.requests else None
+        started = time.perf_counter()
+        deadline = started + (args.duration if not args.requests else float("inf"))
+        await asyncio.gather(*(
+            worker(client, operations, names, weights, deadline, remaining, latencies, errors)
+            for _ in range(args.concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+
+    results = {name: summarize(latencies[name], elapsed, errors[name]) for name in names}
+    everything = [latency for values in latencies.values() for latency in values]
+    results["total"] = summarize(everything, elapsed, sum(errors.values()))
+    return {"elapsed_s": round(elapsed, 3), "tests": len(test_defs), "mix": mix, "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", help="e.g. http://localhost:80; omit to run the app in-process")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to run (ignored with --requests)")
+    parser.add_argument("--requests", type=int, help="Stop after this many requests instead of a duration")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Seconds of unmeasured traffic first")
+    parser.add_argument("--mix", nargs="*", help="Operation weights, e.g. submit=80 stats=20 results=0 audit=0")
+    parser.add_argument("--max-tests", type=int, default=5000, help="Test definitions to spread requests over")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    database_url = None
+    if not args.base_url:
+        from app.db.session import SQLALCHEMY_DATABASE_URL as database_url
+    report = asyncio.run(run(args))
+    print_table(report["results"])
+    print(f"\n{report['results']['total']['count']} requests in {report['elapsed_s']}s at concurrency {args.concurrency}")
+
+    write_json(args.json_path, {
+        "benchmark": "load_test",
+        "metadata": run_metadata(database_url),
+        "config": {
+            "base_url": args.base_url or "in-process",
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "requests": args.requests,
+        },
+        **report,
+    })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Microbenchmarks for the two hot functions behind the dashboard and submission paths:
+
+  evaluate_westgard      pure CPU, one call per submitted result
+  get_test_statistics    one call per chart load, against the seeded database in DATABASE_URL
+
+    python -m benchmarks.micro --iterations 20000 --stats-calls 500 --json micro.json
+
+Pass --skip-db to only time the rules engine.
+"""
+import argparse
+import asyncio
+import random
+import time
+from decimal import Decimal
+
+from app.logic.rules_engine import calculate_z_score, evaluate_westgard
+from benchmarks.common import print_table, run_metadata, summarize, write_json
+
+
+def bench_evaluate_westgard(iterations: int, history_size: int) -> dict:
+    mean, sd = Decimal("100.000"), Decimal("5.000")
+    rng = random.Random(7)
+    values = [Decimal(str(round(rng.gauss(100, 6), 3))) for _ in range(iterations + history_size)]
+    z_scores = [calculate_z_score(value, mean, sd) for value in values]
+
+    latencies = []
+    started = time.perf_counter()
+    for i in range(iterations):
+        #Newest first, like the live history window
+        history = z_scores[i:i + history_size][::-1]
+        start = time.perf_counter()
+        evaluate_westgard(values[i + history_size], mean, sd, history)
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies, time.perf_counter() - started)
+
+
+async def bench_test_statistics(calls: int, include_archived: bool, max_tests: int) -> dict:
+    from sqlalchemy import select
+    from app.crud import qc as crud_qc
+    from app.db.session import AsyncSessionLocal
+    from app.models import qc as models
+
+    async with AsyncSessionLocal() as db:
+        test_ids = (await db.scalars(
+            select(models.TestDefinition.id).order_by(models.TestDefinition.id).limit(max_tests)
+        )).all()
+    if not test_ids:
+        raise SystemExit("No test definitions found, run benchmarks.seed first")
+
+    rng = random.Random(11)
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(calls):
+        test_id = rng.choice(test_ids)
+        #Fresh session per call, the way each request gets one
+        async with AsyncSessionLocal() as db:
+            start = time.perf_counter()
+            await crud_qc.get_test_statistics(db, test_id=test_id, include_archived=include_archived)
+            latencies.append(time.perf_counter() - start)
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20_000, help="evaluate_westgard calls")
+    parser.add_argument("--history", type=int, default=10, help="History length passed to evaluate_westgard")
+    parser.add_argument("--stats-calls", type=int, default=500, help="get_test_statistics calls")
+    parser.add_argument("--max-tests", type=int, default=1000)
+    parser.add_argument("--skip-db", action="store_true")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    results = {"evaluate_westgard": bench_evaluate_westgard(args.iterations, args.history)}
+    database_url = None
+    if not args.skip_db:
+        from app.db.session import SQLALCHEMY_DATABASE_URL as database_url
+        results["get_test_statistics"] = asyncio.run(bench_test_statistics(args.stats_calls, False, args.max_tests))
+        results["get_test_statistics_archived"] = asyncio.run(
+            bench_test_statistics(args.stats_calls, True, args.max_tests)
+        )
+
+    print_table(results)
+    write_json(args.json_path, {
+        "benchmark": "micro",
+        "metadata": run_metadata(database_url),
+        "config": vars(args),
+        "results": results,
+    })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Checks that evaluate_westgard_fast makes exactly the decisions evaluate_westgard makes, then times both.
+
+The corpus is random but aimed at the edges: values on exact multiples of the SD (z of exactly 1, 2, 3, 4),
+tiny and huge SDs, zero SD, negative SDs, values equal to the mean, and histories built the way
+get_recent_z_scores builds them (Numeric(10, 3) values through calculate_z_score).
+
+    python -m benchmarks.rules_equivalence --cases 200000 --json rules.json
+
+Exits 1 on the first mismatch, printing the inputs that caused it.
+"""
+import argparse
+import random
+import time
+from decimal import Decimal
+
+from app.logic.fast_rules import evaluate_westgard_fast
+from app.logic.rules_engine import calculate_z_score, evaluate_westgard
+from benchmarks.common import print_table, run_metadata, summarize, write_json
+
+MAX_VALUE = 10 ** 7 - 1  #Numeric(10, 3), in thousandths
+
+
+def _numeric(thousandths: int) -> Decimal:
+    thousandths = max(-MAX_VALUE * 1000, min(MAX_VALUE * 1000, thousandths))
+    return Decimal(thousandths).scaleb(-3)
+
+
+def _std_dev(rng: random.Random) -> Decimal:
+    kind = rng.random()
+    if kind < 0.03:
+        return Decimal("0.000")
+    if kind < 0.06:
+        return _numeric(-rng.randint(1, 10_000))
+    if kind < 0.2:
+        return _numeric(rng.choice([1, 3, 7, 1000, 3000, 7000]))
+    if kind < 0.3:
+        return _numeric(rng.randint(1, 10 ** 9))
+    return _numeric(rng.randint(1, 20_000))
+
+
+def _value(rng: random.Random, mean: Decimal, std_dev: Decimal) -> Decimal:
+    kind = rng.random()
+    if kind < 0.25:
+        #Exactly k SDs away (or a thousandth either side), so z lands on or next to a rule threshold
+        k = rng.choice([-4, -3, -2, -1, 0, 1, 2, 3, 4])
+        nudge = rng.choice([-1, 0, 0, 1])
+        return _numeric(int((mean + k * std_dev) * 1000) + nudge)
+    if kind < 0.3:
+        return mean
+    spread = max(abs(std_dev), Decimal("0.001")) * 1000
+    return _numeric(int(mean * 1000) + int(rng.gauss(0, 2.2) * float(spread)))
+
+
+def build_case(rng: random.Random):
+    mean = _numeric(rng.randint(-50_000, 500_000) if rng.random() < 0.9 else rng.randint(-MAX_VALUE, MAX_VALUE) * 1000)
+    std_dev = _std_dev(rng)
+    history_size = rng.choice([0, 1, 2, 3, 4, 9, 10, 10, 10])
+    #Drifting runs make 4-1s and 10-x fire often enough to be exercised
+    drift = rng.choice([0, 0, 1, -1])
+    history = []
+    for _ in range(history_size):
+        past = _value(rng, mean + drift * abs(std_dev), std_dev)
+        history.append(calculate_z_score(past, mean, std_dev))
+    return _value(rng, mean, std_dev), mean, std_dev, history
+
+
+def build_series(rng: random.Random):
+    """A chronological run of values for one test, as the batch engine re-evaluates it"""
+    mean = _numeric(rng.randint(-50_000, 500_000))
+    std_dev = _std_dev(rng)
+    values, drift = [], 0
+    for _ in range(rng.randint(1, 40)):
+        #Shifts that last a few points make the multi-point rules fire inside the series
+        if rng.random() < 0.15:
+            drift = rng.choice([0, 1, -1, 2, -2])
+        values.append(_value(rng, mean + drift * abs(std_dev), std_dev))
+    return values, mean, std_dev
+
+
+def check(cases: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    outcomes = {}
+    for _ in range(cases):
+        value, mean, std_dev, history = build_case(rng)
+        floats = [float(z) for z in history]
+        expected = evaluate_westgard(value, mean, std_dev, history)
+        actual = evaluate_westgard_fast(value, mean, std_dev, history, floats)
+        if (actual.status, actual.message, actual.z_score) != (expected.status, expected.message, expected.z_score):
+            raise SystemExit(
+                f"Mismatch for value={value} mean={mean} std_dev={std_dev} history={history}:\n"
+                f"  decimal: {expected.status} {expected.message} {expected.z_score}\n"
+                f"  fast:    {actual.status} {actual.message} {actual.z_score}"
+            )
+        outcomes[expected.message] = outcomes.get(expected.message, 0) + 1
+    return outcomes
+
+
+def bench(iterations: int, history_size: int) -> dict:
+    #Same workload as benchmarks.micro, both engines fed from the same window
+    mean, sd = Decimal("100.000"), Decimal("5.000")
+    rng = random.Random(7)
+    values = [Decimal(str(round(rng.gauss(100, 6), 3))) for _ in range(iterations + history_size)]
+    z_scores = [calculate_z_score(value, mean, sd) for value in values]
+    z_floats = [float(z) for z in z_scores]
+
+    results = {}
+    for name, evaluate in (
+        ("evaluate_westgard", lambda i, h, f: evaluate_westgard(values[i + history_size], mean, sd, h)),
+        ("evaluate_westgard_fast", lambda i, h, f: evaluate_westgard_fast(values[i + history_size], mean, sd, h, f)),
+    ):
+        latencies = []
+        started = time.perf_counter()
+        for i in range(iterations):
+            history = z_scores[i:i + history_size][::-1]
+            floats = z_floats[i:i + history_size][::-1]
+            start = time.perf_counter()
+            evaluate(i, history, floats)
+            latencies.append(time.perf_counter() - start)
+        results[name] = summarize(latencies, time.perf_counter() - started)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", type=int, default=200_000, help="Random cases compared against the Decimal engine")
+    parser.add_argument("--seed", type=int, default=15)
+    parser.add_argument("--iterations", type=int, default=20_000, help="Timed calls per engine")
+    parser.add_argument("--history", type=int, default=10)
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    outcomes = check(args.cases, args.seed)
+    print(f"{args.cases} cases, identical decisions")
+    for message, count in sorted(outcomes.items(), key=lambda item: -item[1]):
+        print(f"  {count:>9}  {message}")
+
+    results = bench(args.iterations, args.history)
+    print_table(results)
+    speedup = results["evaluate_westgard"]["mean_ms"] / results["evaluate_westgard_fast"]["mean_ms"]
+    print(f"\nfast path speedup (mean): {speedup:.2f}x")
+    write_json(args.json_path, {
+        "benchmark": "rules_equivalence",
+        "metadata": run_metadata(),
+        "config": vars(args),
+        "outcomes": outcomes,
+        "speedup": round(speedup, 2),
+        "results": results,
+    })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Seeds the database in DATABASE_URL with synthetic instruments, test definitions, QC results
+and their CREATE audit rows, for the load test and microbenchmarks.
+
+    alembic upgrade head
+    python -m benchmarks.seed --instruments 10 --tests-per-instrument 20 --results 1000000
+
+Works on PostgreSQL and SQLite (quick local runs). Rows are generated server-side in chunks,
+so tens of millions of results are fine on PostgreSQL. Seeded data lives on instruments named
+"Bench Analyzer N" and can be topped up by re-running with a larger --results.
+"""
+import argparse
+
+from sqlalchemy import text
+
+from app.db.session import SQLALCHEMY_DATABASE_URL, engine
+from benchmarks.common import Stopwatch
+
+SERIAL_PREFIX = "BENCH-"
+
+#Value = mean + sd * z with z roughly normal (sum of three uniforms), statuses from |z| alone.
+#n is the series row number; results are spaced a minute apart, ending now.
+RESULTS_SQL = {
+    "postgresql": """
+        INSERT INTO qc_results (value, timestamp, test_id, user_id, status, is_archived, system_comment)
+        SELECT round((t.mean + t.std_dev * z)::numeric, 3), ts, t.id, 1,
+               CASE WHEN abs(z) > 3 THEN 'REJECT' WHEN abs(z) > 2 THEN 'WARNING' ELSE 'PASS' END,
+               false, 'Seeded'
+        FROM (
+            SELECT g AS n,
+                   (random() + random() + random() - 1.5) * 2 AS z,
+                   now() - make_interval(mins => :total - :offset - g) AS ts,
+                   (CAST(:test_ids AS int[]))[1 + (:offset + g) % :n_tests] AS test_id
+            FROM generate_series(1, :n) g
+        ) s
+        JOIN test_definitions t ON t.id = s.test_id
+    """,
+    "sqlite": """
+        WITH RECURSIVE g(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM g WHERE n < :n)
+        INSERT INTO qc_results (value, timestamp, test_id, user_id, status, is_archived, system_comment)
+        SELECT round(t.mean + t.std_dev * z, 3), ts, t.id, 1,
+               CASE WHEN abs(z) > 3 THEN 'REJECT' WHEN abs(z) > 2 THEN 'WARNING' ELSE 'PASS' END,
+               0, 'Seeded'
+        FROM (
+            SELECT n,
+                   ((abs(random()) % 1000000) + (abs(random()) % 1000000) + (abs(random()) % 1000000)
+                    - 1500000) / 1000000.0 * 2 AS z,
+                   datetime('now', '-' || (:total - :offset - n) || ' minutes') AS ts,
+                   json_extract(:test_ids, '$[' || ((:offset + n) % :n_tests) || ']') AS test_id
+            FROM g
+        ) s
+        JOIN test_definitions t ON t.id = s.test_id
+    """,
+}
+
+AUDIT_SQL = {
+    "postgresql": """
+        INSERT INTO audit_logs (table_name, record_id, action, changes, user_id, timestamp)
+        SELECT 'qc_results', id, 'CREATE',
+               jsonb_build_object('value', jsonb_build_object('old', null, 'new', value::text),
+                                  'status', jsonb_build_object('old', null, 'new', status)),
+               1, timestamp
+        FROM qc_results WHERE id > :after ORDER BY id
+    """,
+    "sqlite": """
+        INSERT INTO audit_logs (table_name, record_id, action, changes, user_id, timestamp)
+        SELECT 'qc_results', id, 'CREATE',
+               json_object('value', json_object('old', null, 'new', CAST(value AS TEXT)),
+                           'status', json_object('old', null, 'new', status)),
+               1, timestamp
+        FROM qc_results WHERE id > :after ORDER BY id
+    """,
+}
+
+#Same backfill as migration 0003, limited to the seeded tests
+AGGREGATES_SQL = """
+    INSERT INTO test_aggregates (test_id, count, total, m2, recent)
+    SELECT test_id, n, total, CASE WHEN n = 0 OR m2 < 0 THEN 0 ELSE m2 END, NULL
+    FROM (
+        SELECT t.id AS test_id, count(r.id) AS n, coalesce(sum(r.value), 0) AS total,
+               sum(r.value * r.value) - sum(r.value) * sum(r.value) / nullif(count(r.id), 0) AS m2
+        FROM test_definitions t
+        LEFT JOIN qc_results r ON r.test_id = t.id AND r.status <> 'ARCHIVED'
+        WHERE t.id IN ({ids})
+        GROUP BY t.id
+    ) totals
+"""
+
+#Same backfill as migration 0007
+DAY_EXPRESSIONS = {"postgresql": "CAST(timezone('UTC', timestamp) AS DATE)", "sqlite": "date(timestamp)"}
+SUMMARIES_SQL = """
+    INSERT INTO qc_daily_summaries (test_id, day, count, total, total_sq,
+                                    rule_1_3s, rule_2_2s, rule_r_4s, rule_4_1s, rule_10_x, rule_1_2s)
+    SELECT test_id, {day}, count(*), sum(value), sum(value * value),
+           sum(CASE WHEN system_comment LIKE '%1-3s%' THEN 1 ELSE 0 END),
+           sum(CASE WHEN system_comment LIKE '%2-2s%' THEN 1 ELSE 0 END),
+           sum(CASE WHEN system_comment LIKE '%R-4s%' THEN 1 ELSE 0 END),
+           sum(CASE WHEN system_comment LIKE '%4-1s%' THEN 1 ELSE 0 END),
+           sum(CASE WHEN system_comment LIKE '%10-x%' THEN 1 ELSE 0 END),
+           sum(CASE WHEN system_comment LIKE '%1-2s%' THEN 1 ELSE 0 END)
+    FROM qc_results
+    WHERE status <> 'ARCHIVED' AND test_id IN ({ids})
+    GROUP BY test_id, {day}
+"""
+
+
+def seed_definitions(conn, instruments: int, tests_per_instrument: int) -> list:
+    for i in range(1, instruments + 1):
+        serial = f"{SERIAL_PREFIX}{i}"
+        instrument_id = conn.execute(
+            text("SELECT id FROM instruments WHERE serial_number = :s"), {"s": serial}
+        ).scalar()
+        if instrument_id is None:
+            conn.execute(
+                text("INSERT INTO instruments (name, model, serial_number) VALUES (:name, 'BENCH', :s)"),
+                {"name": f"Bench Analyzer {i}", "s": serial}
+            )
+            instrument_id = conn.execute(
+                text("SELECT id FROM instruments WHERE serial_number = :s"), {"s": serial}
+            ).scalar()
+        have = conn.execute(
+            text("SELECT count(*) FROM test_definitions WHERE instrument_id = :i"), {"i": instrument_id}
+        ).scalar()
+        for t in range(have + 1, tests_per_instrument + 1):
+            conn.execute(
+                text(
+                    "INSERT INTO test_definitions (instrument_id, analyte_name, units, mean, std_dev) "
+                    "VALUES (:i, :name, 'mg/dL', :mean, :sd)"
+                ),
+                {"i": instrument_id, "name": f"Analyte {t}", "mean": 50 + 10 * t, "sd": 2 + t % 5}
+            )
+    return bench_test_ids(conn)
+
+
+def bench_test_ids(conn) -> list:
+    return conn.execute(text(
+        "SELECT t.id FROM test_definitions t JOIN instruments i ON i.id = t.instrument_id "
+        f"WHERE i.serial_number LIKE '{SERIAL_PREFIX}%' ORDER BY t.id"
+    )).scalars().all()
+
+
+def seed_results(conn, dialect: str, test_ids: list, target: int, chunk: int, audit: bool):
+    ids = ",".join(str(i) for i in test_ids)
+    existing = conn.execute(text(f"SELECT count(*) FROM qc_results WHERE test_id IN ({ids})")).scalar()
+    if existing >= target:
+        print(f"Seeded tests already have {existing:,} results, nothing to add")
+        return
+
+    param_ids = "{" + ids + "}" if dialect == "postgresql" else "[" + ids + "]"
+    after = conn.execute(text("SELECT coalesce(max(id), 0) FROM qc_results")).scalar()
+    remaining = target - existing
+    print(f"Adding {remaining:,} results across {len(test_ids)} tests...")
+    offset = 0
+    while offset < remaining:
+        n = min(chunk, remaining - offset)
+        with Stopwatch() as sw:
+            conn.execute(text(RESULTS_SQL[dialect]), {
+                "n": n, "offset": offset, "total": remaining, "test_ids": param_ids, "n_tests": len(test_ids)
+            })
+            if audit:
+                conn.execute(text(AUDIT_SQL[dialect]), {"after": after})
+                after = conn.execute(text("SELECT max(id) FROM qc_results")).scalar()
+            conn.commit()
+        offset += n
+        print(f"  {offset:,}/{remaining:,} ({n / sw.elapsed:,.0f} rows/s)")
+
+    #Running statistics and daily rollups are rebuilt for the seeded tests so neither needs a full scan later
+    conn.execute(text(f"DELETE FROM test_aggregates WHERE test_id IN ({ids})"))
+    conn.execute(text(AGGREGATES_SQL.format(ids=ids)))
+    conn.execute(text(f"DELETE FROM qc_daily_summaries WHERE test_id IN ({ids})"))
+    conn.execute(text(SUMMARIES_SQL.format(ids=ids, day=DAY_EXPRESSIONS[dialect])))
+    if dialect == "postgresql":
+        conn.execute(text("ANALYZE qc_results"))
+        conn.execute(text("ANALYZE audit_logs"))
+    conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--instruments", type=int, default=5)
+    parser.add_argument("--tests-per-instrument", type=int, default=10)
+    parser.add_argument("--results", type=int, default=100_000, help="Total results across the seeded tests")
+    parser.add_argument("--chunk", type=int, default=1_000_000, help="Rows generated per statement")
+    parser.add_argument("--no-audit", dest="audit", action="store_false", help="Skip the CREATE audit rows")
+    args = parser.parse_args()
+
+    dialect = engine.dialect.name
+    if dialect not in RESULTS_SQL:
+        raise SystemExit(f"Seeding supports PostgreSQL and SQLite, not {dialect}")
+
+    print(f"Seeding {dialect} at {SQLALCHEMY_DATABASE_URL.split('@')[-1]}")
+    with engine.connect() as conn:
+        test_ids = seed_definitions(conn, args.instruments, args.tests_per_instrument)
+        conn.commit()
+        seed_results(conn, dialect, test_ids, args.results, args.chunk, args.audit)
+
+
+if __name__ == "__main__":
+    main()
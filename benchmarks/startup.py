@@ -0,0 +1,102 @@
+"""
+Worker cold start: a fresh interpreter imports app.main, runs the lifespan startup and answers GET /.
+This is what every uvicorn worker restart or new autoscaled container pays before it can take traffic.
+
+    python -m benchmarks.startup --runs 20 --json startup.json
+    python -m benchmarks.startup --with-migrations
+
+--with-migrations also runs `alembic upgrade head` (already at head, so only its own startup and version
+check) before each worker, which is what every container start paid while the image ran migrations in
+its start command. Modules that should stay lazy in the API (optional analytics packages, numpy, pyarrow,
+the sync driver) are reported if a worker imported them.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.common import print_table, run_metadata, summarize, write_json
+
+#Imported on first use (exports, re-evaluation, retention) or not at all by the API
+LAZY_MODULES = ["numpy", "pyarrow", "psycopg2", "pandas", "plotly", "streamlit"]
+
+#Runs in the child; prints one JSON line with its phase timings
+WORKER = """
+import json, sys, time
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+#The test client's own import is left out of the phases (it is in the wall-clock total)
+from starlette.testclient import TestClient
+client_loaded = time.perf_counter()
+with TestClient(app.main.app) as client:
+    ready = time.perf_counter()
+    client.get("/").raise_for_status()
+answered = time.perf_counter()
+print(json.dumps({
+    "import_s": imported - started,
+    "startup_s": ready - client_loaded,
+    "first_request_s": answered - ready,
+    "loaded": [name for name in %r if name in sys.modules],
+}))
+""" % (LAZY_MODULES,)
+
+
+def _run(command, env):
+    started = time.perf_counter()
+    completed = subprocess.run(command, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - started
+    if completed.returncode != 0:
+        raise SystemExit(f"{' '.join(command[:3])} failed:\n{completed.stderr[-2000:]}")
+    return elapsed, completed.stdout
+
+
+def bench(runs: int, with_migrations: bool) -> dict:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [os.getcwd(), env.get("PYTHONPATH")]))
+    timings = {name: [] for name in ("migrate", "import", "lifespan_startup", "first_request", "cold_start_total")}
+    loaded = set()
+
+    for _ in range(runs):
+        migrate_s = 0.0
+        if with_migrations:
+            migrate_s, _ = _run(["alembic", "upgrade", "head"], env)
+            timings["migrate"].append(migrate_s)
+        #Wall time from spawning the interpreter to the first response, as the orchestrator sees it
+        worker_s, output = _run([sys.executable, "-c", WORKER], env)
+        phases = json.loads(output.strip().splitlines()[-1])
+        timings["import"].append(phases["import_s"])
+        timings["lifespan_startup"].append(phases["startup_s"])
+        timings["first_request"].append(phases["first_request_s"])
+        timings["cold_start_total"].append(migrate_s + worker_s)
+        loaded.update(phases["loaded"])
+
+    results = {name: summarize(values) for name, values in timings.items() if values}
+    return results, sorted(loaded)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10, help="Fresh worker processes to start")
+    parser.add_argument("--with-migrations", action="store_true", help="Run alembic upgrade head before each worker")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    results, loaded = bench(args.runs, args.with_migrations)
+    print_table(results)
+    if loaded:
+        print(f"\nImported at startup, expected to be lazy: {', '.join(loaded)}")
+
+    write_json(args.json_path, {
+        "benchmark": "startup",
+        "metadata": run_metadata(os.getenv("DATABASE_URL")),
+        "config": vars(args),
+        "results": results,
+        "eager_imports": loaded,
+    })
+
+
+if __name__ == "__main__":
+    main()
@@ -43,6 +43,35 @@ useEffect(() => {
     });
 }, [selectedTestId, showArchived]); //Re-runs when either of these change
 
+//Live feed: new results and status changes for the selected test are pushed instead of re-fetched
+useEffect(() => {
+  if (!selectedTestId) return;
+
+  const source = new EventSource(`http://localhost:80/api/v1/live/results?test_id=${selectedTestId}`);
+  const applyResult = (event) => {
+    const { result } = JSON.parse(event.data);
+    setSelectedStats(prevStats => {
+      if (!prevStats || prevStats.test_definition.id !== result.test_id) return prevStats;
+      const visible = showArchived || result.status !== "ARCHIVED";
+      let recent;
+      if (event.type === "result.created") {
+        //Oldest first like the stats endpoint, so the new point goes on the end and the oldest drops off
+        recent = [...prevStats.recent_results, result].slice(-Math.max(prevStats.recent_results.length, 30));
+      } else if (visible) {
+        recent = prevStats.recent_results.map(r => r.id === result.id ? result : r);
+      } else {
+        recent = prevStats.recent_results.filter(r => r.id !== result.id);
+      }
+      return { ...prevStats, recent_results: recent };
+    });
+  };
+  source.addEventListener("result.created", applyResult);
+  source.addEventListener("result.updated", applyResult);
+  source.addEventListener("result.reevaluated", applyResult);
+
+  return () => source.close();
+}, [selectedTestId, showArchived]);
+
 useEffect(() => {
   //If the test definition ID changes, close all sensitive menus
   setIsEditingTargets(false);
@@ -0,0 +1,108 @@
+"""initial schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 09:00:00
+
+Matches what Base.metadata.create_all used to build at startup. Databases that
+were created that way already have these tables, so each one is only created if
+it is missing and `alembic upgrade head` can be run against them as-is.
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _missing(table_name: str) -> bool:
+    if context.is_offline_mode():
+        return True
+    return not sa.inspect(op.get_bind()).has_table(table_name)
+
+
+def upgrade() -> None:
+    if _missing("instruments"):
+        op.create_table(
+            "instruments",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("model", sa.String(), nullable=False),
+            sa.Column("serial_number", sa.String(), unique=True, nullable=False),
+        )
+        op.create_index("ix_instruments_id", "instruments", ["id"])
+
+    if _missing("test_definitions"):
+        op.create_table(
+            "test_definitions",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("instrument_id", sa.Integer(), sa.ForeignKey("instruments.id"), nullable=False),
+            sa.Column("analyte_name", sa.String(), nullable=False),
+            sa.Column("units", sa.String(), nullable=False),
+            sa.Column("mean", sa.Numeric(10, 3), nullable=False),
+            sa.Column("std_dev", sa.Numeric(10, 3), nullable=False),
+        )
+        op.create_index("ix_test_definitions_id", "test_definitions", ["id"])
+
+    if _missing("qc_results"):
+        op.create_table(
+            "qc_results",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("value", sa.Numeric(10, 3), nullable=False),
+            sa.Column("timestamp", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+            sa.Column("test_id", sa.Integer(), sa.ForeignKey("test_definitions.id"), nullable=False),
+            sa.Column("user_id", sa.Integer(), nullable=False),
+            sa.Column("status", sa.String(), nullable=False),
+            sa.Column("is_archived", sa.Boolean(), nullable=False),
+            sa.Column("system_comment", sa.String(), nullable=False),
+            sa.Column("user_comment", sa.String(), nullable=True),
+            sa.Column("reviewed_by_id", sa.Integer(), nullable=True),
+            sa.Column("reviewed_by_name", sa.String(), nullable=True),
+            sa.Column("reviewer_comment", sa.String(), nullable=True),
+        )
+        op.create_index("ix_qc_results_id", "qc_results", ["id"])
+
+    if _missing("audit_logs"):
+        op.create_table(
+            "audit_logs",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("table_name", sa.String(), nullable=False),
+            sa.Column("record_id", sa.Integer(), nullable=False),
+            sa.Column("action", sa.String(), nullable=False),
+            sa.Column("old_value", sa.String(), nullable=True),
+            sa.Column("new_value", sa.String(), nullable=True),
+            sa.Column("user_id", sa.Integer(), nullable=True),
+            sa.Column("timestamp", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        )
+        op.create_index("ix_audit_logs_id", "audit_logs", ["id"])
+
+    if _missing("users"):
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("username", sa.String(), nullable=False),
+            sa.Column("full_name", sa.String(), nullable=False),
+            sa.Column("hashed_password", sa.String(), nullable=False),
+            sa.Column(
+                "role",
+                sa.Enum("TECH", "SUPERVISOR", "ADMIN", name="userrole"),
+                nullable=False,
+            ),
+        )
+        op.create_index("ix_users_id", "users", ["id"])
+        op.create_index("ix_users_username", "users", ["username"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_table("users")
+    sa.Enum(name="userrole").drop(op.get_bind(), checkfirst=True)
+    op.drop_table("audit_logs")
+    op.drop_table("qc_results")
+    op.drop_table("test_definitions")
+    op.drop_table("instruments")
@@ -0,0 +1,91 @@
+"""indexes for the qc_results / audit_logs hot queries
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 09:30:00
+
+On PostgreSQL the indexes are built CONCURRENTLY so a large qc_results table
+keeps taking submissions while this runs.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = [
+    #Westgard history fetch in submit_qc_result and get_test_statistics
+    dict(
+        index_name="ix_qc_results_test_active_ts",
+        table_name="qc_results",
+        columns=["test_id", sa.text("timestamp DESC"), sa.text("id DESC")],
+        where="status <> 'ARCHIVED'",
+    ),
+    #get_test_statistics with include_archived=true
+    dict(
+        index_name="ix_qc_results_test_ts",
+        table_name="qc_results",
+        columns=["test_id", sa.text("timestamp DESC")],
+    ),
+    #read_results, which never lists archived rows
+    dict(
+        index_name="ix_qc_results_unarchived_ts",
+        table_name="qc_results",
+        columns=[sa.text("timestamp DESC"), sa.text("id DESC")],
+        where="is_archived = false",
+    ),
+    #get_audit_logs sorts the whole trail newest first
+    dict(
+        index_name="ix_audit_logs_ts",
+        table_name="audit_logs",
+        columns=[sa.text("timestamp DESC"), sa.text("id DESC")],
+    ),
+    dict(
+        index_name="ix_audit_logs_record",
+        table_name="audit_logs",
+        columns=["table_name", "record_id"],
+    ),
+    dict(
+        index_name="ix_test_definitions_instrument_id",
+        table_name="test_definitions",
+        columns=["instrument_id"],
+    ),
+]
+
+
+def upgrade() -> None:
+    is_postgres = op.get_bind().dialect.name == "postgresql"
+    with op.get_context().autocommit_block():
+        for spec in INDEXES:
+            where = sa.text(spec["where"]) if spec.get("where") else None
+            op.create_index(
+                spec["index_name"],
+                spec["table_name"],
+                spec["columns"],
+                if_not_exists=True,
+                postgresql_where=where,
+                postgresql_concurrently=is_postgres,
+                sqlite_where=where,
+            )
+        if is_postgres:
+            op.execute("ANALYZE qc_results")
+            op.execute("ANALYZE audit_logs")
+
+
+def downgrade() -> None:
+    is_postgres = op.get_bind().dialect.name == "postgresql"
+    with op.get_context().autocommit_block():
+        for spec in reversed(INDEXES):
+            op.drop_index(
+                spec["index_name"],
+                table_name=spec["table_name"],
+                if_exists=True,
+                postgresql_concurrently=is_postgres,
+            )
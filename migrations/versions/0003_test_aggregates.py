@@ -0,0 +1,51 @@
+"""running statistics per test
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 11:00:00
+
+Backfills count / sum / M2 for every existing test in one pass over qc_results.
+The rolling-window column is left NULL and filled on first read.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "test_aggregates",
+        sa.Column("test_id", sa.Integer(), sa.ForeignKey("test_definitions.id"), primary_key=True),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.Column("total", sa.Numeric(20, 3), nullable=False),
+        sa.Column("m2", sa.Float(), nullable=False),
+        sa.Column("recent", sa.JSON(), nullable=True),
+    )
+
+    #M2 = sum(x^2) - sum(x)^2 / n, clamped at 0 against rounding
+    op.execute("""
+        INSERT INTO test_aggregates (test_id, count, total, m2, recent)
+        SELECT test_id, n, total, CASE WHEN n = 0 OR m2 < 0 THEN 0 ELSE m2 END, NULL
+        FROM (
+            SELECT
+                t.id AS test_id,
+                count(r.id) AS n,
+                coalesce(sum(r.value), 0) AS total,
+                sum(r.value * r.value) - sum(r.value) * sum(r.value) / nullif(count(r.id), 0) AS m2
+            FROM test_definitions t
+            LEFT JOIN qc_results r ON r.test_id = t.id AND r.status <> 'ARCHIVED'
+            GROUP BY t.id
+        ) totals
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table("test_aggregates")
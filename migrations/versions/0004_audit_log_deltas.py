@@ -0,0 +1,111 @@
+"""audit log stores changed fields only
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 14:00:00
+
+Replaces audit_logs.old_value / new_value (full JSON snapshots as text) with a single
+`changes` column ({"field": {"old": ..., "new": ...}}, JSONB on PostgreSQL). Existing rows
+are converted in id order, a batch at a time; the diff runs over the keys of new_value, since
+ARCHIVE and REEVALUATE rows only ever wrote the fields they touched. Values that were never
+valid JSON are kept verbatim under "_raw".
+
+The downgrade puts the deltas back as text in new_value; the original snapshots are not rebuilt.
+"""
+import json
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+BATCH_SIZE = 5000
+
+#QCResultUpdate wrote these onto the result under its own field names
+RENAMED_FIELDS = {
+    "reviewer_id": "reviewed_by_id",
+    "review_comment": "reviewer_comment",
+}
+
+audit_logs = sa.table(
+    "audit_logs",
+    sa.column("id", sa.Integer),
+    sa.column("old_value", sa.String),
+    sa.column("new_value", sa.String),
+    sa.column("changes", sa.JSON),
+)
+
+
+def _load(text):
+    if text is None:
+        return None
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def snapshot_delta(old_text, new_text) -> dict:
+    old, new = _load(old_text), _load(new_text)
+    if not isinstance(new, dict) or not (old is None or isinstance(old, dict)):
+        return {"_raw": {"old": old_text, "new": new_text}}
+
+    old = old or {}
+    changes = {}
+    for field, value in new.items():
+        if field.startswith("_") or old.get(field) == value:
+            continue
+        changes[RENAMED_FIELDS.get(field, field)] = {"old": old.get(field), "new": value}
+    return changes
+
+
+def upgrade() -> None:
+    op.add_column(
+        "audit_logs",
+        sa.Column("changes", sa.JSON().with_variant(postgresql.JSONB(), "postgresql"), nullable=True),
+    )
+
+    #Offline (--sql) scripts only get the DDL; row conversion needs a live connection
+    if not context.is_offline_mode():
+        conn = op.get_bind()
+        convert = (
+            sa.update(audit_logs)
+            .where(audit_logs.c.id == sa.bindparam("row_id"))
+            .values(changes=sa.bindparam("row_changes", type_=sa.JSON))
+        )
+        last_id = 0
+        while True:
+            rows = conn.execute(
+                sa.select(audit_logs.c.id, audit_logs.c.old_value, audit_logs.c.new_value)
+                .where(audit_logs.c.id > last_id)
+                .order_by(audit_logs.c.id)
+                .limit(BATCH_SIZE)
+            ).all()
+            if not rows:
+                break
+            conn.execute(convert, [
+                {"row_id": row.id, "row_changes": snapshot_delta(row.old_value, row.new_value)}
+                for row in rows
+            ])
+            last_id = rows[-1].id
+
+    with op.batch_alter_table("audit_logs") as batch_op:
+        batch_op.drop_column("old_value")
+        batch_op.drop_column("new_value")
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("audit_logs") as batch_op:
+        batch_op.add_column(sa.Column("old_value", sa.String(), nullable=True))
+        batch_op.add_column(sa.Column("new_value", sa.String(), nullable=True))
+    op.execute("UPDATE audit_logs SET new_value = CAST(changes AS TEXT)")
+    with op.batch_alter_table("audit_logs") as batch_op:
+        batch_op.drop_column("changes")
@@ -0,0 +1,42 @@
+"""audit outbox for the background audit writer
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 16:00:00
+
+Only used with AUDIT_WRITER=outbox; the table stays empty otherwise.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "audit_outbox",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("table_name", sa.String(), nullable=False),
+        sa.Column("record_id", sa.Integer(), nullable=False),
+        sa.Column("action", sa.String(), nullable=False),
+        sa.Column("changes", sa.JSON().with_variant(postgresql.JSONB(), "postgresql"), nullable=True),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("timestamp", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    #Anything still queued is flushed into audit_logs first so the downgrade can't drop events
+    op.execute("""
+        INSERT INTO audit_logs (table_name, record_id, action, changes, user_id, timestamp)
+        SELECT table_name, record_id, action, changes, user_id, timestamp FROM audit_outbox ORDER BY id
+    """)
+    op.drop_table("audit_outbox")
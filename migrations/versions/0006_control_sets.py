@@ -0,0 +1,77 @@
+"""control sets and multi-level QC runs
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 18:00:00
+
+Test definitions become levels of a control set (one per instrument and analyte); results submitted
+through POST /runs/ point at the run they were part of. Existing rows are left as standalone tests.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "control_sets",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("instrument_id", sa.Integer(), sa.ForeignKey("instruments.id"), nullable=False),
+        sa.Column("analyte_name", sa.String(), nullable=False),
+        sa.Column("name", sa.String(), nullable=True),
+        sa.UniqueConstraint("instrument_id", "analyte_name"),
+    )
+    op.create_index("ix_control_sets_id", "control_sets", ["id"])
+
+    op.create_table(
+        "qc_runs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("control_set_id", sa.Integer(), sa.ForeignKey("control_sets.id"), nullable=False),
+        sa.Column("timestamp", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("system_comment", sa.String(), nullable=False),
+    )
+    op.create_index("ix_qc_runs_id", "qc_runs", ["id"])
+    op.create_index("ix_qc_runs_control_set_id", "qc_runs", ["control_set_id"])
+
+    #batch mode so SQLite can take the foreign keys as well
+    with op.batch_alter_table("test_definitions") as batch_op:
+        batch_op.add_column(sa.Column("control_set_id", sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column("control_level", sa.Integer(), nullable=True))
+        batch_op.create_foreign_key(
+            "fk_test_definitions_control_set_id", "control_sets", ["control_set_id"], ["id"]
+        )
+        batch_op.create_index("ix_test_definitions_control_set_id", ["control_set_id"])
+
+    with op.batch_alter_table("qc_results") as batch_op:
+        batch_op.add_column(sa.Column("run_id", sa.Integer(), nullable=True))
+        batch_op.create_foreign_key("fk_qc_results_run_id", "qc_runs", ["run_id"], ["id"])
+        batch_op.create_index("ix_qc_results_run_id", ["run_id"])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("qc_results") as batch_op:
+        batch_op.drop_index("ix_qc_results_run_id")
+        batch_op.drop_constraint("fk_qc_results_run_id", type_="foreignkey")
+        batch_op.drop_column("run_id")
+
+    with op.batch_alter_table("test_definitions") as batch_op:
+        batch_op.drop_index("ix_test_definitions_control_set_id")
+        batch_op.drop_constraint("fk_test_definitions_control_set_id", type_="foreignkey")
+        batch_op.drop_column("control_level")
+        batch_op.drop_column("control_set_id")
+
+    op.drop_index("ix_qc_runs_control_set_id", table_name="qc_runs")
+    op.drop_index("ix_qc_runs_id", table_name="qc_runs")
+    op.drop_table("qc_runs")
+    op.drop_index("ix_control_sets_id", table_name="control_sets")
+    op.drop_table("control_sets")
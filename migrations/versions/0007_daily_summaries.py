@@ -0,0 +1,62 @@
+"""daily QC summary rollups
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17 19:00:00
+
+One row per test per UTC day, maintained by the CRUD layer from here on; the upgrade backfills it
+from the existing non-archived results. Rule counts come from the engine's system_comment.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+RULE_COLUMNS = {
+    "1-3s": "rule_1_3s",
+    "2-2s": "rule_2_2s",
+    "R-4s": "rule_r_4s",
+    "4-1s": "rule_4_1s",
+    "10-x": "rule_10_x",
+    "1-2s": "rule_1_2s",
+}
+
+DAY_EXPRESSIONS = {
+    "postgresql": "CAST(timezone('UTC', timestamp) AS DATE)",
+    "sqlite": "date(timestamp)",
+}
+
+
+def upgrade() -> None:
+    op.create_table(
+        "qc_daily_summaries",
+        sa.Column("test_id", sa.Integer(), sa.ForeignKey("test_definitions.id"), primary_key=True),
+        sa.Column("day", sa.Date(), primary_key=True),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.Column("total", sa.Numeric(20, 3), nullable=False),
+        sa.Column("total_sq", sa.Numeric(30, 6), nullable=False),
+        *(sa.Column(column, sa.Integer(), nullable=False) for column in RULE_COLUMNS.values()),
+    )
+
+    day = DAY_EXPRESSIONS.get(op.get_bind().dialect.name, DAY_EXPRESSIONS["postgresql"])
+    rule_sums = ", ".join(
+        f"sum(CASE WHEN system_comment LIKE '%{rule}%' THEN 1 ELSE 0 END)" for rule in RULE_COLUMNS
+    )
+    op.execute(f"""
+        INSERT INTO qc_daily_summaries (test_id, day, count, total, total_sq, {", ".join(RULE_COLUMNS.values())})
+        SELECT test_id, {day}, count(*), sum(value), sum(value * value), {rule_sums}
+        FROM qc_results
+        WHERE status <> 'ARCHIVED'
+        GROUP BY test_id, {day}
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table("qc_daily_summaries")
@@ -0,0 +1,144 @@
+"""monthly range partitioning of qc_results and audit_logs (PostgreSQL)
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17 20:00:00
+
+Rebuilds both tables as PARTITION BY RANGE (timestamp): one partition per month from the oldest row
+through QC_PARTITIONS_AHEAD months from now, plus a DEFAULT partition. Rows are copied a month at a
+time. The primary key becomes (id, timestamp), as PostgreSQL requires the partition key in it; ids keep
+coming from the same sequence. Takes an exclusive lock for the copy, so run it in a maintenance window.
+Other databases are left as they are (the retention job deletes archived months from them instead).
+"""
+import os
+from datetime import date, datetime, timezone
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PARTITIONS_AHEAD = int(os.getenv("QC_PARTITIONS_AHEAD", "3"))
+
+TABLES = {
+    "qc_results": {
+        "foreign_keys": [
+            ("qc_results_test_id_fkey", "test_id", "test_definitions"),
+            ("fk_qc_results_run_id", "run_id", "qc_runs"),
+        ],
+        "indexes": [
+            "CREATE INDEX ix_qc_results_id ON qc_results (id)",
+            "CREATE INDEX ix_qc_results_test_active_ts ON qc_results (test_id, timestamp DESC, id DESC) "
+            "WHERE status <> 'ARCHIVED'",
+            "CREATE INDEX ix_qc_results_test_ts ON qc_results (test_id, timestamp DESC)",
+            "CREATE INDEX ix_qc_results_unarchived_ts ON qc_results (timestamp DESC, id DESC) "
+            "WHERE is_archived = false",
+            "CREATE INDEX ix_qc_results_run_id ON qc_results (run_id)",
+        ],
+    },
+    "audit_logs": {
+        "foreign_keys": [],
+        "indexes": [
+            "CREATE INDEX ix_audit_logs_id ON audit_logs (id)",
+            "CREATE INDEX ix_audit_logs_ts ON audit_logs (timestamp DESC, id DESC)",
+            "CREATE INDEX ix_audit_logs_record ON audit_logs (table_name, record_id)",
+        ],
+    },
+}
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _bounds(month: date):
+    start = datetime(month.year, month.month, 1, tzinfo=timezone.utc)
+    end = _add_months(month, 1)
+    return start.isoformat(), datetime(end.year, end.month, 1, tzinfo=timezone.utc).isoformat()
+
+
+def _month(value: datetime) -> date:
+    return value.astimezone(timezone.utc).date().replace(day=1)
+
+
+def _finish(conn, table: str, sequence: str, primary_key: str):
+    #Constraints and indexes go on after the copy, it's much faster than maintaining them row by row
+    op.execute(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id")
+    op.execute(f"ALTER TABLE {table} ADD PRIMARY KEY ({primary_key})")
+    for name, column, target in TABLES[table]["foreign_keys"]:
+        op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} FOREIGN KEY ({column}) REFERENCES {target} (id)")
+    for statement in TABLES[table]["indexes"]:
+        op.execute(statement)
+    op.execute(f"ANALYZE {table}")
+
+
+def _partition(conn, table: str):
+    sequence = conn.execute(sa.text(f"SELECT pg_get_serial_sequence('{table}', 'id')")).scalar()
+    oldest, newest = conn.execute(sa.text(f"SELECT min(timestamp), max(timestamp) FROM {table}")).one()
+
+    op.execute(f"ALTER TABLE {table} RENAME TO {table}_unpartitioned")
+    op.execute(f"CREATE TABLE {table} (LIKE {table}_unpartitioned INCLUDING DEFAULTS) PARTITION BY RANGE (timestamp)")
+
+    today = _month(datetime.now(timezone.utc))
+    ahead = _add_months(today, PARTITIONS_AHEAD)
+    first = min(_month(oldest), today) if oldest is not None else today
+    last = max(_month(newest), ahead) if newest is not None else ahead
+    month = first
+    while month <= last:
+        start, end = _bounds(month)
+        op.execute(
+            f"CREATE TABLE {table}_p{month:%Y_%m} PARTITION OF {table} FOR VALUES FROM ('{start}') TO ('{end}')"
+        )
+        if oldest is not None and month <= _month(newest):
+            op.execute(
+                f"INSERT INTO {table} SELECT * FROM {table}_unpartitioned "
+                f"WHERE timestamp >= '{start}' AND timestamp < '{end}'"
+            )
+        month = _add_months(month, 1)
+    op.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+
+    op.execute(f"ALTER SEQUENCE {sequence} OWNED BY NONE")
+    op.execute(f"DROP TABLE {table}_unpartitioned")
+    _finish(conn, table, sequence, "id, timestamp")
+
+
+def _unpartition(conn, table: str):
+    sequence = conn.execute(sa.text(f"SELECT pg_get_serial_sequence('{table}', 'id')")).scalar()
+    op.execute(f"ALTER TABLE {table} RENAME TO {table}_partitioned")
+    op.execute(f"CREATE TABLE {table} (LIKE {table}_partitioned INCLUDING DEFAULTS)")
+    op.execute(f"INSERT INTO {table} SELECT * FROM {table}_partitioned ORDER BY id")
+    op.execute(f"ALTER SEQUENCE {sequence} OWNED BY NONE")
+    #Dropping the parent drops every partition with it
+    op.execute(f"DROP TABLE {table}_partitioned")
+    _finish(conn, table, sequence, "id")
+
+
+def _postgres_connection(action: str):
+    if context.get_context().dialect.name != "postgresql":
+        return None
+    if context.is_offline_mode():
+        raise RuntimeError(f"0008 sizes the partitions from the data, {action} it against the database (not --sql)")
+    return op.get_bind()
+
+
+def upgrade() -> None:
+    conn = _postgres_connection("run")
+    if conn is None:
+        return
+    for table in TABLES:
+        _partition(conn, table)
+
+
+def downgrade() -> None:
+    conn = _postgres_connection("downgrade")
+    if conn is None:
+        return
+    for table in TABLES:
+        _unpartition(conn, table)
@@ -0,0 +1,43 @@
+"""idempotent result submission
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-17 21:00:00
+
+qc_submission_keys maps an Idempotency-Key header, or test + instrument run id + sample sequence, to the
+result it created; its primary key is what stops a retried submission being stored twice. qc_results
+keeps the analyzer's run id and sample sequence alongside the result.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0009'
+down_revision: Union[str, None] = '0008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "qc_submission_keys",
+        sa.Column("key", sa.String(300), primary_key=True),
+        sa.Column("result_id", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+    #For the retention job's purge of old keys
+    op.create_index("ix_qc_submission_keys_created_at", "qc_submission_keys", ["created_at"])
+    #Adding nullable columns to the partitioned parent also adds them to every partition, without a rewrite
+    op.add_column("qc_results", sa.Column("instrument_run_id", sa.String(64), nullable=True))
+    op.add_column("qc_results", sa.Column("sample_sequence", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("qc_results") as batch_op:
+        batch_op.drop_column("sample_sequence")
+        batch_op.drop_column("instrument_run_id")
+    op.drop_index("ix_qc_submission_keys_created_at", table_name="qc_submission_keys")
+    op.drop_table("qc_submission_keys")
@@ -0,0 +1,29 @@
+"""stats version per test
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-17 23:00:00
+
+test_aggregates.version changes whenever a test's results or definition do, so the stats endpoint can
+answer a conditional GET with 304 after reading one row.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0010'
+down_revision: Union[str, None] = '0009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("test_aggregates", sa.Column("version", sa.Integer(), nullable=False, server_default="0"))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("test_aggregates") as batch_op:
+        batch_op.drop_column("version")
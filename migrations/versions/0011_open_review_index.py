@@ -0,0 +1,39 @@
+"""index for open review items
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-18 09:00:00
+
+Partial index on the REJECT/WARNING results nobody has reviewed, which the QC status board counts for
+every test. It only ever holds the open items, so it stays small. qc_results is partitioned on
+PostgreSQL and a partitioned index can't be built CONCURRENTLY; the build is a short scan per partition.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0011'
+down_revision: Union[str, None] = '0010'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+OPEN = sa.text("status IN ('REJECT', 'WARNING') AND reviewed_by_id IS NULL")
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_qc_results_test_open",
+        "qc_results",
+        ["test_id"],
+        if_not_exists=True,
+        postgresql_where=OPEN,
+        sqlite_where=OPEN,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_qc_results_test_open", table_name="qc_results", if_exists=True)
@@ -0,0 +1,44 @@
+import os
+import tempfile
+from itertools import count
+
+import pytest
+
+#The API tests run against a throwaway SQLite database, migrated the same way as a real one.
+#Set before anything imports app.db.session, which reads it at import time
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/qc_test.db"
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+API = "/api/v1"
+_serials = count(1)
+
+
+@pytest.fixture(scope="session")
+def client():
+    from alembic import command
+    from alembic.config import Config
+    from fastapi.testclient import TestClient
+
+    config = Config(os.path.join(ROOT, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(ROOT, "migrations"))
+    command.upgrade(config, "head")
+
+    from app.main import app
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def make_test(client):
+    """Creates a test definition (on a new instrument unless one is given) and returns it"""
+    def make(mean=100, std_dev=1, analyte_name="GLU", instrument_id=None, **fields):
+        if instrument_id is None:
+            serial = f"TEST-{next(_serials)}"
+            instrument = client.post(f"{API}/instruments/", json={"name": serial, "model": "pytest", "serial_number": serial})
+            instrument_id = instrument.raise_for_status().json()["id"]
+        test = client.post(f"{API}/tests/", json={
+            "analyte_name": analyte_name, "units": "mg/dL", "mean": mean, "std_dev": std_dev,
+            "instrument_id": instrument_id, **fields
+        })
+        return test.raise_for_status().json()
+    return make
@@ -0,0 +1,50 @@
+"""Monthly Parquet files written by the retention job"""
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+
+from app.db import cold_storage
+
+MONTH = date(2023, 1, 1)
+
+
+@pytest.fixture(autouse=True)
+def archive_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(cold_storage, "ARCHIVE_DIR", str(tmp_path))
+
+
+def rows(ids):
+    start = datetime(2023, 1, 1, tzinfo=timezone.utc)
+    return [
+        {"id": i, "timestamp": start + timedelta(hours=i), "value": Decimal(i), "test_id": 1, "status": "PASS"}
+        for i in ids
+    ]
+
+
+def test_write_month_streams_batches_in_order(monkeypatch):
+    monkeypatch.setattr(cold_storage, "READ_BATCH_SIZE", 3)
+    consumed = []
+
+    def batches():
+        for batch in (rows([1, 2]), rows([3, 4, 5]), rows([6])):
+            consumed.append(len(batch))
+            yield batch
+
+    assert cold_storage.write_month("qc_results", MONTH, batches()) == 6
+    assert [row["id"] for row in cold_storage.read_month("qc_results", MONTH)] == [1, 2, 3, 4, 5, 6]
+    assert consumed == [2, 3, 1]
+
+
+def test_write_month_merges_an_earlier_file(monkeypatch):
+    monkeypatch.setattr(cold_storage, "READ_BATCH_SIZE", 2)
+    cold_storage.write_month("qc_results", MONTH, [rows([1, 3, 5, 7])])
+
+    #Late arrivals interleave with the archived rows; 5 is still in the database from a run that didn't finish
+    late = rows([2, 5, 6, 8])
+    late[1]["status"] = "REJECT"
+    assert cold_storage.write_month("qc_results", MONTH, [late[:2], late[2:]]) == 7
+
+    archived = cold_storage.read_month("qc_results", MONTH)
+    assert [row["id"] for row in archived] == [1, 2, 3, 5, 6, 7, 8]
+    assert next(row for row in archived if row["id"] == 5)["status"] == "REJECT"
@@ -0,0 +1,40 @@
+"""The cached z-score window must keep the database's (timestamp, id) order"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from app.logic import history_window
+from tests.conftest import API
+
+
+def submit(client, test_id, value):
+    return client.post(f"{API}/results/", json={"test_id": test_id, "value": value}).raise_for_status().json()
+
+
+def test_backdated_result_does_not_become_the_newest_history(client, make_test):
+    test = make_test(mean=100, std_dev=1)
+    submit(client, test["id"], 100)
+    submit(client, test["id"], 100.5)
+    batch = client.post(f"{API}/results/batch", json={"results": [
+        {"test_id": test["id"], "value": 102.5, "timestamp": "2020-01-01T00:00:00Z"}
+    ]}).raise_for_status().json()
+    assert batch["created"] == 1
+
+    #In the database the 2020 result is the oldest, so the next value is compared against 100.5 (z 0.5)
+    result = submit(client, test["id"], 102.5)
+    assert (result["status"], result["system_comment"]) == ("WARNING", "Rule 1-2s Warning: Result exceeds 2SD")
+
+
+def test_push_in_order_keeps_the_window():
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+    async def loader():
+        return [(start, Decimal("1"))]
+
+    history_window.invalidate(-1)
+    asyncio.run(history_window.get_history(-1, loader))
+    history_window.push(-1, Decimal("2"), start + timedelta(minutes=1))
+    assert asyncio.run(history_window.get_history(-1, loader))[0] == [Decimal("2"), Decimal("1")]
+    #Older than the newest entry: dropped, and the next read seeds from the loader again
+    history_window.push(-1, Decimal("3"), start - timedelta(minutes=1))
+    assert asyncio.run(history_window.get_history(-1, loader))[0] == [Decimal("1")]
@@ -0,0 +1,28 @@
+"""POST /results/batch, the ingestion path the ASTM listener shares"""
+from tests.conftest import API
+
+
+def batch(client, test_id, *items):
+    response = client.post(f"{API}/results/batch", json={"results": [
+        {"test_id": test_id, "value": value, "timestamp": timestamp} for value, timestamp in items
+    ]})
+    return [item["result"] for item in response.raise_for_status().json()["items"]]
+
+
+def test_backdated_items_are_judged_on_the_results_run_before_them(client, make_test):
+    test = make_test(mean=100, std_dev=1)
+    batch(client, test["id"], (100, "2019-06-01T00:00:00Z"))
+    for value in (100, 102.5):
+        client.post(f"{API}/results/", json={"test_id": test["id"], "value": value}).raise_for_status()
+
+    #A resent batch from 2020: the first item only has the 2019 result behind it, the second has the first
+    first, second = batch(client, test["id"], (102.5, "2020-01-01T00:00:00Z"), (102.5, "2020-01-02T00:00:00Z"))
+    assert (first["status"], first["system_comment"]) == ("WARNING", "Rule 1-2s Warning: Result exceeds 2SD")
+    assert (second["status"], second["system_comment"]) == ("REJECT", "2-2s Violation")
+
+
+def test_items_newer_than_the_stored_results_use_the_window(client, make_test):
+    test = make_test(mean=100, std_dev=1)
+    batch(client, test["id"], (100, "2024-01-01T00:00:00Z"), (102.5, "2024-01-02T00:00:00Z"))
+    (result,) = batch(client, test["id"], (102.5, "2024-01-03T00:00:00Z"))
+    assert (result["status"], result["system_comment"]) == ("REJECT", "2-2s Violation")
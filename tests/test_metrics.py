@@ -0,0 +1,30 @@
+"""Per-statement DB timing hooked onto the engines by app.db.session._instrument"""
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from app import metrics
+from app.db.session import _instrument
+
+
+def background_statements():
+    return metrics.DB_STATEMENTS._values.get(("", "background"), 0)
+
+
+def test_failed_statement_leaves_no_timing_behind(monkeypatch):
+    engine = create_engine("sqlite://")
+    _instrument(engine)
+    clock = iter([10.0, 20.0, 20.5])
+    monkeypatch.setattr(metrics.time, "perf_counter", lambda: next(clock))
+    before = background_statements()
+
+    with engine.connect() as conn:
+        with pytest.raises(OperationalError):
+            conn.execute(text("SELECT * FROM no_such_table"))
+        seconds = metrics.DB_SECONDS._values.get(("", "background"), 0)
+        conn.execute(text("SELECT 1"))
+
+        #Timed from its own start (20.0), not the failed statement's (10.0)
+        assert metrics.DB_SECONDS._values[("", "background")] - seconds == pytest.approx(0.5)
+        assert "query_start" not in conn.info
+    assert background_statements() - before == 1
@@ -0,0 +1,36 @@
+"""POST /test-definitions/{id}/reevaluate re-runs the single-level engine over a test's stored results"""
+from tests.conftest import API
+
+
+def test_run_rejection_survives_reevaluation(client, make_test):
+    level_1 = make_test(mean=100, std_dev=1, analyte_name="CHOL")
+    level_2 = make_test(mean=200, std_dev=1, analyte_name="CHOL", instrument_id=level_1["instrument_id"])
+    control_set = client.post(f"{API}/control-sets/", json={
+        "instrument_id": level_1["instrument_id"], "analyte_name": "CHOL", "test_ids": [level_1["id"], level_2["id"]]
+    }).raise_for_status().json()
+
+    #Each level alone is only a 1-2s warning; together they break 2-2s across levels
+    run = client.post(f"{API}/runs/", json={"control_set_id": control_set["id"], "results": [
+        {"test_id": level_1["id"], "value": 102.5},
+        {"test_id": level_2["id"], "value": 202.5},
+    ]}).raise_for_status().json()
+    assert run["status"] == "REJECT"
+
+    response = client.post(f"{API}/test-definitions/{level_1['id']}/reevaluate", params={"write": "true", "reviewer_id": 1})
+    assert response.status_code == 200
+    assert response.headers["x-changed-count"] == "0"
+
+    stored = client.get(f"{API}/runs/{run['id']}").raise_for_status().json()
+    assert [(r["status"], r["system_comment"]) for r in stored["results"]] == [
+        ("REJECT", "2-2s Violation (across levels)")
+    ] * 2
+
+
+def test_reevaluation_still_rescores_single_results(client, make_test):
+    test = make_test(mean=100, std_dev=1)
+    client.post(f"{API}/results/", json={"test_id": test["id"], "value": 102.5}).raise_for_status()
+    client.patch(f"{API}/test-definitions/{test['id']}", json={"std_dev": 2}).raise_for_status()
+
+    response = client.post(f"{API}/test-definitions/{test['id']}/reevaluate", params={"write": "true", "reviewer_id": 1})
+    changes = [line for line in response.text.splitlines() if line]
+    assert len(changes) == 1 and '"new_status": "PASS"' in changes[0]
@@ -0,0 +1,38 @@
+"""The float and batch Westgard engines against the Decimal one, on the corpus from benchmarks.rules_equivalence"""
+import random
+
+from app.logic.batch_rules import evaluate_westgard_batch
+from app.logic.fast_rules import evaluate_westgard_fast
+from app.logic.rules_engine import calculate_z_score, evaluate_westgard
+from benchmarks.rules_equivalence import build_case, build_series
+
+SEED = 15
+CASES = 20_000
+SERIES = 2_000
+
+
+def test_fast_rules_match_decimal_engine():
+    rng = random.Random(SEED)
+    for _ in range(CASES):
+        value, mean, std_dev, history = build_case(rng)
+        expected = evaluate_westgard(value, mean, std_dev, history)
+        actual = evaluate_westgard_fast(value, mean, std_dev, history, [float(z) for z in history])
+        assert (actual.status, actual.message, actual.z_score) == (expected.status, expected.message, expected.z_score), (
+            f"value={value} mean={mean} std_dev={std_dev} history={history}"
+        )
+
+
+def test_batch_rules_match_decimal_engine():
+    rng = random.Random(SEED)
+    for _ in range(SERIES):
+        values, mean, std_dev = build_series(rng)
+        evaluation = evaluate_westgard_batch(values, mean, std_dev)
+        z_scores = [calculate_z_score(value, mean, std_dev) for value in values]
+        for i, value in enumerate(values):
+            #The previous 10 z-scores, newest first, as get_recent_z_scores hands them over
+            history = z_scores[max(0, i - 10):i][::-1]
+            expected = evaluate_westgard(value, mean, std_dev, history)
+            assert (evaluation.statuses[i], evaluation.messages[i]) == (expected.status, expected.message), (
+                f"point {i} of values={values} mean={mean} std_dev={std_dev}"
+            )
+